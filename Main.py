@@ -8,7 +8,6 @@ import ttkbootstrap as ttkb
 from PIL import Image  # Removed ImageTk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import requests
 from dotenv import load_dotenv
 import schedule
 import time
@@ -18,6 +17,21 @@ import subprocess
 import shutil
 import ctypes  # <-- Add this for admin check
 import telegram_bot  # <-- Add this import
+from utils.journal import open_journal
+from utils.shards import shard_ledger
+from utils.history import open_history
+from utils.ledger import open_ledger
+from utils.operations import set_op, delete_op, append_op, pop_op
+from utils.rollups import month_rollup
+from utils.columns import open_columns
+from utils.analytics import open_analytics
+from utils.balance import open_balance
+from utils.search import open_search
+from utils.autocomplete import open_suggestions
+from utils.dateindex import open_date_index, parse_day
+from utils.charts import add_balance_tab, add_daily_tab, add_trend_tab, trend_window
+from utils.saver import get_saver
+from utils.serialization import json_dump_args
 
 # Remove this block (not needed anymore):
 # try:
@@ -34,20 +48,22 @@ DATA_FILE = "finance_data.json"
 CATEGORIES_FILE = "expense_categories.json"
 RECURRING_FILE = "recurring_expenses.json"
 GOALS_FILE = "goals.json"
+HISTORY_FILE = "undo_history.jsonl"
 CONFIG_PATH = "config.json"
 
+def open_ledger_service():
+    """The ledger shared by the GUI and the Telegram bot thread in this process"""
+    journal = open_journal(resource_path(DATA_FILE))
+    return open_ledger(journal, open_history(resource_path(HISTORY_FILE), max_entries=50))
+
 # Load or initialize data
-def load_or_create_data():
-    data_file = resource_path(DATA_FILE)
-    if os.path.exists(data_file):
-        with open(data_file, "r") as f:
-            data = json.load(f)
-            # Ensure settings exist with valid theme
-            if "settings" not in data or data["settings"].get("theme") not in ["darkly", "cosmo"]:
-                data["settings"] = {"theme": "darkly", "pin": None}
-                with open(data_file, "w") as f:
-                    json.dump(data, f, indent=4)
-            return data
+def load_or_create_data(ledger):
+    data = ledger.load()
+    if data is not None:
+        # Ensure settings exist with valid theme
+        if "settings" not in data or data["settings"].get("theme") not in ["darkly", "cosmo"]:
+            ledger.record(set_op(["settings"], {"theme": "darkly", "pin": None}), undoable=False)
+        return data
     
     # Create new data structure with valid theme
     data = {
@@ -60,8 +76,7 @@ def load_or_create_data():
             "pin": None
         }
     }
-    with open(data_file, "w") as f:
-        json.dump(data, f, indent=4)
+    ledger.replace(data)
     return data
 
 # Load or initialize expense categories
@@ -73,8 +88,7 @@ else:
         "needs": [],  # Empty list for needs
         "wants": []   # Empty list for wants
     }
-    with open(CATEGORIES_FILE, "w") as f:
-        json.dump(expense_categories, f, indent=4)
+    get_saver().save_json(CATEGORIES_FILE, expense_categories)
 
 SERVICE_NAME = "FinanceTelegramBot"
 
@@ -149,7 +163,7 @@ def install_telegram_bot_service():
         return False
 
 class FinanceManager:
-    def __init__(self):
+    def __init__(self, ledger=None):
         try:
             # Load environment variables
             load_dotenv()
@@ -157,13 +171,25 @@ class FinanceManager:
             self.chat_id = os.getenv('TELEGRAM_CHAT_ID')
             
             self.root = ttkb.Window()
-            self.data = load_or_create_data()
+            # One ledger service owns the data for the GUI and the bot thread
+            self.ledger = ledger or open_ledger_service()
+            self.journal = self.ledger.journal
+            load_or_create_data(self.ledger)
+            self.journal.start_compactor()
             self.categories = expense_categories
+            # Set lookups for "already listed?" and ranked suggestions from past expenses
+            self.category_sets = {category: set(items) for category, items in self.categories.items()}
+            self.suggestions = open_suggestions(self.ledger, self.categories)
             
-            # Initialize history for undo/redo
-            self.history = [json.dumps(self.data)]  # Initial state
-            self.current_index = 0
-            self.max_history = 50  # Maximum number of states to keep
+            # Changes made by the bot are picked up on the Tk thread
+            self.ledger_changed = threading.Event()
+            self.ledger.subscribe(self.on_ledger_changed)
+            # Column arrays for range and multi-month aggregation, built on first use
+            self.columns = open_columns(self.ledger)
+            self.analytics = open_analytics(self.ledger)
+            self.date_index = open_date_index(self.ledger)
+            self.balance = open_balance(self.ledger)
+            self.search_index = open_search(self.ledger)
             
             if not self.check_pin():
                 sys.exit()
@@ -177,6 +203,7 @@ class FinanceManager:
             self.setup_main_window()
             self.create_widgets()
             self.update_balance_display()
+            self.poll_ledger_changes()
             
             # Schedule daily summary
             self.schedule_daily_summary()
@@ -209,6 +236,24 @@ class FinanceManager:
             messagebox.showerror("Error", f"Failed to initialize application: {str(e)}")
             sys.exit(1)
 
+    @property
+    def data(self):
+        return self.ledger.data
+
+    def on_ledger_changed(self, ops, source):
+        # Runs on the ledger's writer thread; Tk must only be touched from its own thread
+        if source != "gui":
+            self.ledger_changed.set()
+
+    def poll_ledger_changes(self):
+        # Two stat calls; the ledger is only re-read when the bot service wrote to it
+        if self.ledger.journal.changed():
+            self.ledger.refresh()
+        if self.ledger_changed.is_set():
+            self.ledger_changed.clear()
+            self.update_all_displays()
+        self.root.after(500, self.poll_ledger_changes)
+
     def check_telegram_config(self):
         """Check if Telegram bot is properly configured"""
         token = self.bot_token.strip('"') if isinstance(self.bot_token, str) else None
@@ -222,23 +267,14 @@ class FinanceManager:
             today_str = today.strftime("%Y-%m-%d")
             month_str = today.strftime("%Y-%m")
             
+            rollup = month_rollup(self.data, month_str)
+
             # Get today's expenses
-            today_expenses = self.data.get("expenses", {}).get(month_str, {}).get(today_str, [])
-            total_today = sum(expense["amount"] for expense in today_expenses)
+            total_today = rollup["days"].get(today_str, 0)
             
             # Get current balance and remaining amounts
-            current_month = datetime.now().strftime("%Y-%m")
-            income = self.data.get("monthly_income", 0)
-            month_expenses = self.data.get("expenses", {}).get(current_month, {})
-            month_deposits = self.data.get("deposits", {}).get(current_month, {})
-            
-            total_expenses = sum(
-                expense["amount"] 
-                for day_expenses in month_expenses.values()
-                for expense in day_expenses
-            )
-            total_deposits = sum(month_deposits.values()) if month_deposits else 0
-            current_balance = income + total_deposits - total_expenses
+            total_deposits = rollup["deposits"]
+            current_balance = self.balance.balance_at(today)
             
             # Calculate remaining amounts
             bd = self.data.get("breakdown", {})
@@ -246,18 +282,8 @@ class FinanceManager:
             wants_total = bd.get("wants", 0)
             savings_total = bd.get("savings", 0)
             
-            needs_spent = sum(
-                expense["amount"] 
-                for day_expenses in month_expenses.values()
-                for expense in day_expenses 
-                if expense["category"].lower() == "needs"
-            )
-            wants_spent = sum(
-                expense["amount"] 
-                for day_expenses in month_expenses.values()
-                for expense in day_expenses 
-                if expense["category"].lower() == "wants"
-            )
+            needs_spent = rollup["categories"].get("needs", 0)
+            wants_spent = rollup["categories"].get("wants", 0)
             savings_deposited = total_deposits
             
             needs_remaining = max(needs_total - needs_spent, 0)
@@ -287,32 +313,19 @@ class FinanceManager:
             return
 
         try:
-            summary = self.get_daily_summary()
+            with self.ledger.lock:
+                summary = self.get_daily_summary()
             if not summary:
                 return
 
             token = self.bot_token.strip('"') if isinstance(self.bot_token, str) else ""
             chat_id = self.chat_id.strip('"') if isinstance(self.chat_id, str) else ""
-            url = f"https://api.telegram.org/bot{token}/sendMessage"
-
-            data = {
-                "chat_id": chat_id,
-                "text": summary,
-                "parse_mode": "HTML"
-            }
-
-            response = requests.post(url, data=data)
-            response.raise_for_status()
-
-            if response.ok:
-                print("Daily summary sent successfully")
-                print(response.json())
-            else:
-                print(f"Failed to send message: {response.text}")
+            # Queued on disk and retried, so a network blip or restart doesn't lose the summary
+            telegram_bot.send_telegram_message(token, chat_id, summary)
+            print("Daily summary queued for delivery")
 
         except Exception as e:
-            print(f"Failed to send Telegram message: {str(e)}")
-            messagebox.showerror("Error", "Failed to send Telegram message")
+            print(f"Failed to queue Telegram message: {str(e)}")
 
     def schedule_daily_summary(self):
         """Schedule daily summary at 9:00 PM"""
@@ -364,9 +377,7 @@ class FinanceManager:
             if len(pin) != 4 or not pin.isdigit():
                 messagebox.showerror("Error", "Please enter a 4-digit PIN")
                 return
-            self.data["settings"]["pin"] = pin
-            with open(DATA_FILE, "w") as f:
-                json.dump(self.data, f, indent=4)
+            self.record(set_op(["settings", "pin"], pin), undoable=False)
             dialog.destroy()
             
         ttk.Button(dialog, text="Save PIN", command=save_pin).pack(pady=10)
@@ -444,24 +455,14 @@ class FinanceManager:
     def show_charts(self):
         try:
             current_month = datetime.now().strftime("%Y-%m")
-            spending = {"needs": 0, "wants": 0}
-            custom_spending = {}
-
-            month_data = self.data["expenses"].get(current_month, {})
-            for day_expenses in month_data.values():
-                for expense in day_expenses:
-                    amount = expense["amount"]
-                    category = expense["category"].lower()
-                    description = expense["description"]
-
-                    # Add to main category (needs/wants)
-                    if category in spending:
-                        spending[category] += amount
-
-                    # Add to custom category
-                    if description not in custom_spending:
-                        custom_spending[description] = 0
-                    custom_spending[description] += amount
+            with self.ledger.lock:
+                rollup = month_rollup(self.data, current_month)
+                spending = {
+                    "needs": rollup["categories"].get("needs", 0),
+                    "wants": rollup["categories"].get("wants", 0)
+                }
+                custom_spending = dict(rollup["descriptions"])
+            monthly = self.columns.by_month(*trend_window())
 
             # Use color maps from matplotlib.colors
             import matplotlib
@@ -582,6 +583,11 @@ class FinanceManager:
             canvas2.draw()
             canvas2.get_tk_widget().pack(expand=True, anchor="center")
 
+            # --- Monthly Trend Chart ---
+            add_trend_tab(notebook, monthly)
+            add_daily_tab(notebook, self.analytics, self.date_index.between)
+            add_balance_tab(notebook, self.balance.last_days(180))
+
             def on_close():
                 plt.close('all')
                 for widget in chart_window.winfo_children():
@@ -593,6 +599,39 @@ class FinanceManager:
             messagebox.showerror("Error", f"Failed to display charts: {str(e)}")
             plt.close('all')
 
+    def show_spend_between(self):
+        today = date.today()
+        start = simpledialog.askstring(
+            "Spend Between Dates", "Start date (YYYY-MM-DD):",
+            initialvalue=today.replace(day=1).isoformat(), parent=self.root
+        )
+        if not start:
+            return
+        end = simpledialog.askstring(
+            "Spend Between Dates", "End date (YYYY-MM-DD):",
+            initialvalue=today.isoformat(), parent=self.root
+        )
+        if not end:
+            return
+        try:
+            first, last = parse_day(start), parse_day(end)
+        except ValueError:
+            messagebox.showerror("Error", "Please enter dates as YYYY-MM-DD.")
+            return
+        if first > last:
+            first, last = last, first
+        total, count = self.date_index.between(first, last)
+        categories = self.columns.by_category(first, last)
+        days = last - first + 1
+        messagebox.showinfo(
+            "Spend Between Dates",
+            f"{date.fromordinal(first).strftime('%d %b %Y')} – {date.fromordinal(last).strftime('%d %b %Y')}\n\n"
+            f"Total spent: ₹{total:,.2f} ({count} expenses)\n"
+            f"Needs: ₹{categories.get('needs', 0):,.2f}\n"
+            f"Wants: ₹{categories.get('wants', 0):,.2f}\n"
+            f"Average per day: ₹{total / days:,.2f}"
+        )
+
     def create_widgets(self):
         # Create menu bar
         self.create_menu()
@@ -610,6 +649,7 @@ class FinanceManager:
         self.create_balance_display()
         self.create_progress_bars()
         self.create_expense_section()
+        self.create_search_section()
         self.create_deposit_section()
         self.create_recurring_section()
         self.create_goals_section()
@@ -624,6 +664,7 @@ class FinanceManager:
         menubar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="Export Backup", command=self.export_backup)
         file_menu.add_command(label="Import Backup", command=self.import_backup)
+        file_menu.add_command(label="Split Ledger by Month", command=self.split_ledger)
         file_menu.add_separator()
         file_menu.add_command(label="Send Status to Telegram", command=self.send_daily_summary)
         file_menu.add_separator()
@@ -640,6 +681,7 @@ class FinanceManager:
         view_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="View", menu=view_menu)
         view_menu.add_command(label="Show Charts", command=self.show_charts)
+        view_menu.add_command(label="Spend Between Dates...", command=self.show_spend_between)
         view_menu.add_separator()
         
         # Fix theme menu
@@ -660,12 +702,9 @@ class FinanceManager:
 
     def toggle_theme(self, theme):
         """Toggle between light and dark themes"""
-        self.data["settings"]["theme"] = theme
         self.theme_var.set(theme)
         try:
-            with open(DATA_FILE, "w") as f:
-                json.dump(self.data, f, indent=4)
-            self.add_to_history()
+            self.record(set_op(["settings", "theme"], theme))
             self.root._style.theme_use(theme)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save theme: {str(e)}")
@@ -679,7 +718,7 @@ class FinanceManager:
         if file_path:
             try:
                 with open(file_path, "w") as f:
-                    json.dump(self.data, f, indent=4)
+                    json.dump(self.data, f, default=dict, **json_dump_args())
                 messagebox.showinfo("Success", "Backup exported successfully!")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to export backup: {str(e)}")
@@ -692,14 +731,32 @@ class FinanceManager:
         if file_path:
             try:
                 with open(file_path, "r") as f:
-                    self.data = json.load(f)
-                with open(DATA_FILE, "w") as f:
-                    json.dump(self.data, f, indent=4)
-                self.update_balance_display()
+                    imported = json.load(f)
+                # Rollups are rebuilt from the imported ledger rather than trusted
+                imported.pop("rollups", None)
+                ops = [set_op([key], value) for key, value in imported.items()]
+                ops += [delete_op([key]) for key in self.data if key not in imported and key != "rollups"]
+                self.record(*ops)
+                self.update_all_displays()
                 messagebox.showinfo("Success", "Backup imported successfully!")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to import backup: {str(e)}")
 
+    def split_ledger(self):
+        if not messagebox.askyesno(
+            "Split Ledger",
+            "Store expenses in one file per month so only the months you look at are loaded?\n"
+            "The current finance_data.json is kept as finance_data.json.bak."
+        ):
+            return
+        try:
+            self.ledger.call(lambda: shard_ledger(self.journal))
+            self.ledger.reload(source="gui")
+            self.update_all_displays()
+            messagebox.showinfo("Success", "Ledger split by month.")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to split ledger: {str(e)}")
+
     def create_income_section(self):
         income_frame = ttk.LabelFrame(self.main_frame, text="Income Settings", padding="10")
         income_frame.pack(fill=tk.X, pady=(0, 20))
@@ -770,10 +827,19 @@ class FinanceManager:
         # Update descriptions when category changes
         def update_descriptions(*args):
             category = self.category_var.get()
-            self.expense_desc_combo['values'] = self.categories[category]
+            self.expense_desc_combo['values'] = self.suggestions.suggest(category)
             self.expense_desc_combo.set("")  # Clear current selection
+
+        # Narrow the ranked suggestions as the user types
+        def filter_descriptions(event):
+            if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+                return
+            self.expense_desc_combo['values'] = self.suggestions.suggest(
+                self.category_var.get(), self.expense_desc_combo.get()
+            )
             
         self.category_var.trace('w', update_descriptions)
+        self.expense_desc_combo.bind("<KeyRelease>", filter_descriptions)
         update_descriptions()  # Initial update
 
         # Note
@@ -792,6 +858,36 @@ class FinanceManager:
                   
         self.attached_image_path = None
         
+    def create_search_section(self):
+        search_frame = ttk.LabelFrame(self.main_frame, text="Search Expenses", padding="10")
+        search_frame.pack(fill=tk.X, pady=(0, 20))
+
+        # Results update as you type (matches descriptions and notes)
+        self.search_var = tk.StringVar()
+        ttk.Entry(search_frame, textvariable=self.search_var).pack(fill=tk.X, pady=(0, 10))
+        self.search_var.trace('w', lambda *args: self.update_search_results())
+
+        columns = ("date", "amount", "category", "description", "note")
+        self.search_results = ttk.Treeview(search_frame, columns=columns, show="headings", height=6)
+        for column, width in zip(columns, (90, 90, 80, 180, 180)):
+            self.search_results.heading(column, text=column.title())
+            self.search_results.column(column, width=width, anchor="w")
+        self.search_results.pack(fill=tk.X)
+
+    def update_search_results(self):
+        self.search_results.delete(*self.search_results.get_children())
+        query = self.search_var.get()
+        if not query.strip():
+            return
+        for date_str, _, expense in self.search_index.search(query, limit=100):
+            self.search_results.insert("", tk.END, values=(
+                date_str,
+                f"₹{expense['amount']:,.2f}",
+                expense["category"].title(),
+                expense["description"],
+                expense.get("note", "")
+            ))
+
     def create_deposit_section(self):
         deposit_frame = ttk.LabelFrame(self.main_frame, text="Add Deposit", padding="10")
         deposit_frame.pack(fill=tk.X, pady=(0, 20))
@@ -891,6 +987,9 @@ class FinanceManager:
         # Calculate starting position (0 = Monday, 6 = Sunday)
         start_pos = first_day.weekday()
 
+        # Look the month up once; with a split ledger this may read its file
+        month_expenses = self.data["expenses"].get(first_day.strftime("%Y-%m"), {})
+
         # Create calendar buttons
         for i in range(42):  # 6 weeks × 7 days
             row = (i + start_pos) // 7 + 1
@@ -905,9 +1004,7 @@ class FinanceManager:
                 
                 # Check if date has expenses
                 date_str = date.strftime("%Y-%m-%d")
-                month_str = date.strftime("%Y-%m")
-                has_expense = (month_str in self.data["expenses"] and 
-                             date_str in self.data["expenses"][month_str])
+                has_expense = date_str in month_expenses
                 
                 btn = ttk.Button(
                     self.calendar_frame,
@@ -985,18 +1082,16 @@ class FinanceManager:
             if income < 0:
                 raise ValueError("Income cannot be negative")
                 
-            self.data["monthly_income"] = income
-            self.data["breakdown"] = {
-                "needs": round(income * 0.50),
-                "wants": round(income * 0.30),
-                "savings": round(income * 0.20)
-            }
-            
-            with open(DATA_FILE, "w") as f:
-                json.dump(self.data, f, indent=4)
+            self.record(
+                set_op(["monthly_income"], income),
+                set_op(["breakdown"], {
+                    "needs": round(income * 0.50),
+                    "wants": round(income * 0.30),
+                    "savings": round(income * 0.20)
+                })
+            )
                 
             self.update_balance_display()
-            self.add_to_history()
             messagebox.showinfo("Success", "Income and breakdown updated successfully!")
             
         except ValueError as ve:
@@ -1037,12 +1132,11 @@ class FinanceManager:
             category = self.category_var.get()
             description = self.expense_desc_combo.get().strip()
             
-            if description and description not in self.categories[category]:
-                self.categories[category].append(description)
-                self.expense_desc_combo['values'] = self.categories[category]
-                # Save updated categories
-                with open(CATEGORIES_FILE, "w") as f:
-                    json.dump(self.categories, f, indent=4)
+            if description and description not in self.category_sets.setdefault(category, set()):
+                self.categories.setdefault(category, []).append(description)
+                self.category_sets[category].add(description)
+                # Save updated categories (debounced and written in the background)
+                get_saver().save_json(CATEGORIES_FILE, self.categories)
             
             if not description:
                 raise ValueError("Description is required")
@@ -1050,11 +1144,6 @@ class FinanceManager:
             current_date = datetime.now()
             date_str = current_date.strftime("%Y-%m-%d")
             month_str = current_date.strftime("%Y-%m")
-            
-            if month_str not in self.data["expenses"]:
-                self.data["expenses"][month_str] = {}
-            if date_str not in self.data["expenses"][month_str]:
-                self.data["expenses"][month_str][date_str] = []
                 
             expense = {
                 "amount": amount,
@@ -1066,24 +1155,22 @@ class FinanceManager:
             if self.attached_image_path:
                 expense["image_path"] = self.attached_image_path
                 
-            self.data["expenses"][month_str][date_str].append(expense)
-            
-            with open(DATA_FILE, "w") as f:
-                json.dump(self.data, f, indent=4)
+            self.record(append_op(["expenses", month_str, date_str], expense))
                 
             self.update_balance_display()
             self.update_calendar()  # Refresh calendar to show new expense
+            self.update_search_results()
             
             # Clear inputs
             self.entry_amount.delete(0, tk.END)
             self.expense_desc_combo.set("")
+            self.expense_desc_combo['values'] = self.suggestions.suggest(category)
             self.expense_note.delete(0, tk.END)
             self.attached_image_path = None
             self.receipt_label.config(text="No receipt attached")
             
             messagebox.showinfo("Success", "Expense added successfully!")
             
-            self.add_to_history()
             
         except ValueError as ve:
             messagebox.showerror("Error", str(ve))
@@ -1101,16 +1188,9 @@ class FinanceManager:
             date_str = current_date.strftime("%Y-%m-%d")
             month_str = current_date.strftime("%Y-%m")
             
-            if month_str not in self.data["deposits"]:
-                self.data["deposits"][month_str] = {}
-                
-            self.data["deposits"][month_str][date_str] = amount
-            
-            with open(DATA_FILE, "w") as f:
-                json.dump(self.data, f, indent=4)
+            self.record(set_op(["deposits", month_str, date_str], amount))
                 
             self.update_balance_display()
-            self.add_to_history()
             self.deposit_entry.delete(0, tk.END)
             messagebox.showinfo("Success", "Deposit added successfully!")
             
@@ -1154,11 +1234,8 @@ class FinanceManager:
 
     def delete_recurring(self, index):
         if messagebox.askyesno("Confirm", "Delete this recurring expense?"):
-            self.data["recurring_expenses"].pop(index)
-            with open(DATA_FILE, "w") as f:
-                json.dump(self.data, f, indent=4)
+            self.record(pop_op(["recurring_expenses"], index))
             self.update_recurring_display()
-            self.add_to_history()
 
     def process_recurring_expenses(self):
         """Process due recurring expenses"""
@@ -1172,42 +1249,37 @@ class FinanceManager:
         current_date = today.strftime("%Y-%m-%d")
         current_month = today.strftime("%Y-%m")
         
-        expenses_added = 0
-        
-        for expense in self.data["recurring_expenses"]:
-            last_added = expense.get("last_added")
-            if last_added == current_date:
-                continue
-            
-            should_add = False
-            if expense["frequency"] == "monthly" and current_day == int(expense["day"]):
-                should_add = True
-            elif expense["frequency"] == "weekly" and current_weekday == expense["day"]:
-                should_add = True
-            
-            if should_add:
-                if current_month not in self.data["expenses"]:
-                    self.data["expenses"][current_month] = {}
-                if current_date not in self.data["expenses"][current_month]:
-                    self.data["expenses"][current_month][current_date] = []
+        def due_ops(data):
+            # Decided against the latest ledger so the bot service can't double-add the same rule
+            ops = []
+            for i, expense in enumerate(data.get("recurring_expenses", [])):
+                last_added = expense.get("last_added")
+                if last_added == current_date:
+                    continue
                 
-                self.data["expenses"][current_month][current_date].append({
-                    "amount": expense["amount"],
-                    "category": expense["category"],
-                    "description": expense["description"],
-                    "note": "Recurring expense"
-                })
+                should_add = False
+                if expense["frequency"] == "monthly" and current_day == int(expense["day"]):
+                    should_add = True
+                elif expense["frequency"] == "weekly" and current_weekday == expense["day"]:
+                    should_add = True
                 
-                expense["last_added"] = current_date
-                expenses_added += 1
+                if should_add:
+                    ops.append(append_op(["expenses", current_month, current_date], {
+                        "amount": expense["amount"],
+                        "category": expense["category"],
+                        "description": expense["description"],
+                        "note": "Recurring expense"
+                    }))
+                    ops.append(set_op(["recurring_expenses", i, "last_added"], current_date))
+            return ops
+        
+        # All due expenses go to the journal in a single write
+        expenses_added = len(self.ledger.record_with(due_ops, source="gui")) // 2
         
         if expenses_added > 0:
-            with open(DATA_FILE, "w") as f:
-                json.dump(self.data, f, indent=4)
             self.update_balance_display()
             self.update_recurring_display()
             self.update_calendar()
-            self.add_to_history()
             messagebox.showinfo("Success", f"Added {expenses_added} recurring expense(s)")
         else:
             messagebox.showinfo("Info", "No recurring expenses due today")
@@ -1299,15 +1371,9 @@ class FinanceManager:
                     "last_added": None
                 }
                 
-                if "recurring_expenses" not in self.data:
-                    self.data["recurring_expenses"] = []
-                
-                self.data["recurring_expenses"].append(recurring_expense)
-                with open(DATA_FILE, "w") as f:
-                    json.dump(self.data, f, indent=4)
+                self.record(append_op(["recurring_expenses"], recurring_expense))
                 
                 self.update_recurring_display()
-                self.add_to_history()
                 dialog.destroy()
                 messagebox.showinfo("Success", "Recurring expense added!")
                 
@@ -1382,16 +1448,9 @@ class FinanceManager:
                     "created_date": current_date.strftime("%Y-%m-%d")
                 }
                 
-                # Initialize goals list if not exists
-                if "savings_goals" not in self.data:
-                    self.data["savings_goals"] = []
-                
-                self.data["savings_goals"].append(goal)
-                with open(DATA_FILE, "w") as f:
-                    json.dump(self.data, f, indent=4)
+                self.record(append_op(["savings_goals"], goal))
                 
                 self.update_goals_display()
-                self.add_to_history()
                 dialog.destroy()
                 messagebox.showinfo("Success", "Savings goal added successfully!")
                 
@@ -1453,11 +1512,8 @@ class FinanceManager:
                         maxvalue=goal["target_amount"]
                     )
                     if new_amt is not None:
-                        self.data["savings_goals"][idx]["current_amount"] = new_amt
-                        with open(DATA_FILE, "w") as f:
-                            json.dump(self.data, f, indent=4)
+                        self.record(set_op(["savings_goals", idx, "current_amount"], new_amt))
                         self.update_goals_display()
-                        self.add_to_history()
                 return update_goal_amount
 
             update_btn = ttk.Button(row, text="Update", command=make_update_goal(i))
@@ -1466,33 +1522,20 @@ class FinanceManager:
     def delete_goal(self, index):
         """Delete a savings goal"""
         if messagebox.askyesno("Confirm", "Delete this savings goal?"):
-            self.data["savings_goals"].pop(index)
-            with open(DATA_FILE, "w") as f:
-                json.dump(self.data, f, indent=4)
+            self.record(pop_op(["savings_goals"], index))
             self.update_goals_display()
-            self.add_to_history()
 
     def update_balance_display(self):
         """Update balance display and progress bars"""
         try:
             current_month = datetime.now().strftime("%Y-%m")
-            income = self.data.get("monthly_income", 0)
             
-            # Get all expenses and deposits for current month
-            month_expenses = self.data.get("expenses", {}).get(current_month, {})
-            month_deposits = self.data.get("deposits", {}).get(current_month, {})
+            # Totals for the current month come straight from the rollup
+            rollup = month_rollup(self.data, current_month)
+            total_deposits = rollup["deposits"]
             
-            # Calculate totals
-            total_expenses = sum(
-                expense["amount"] 
-                for day_expenses in month_expenses.values()
-                for expense in day_expenses
-            )
-            
-            total_deposits = sum(month_deposits.values()) if month_deposits else 0
-            
-            # Calculate balance
-            current_balance = income + total_deposits - total_expenses
+            # Balance as of today from the running cash-flow sums
+            current_balance = self.balance.balance_at(date.today())
             
             # Update balance label with color coding
             if current_balance >= 0:
@@ -1512,19 +1555,8 @@ class FinanceManager:
             savings_total = bd.get("savings", 0)
 
             # Calculate category spending
-            needs_spent = sum(
-                expense["amount"] 
-                for day_expenses in month_expenses.values()
-                for expense in day_expenses 
-                if expense["category"].lower() == "needs"
-            )
-            
-            wants_spent = sum(
-                expense["amount"] 
-                for day_expenses in month_expenses.values()
-                for expense in day_expenses 
-                if expense["category"].lower() == "wants"
-            )
+            needs_spent = rollup["categories"].get("needs", 0)
+            wants_spent = rollup["categories"].get("wants", 0)
             
             savings_deposited = total_deposits
             
@@ -1556,36 +1588,14 @@ class FinanceManager:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update balance display: {str(e)}")
 
-    def add_to_history(self):
-        """Add current state to history"""
-        # Remove any future states if we're not at the end
-        self.history = self.history[:self.current_index + 1]
-        
-        # Add new state
-        current_state = json.dumps(self.data)
-        if current_state != self.history[-1]:  # Only add if state changed
-            self.history.append(current_state)
-            self.current_index += 1
-            
-            # Trim history if too long
-            if len(self.history) > self.max_history:
-                self.history.pop(0)
-                self.current_index -= 1
-
     def undo(self):
-        """Restore previous state"""
-        if self.current_index > 0:
-            self.current_index -= 1
-            self.data = json.loads(self.history[self.current_index])
-            self.save_data()
+        """Revert the last action by applying its inverse operations"""
+        if self.ledger.undo(source="gui"):
             self.update_all_displays()
 
     def redo(self):
-        """Restore next state"""
-        if self.current_index < len(self.history) - 1:
-            self.current_index += 1
-            self.data = json.loads(self.history[self.current_index])
-            self.save_data()
+        """Reapply the last undone action"""
+        if self.ledger.redo(source="gui"):
             self.update_all_displays()
 
     def clear_data(self):
@@ -1593,34 +1603,35 @@ class FinanceManager:
         if messagebox.askyesno("Confirm Clear", 
                              "Are you sure you want to clear all financial data? This cannot be undone."):
             # Keep settings and PIN
-            settings = self.data["settings"]
-            self.data = {
+            cleared = {
                 "monthly_income": 0,
                 "breakdown": {},
                 "expenses": {},
                 "deposits": {},
-                "settings": settings,
                 "recurring_expenses": [],
                 "savings_goals": []
             }
-            self.add_to_history()
-            self.save_data()
+            ops = [set_op([key], value) for key, value in cleared.items()]
+            ops += [delete_op([key]) for key in self.data
+                    if key not in cleared and key not in ("settings", "rollups")]
+            self.record(*ops)
             self.update_all_displays()
             messagebox.showinfo("Success", "All financial data has been cleared.")
 
-    def save_data(self):
-        """Save current data to file"""
-        with open(DATA_FILE, "w") as f:
-            json.dump(self.data, f, indent=4)
+    def record(self, *ops, undoable=True):
+        """Send ledger operations to the ledger service as one undo entry"""
+        self.ledger.record(*ops, undoable=undoable, source="gui")
 
     def update_all_displays(self):
         """Update all UI displays"""
-        self.update_balance_display()
-        self.update_recurring_display()
-        self.update_goals_display()
-        self.update_calendar()
-        self.entry_income.delete(0, tk.END)
-        self.entry_income.insert(0, str(self.data.get("monthly_income", 0)))
+        with self.ledger.lock:
+            self.update_balance_display()
+            self.update_recurring_display()
+            self.update_goals_display()
+            self.update_calendar()
+            self.update_search_results()
+            self.entry_income.delete(0, tk.END)
+            self.entry_income.insert(0, str(self.data.get("monthly_income", 0)))
 
     def edit_env_file(self):
         """Open a dialog to edit the .env file with Telegram config guide"""
@@ -1681,7 +1692,7 @@ class FinanceManager:
             return
         def run_bot():
             try:
-                telegram_bot.main()
+                telegram_bot.main(self.ledger)
             except Exception as e:
                 print(f"Telegram bot error: {e}")
         import threading
@@ -1706,8 +1717,7 @@ class FinanceManager:
         return not os.path.exists(CONFIG_PATH)
 
     def save_first_launch(self):
-        with open(CONFIG_PATH, "w") as f:
-            json.dump({"first_launch": False}, f)
+        get_saver().save_json(CONFIG_PATH, {"first_launch": False})
 
     def prompt_start_telegram_bot(self):
         choice = messagebox.askyesno(
@@ -1719,13 +1729,19 @@ class FinanceManager:
             install_telegram_bot_service()
 
 def main():
+    # GUI and bot share one ledger service instead of each reading and writing the files
+    ledger = open_ledger_service()
+    load_or_create_data(ledger)
     # Start the Telegram bot in a background thread
     import threading
-    telegram_thread = threading.Thread(target=telegram_bot.main, daemon=True)
+    telegram_thread = threading.Thread(target=telegram_bot.main, args=(ledger,), daemon=True)
     telegram_thread.start()
     # Start the FinanceManager GUI
-    app = FinanceManager()
+    app = FinanceManager(ledger)
     app.root.mainloop()
+    # Window closed: write out whatever is still queued
+    get_saver().close()
+    ledger.close()
 
 if __name__ == "__main__":
     main()
@@ -1,91 +1,139 @@
 import os
 import sys
 import json
-import time
-import requests
-from datetime import datetime, date
+import html
+import math
+import asyncio
+import secrets
+import threading
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, date, timedelta
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
+from utils.autocomplete import open_suggestions
+from utils.balance import open_balance
+from utils.chat_ledgers import ChatLedgers
+from utils.conversations import get_conversations
+from utils.dateindex import open_date_index
+from utils.history import open_history
+from utils.journal import open_journal
+from utils.ledger import open_ledger
+from utils.operations import append_op
+from utils.outbox import open_outbox
+from utils.rollups import month_rollup
+from utils.search import open_search
+from utils.telegram_client import TelegramClient, TelegramError
+from utils.webhook import WebhookServer
+from utils.saver import get_saver, write_text_atomic
+
 def resource_path(relative_path):
     base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base_path, relative_path)
 
 DATA_FILE = resource_path("finance_data.json")
 STATE_FILE = resource_path("bot_state.json")  # To store user conversation state
+OUTBOX_FILE = resource_path("telegram_outbox.jsonl")  # Messages not yet delivered
+OFFSET_FILE = resource_path("telegram_offset.json")  # Next getUpdates offset, kept across restarts
+CHATS_DIR = resource_path("chats")  # Ledgers and state of the chats other than TELEGRAM_CHAT_ID
+
+journal = open_journal(DATA_FILE)
+history = open_history(resource_path("undo_history.jsonl"))
+# Replaced by the GUI's service when the bot runs inside Main
+ledger = open_ledger(journal, history)
+
+# Chats besides TELEGRAM_CHAT_ID the bot answers (TELEGRAM_ALLOWED_CHATS; "*" for any), each with its own ledger
+allowed_chats = set()
+chats = None
+_chats_lock = threading.Lock()
+
+def chat_ledgers():
+    """The open per-chat ledgers, at most TELEGRAM_MAX_OPEN_LEDGERS at a time"""
+    global chats
+    with _chats_lock:
+        if chats is None:
+            chats = ChatLedgers(CHATS_DIR, int(os.getenv('TELEGRAM_MAX_OPEN_LEDGERS', "32")), forget_chat)
+        return chats
 
-def load_data():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r") as f:
-            return json.load(f)
-    return {}
+class Chat:
+    """One chat's ledger service and the files holding its conversation state and categories"""
+
+    def __init__(self, chat_id, service=None, directory=None):
+        self.id = str(chat_id)
+        self.service = service
+        if directory:
+            self.state_file = os.path.join(directory, "bot_state.json")
+            self.categories_file = os.path.join(directory, "expense_categories.json")
+        else:
+            self.state_file = STATE_FILE
+            self.categories_file = resource_path("expense_categories.json")
+
+@contextmanager
+def open_chat(owner_id, chat_id):
+    """The owner's chat uses the shared ledger and files; any other chat gets its own shard"""
+    if str(chat_id) == str(owner_id).strip():
+        yield Chat(chat_id)
+        return
+    with chat_ledgers().use(chat_id) as service:
+        yield Chat(chat_id, service, chat_ledgers().directory(chat_id))
+
+def load_data(service=None):
+    # Only reparsed when the GUI (or another process) changed the files
+    data = (service or ledger).refresh()
+    return data if data is not None else {}
 
 def save_data(data):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    ledger.replace(data, source="telegram")
 
-def load_state():
-    if os.path.exists(STATE_FILE):
-        with open(STATE_FILE, "r") as f:
-            return json.load(f)
-    return {}
+def record(*ops, service=None):
+    """Send ledger operations through the chat's ledger service (undoable from the GUI)"""
+    (service or ledger).record(*ops, source="telegram")
 
-def save_state(state):
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=4)
+def load_state(chat=None):
+    # Read from disk once; after that the state lives in memory
+    return get_conversations().load(chat.state_file if chat else STATE_FILE)
 
-def send_telegram_message(token, chat_id, text, reply_markup=None):
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    data = {
-        "chat_id": chat_id,
-        "text": text,
-        "parse_mode": "HTML"
-    }
-    if reply_markup:
-        data["reply_markup"] = json.dumps(reply_markup)
+def save_state(state, chat=None):
+    # Written behind in periodic batches; idle conversations expire
+    get_conversations().save(chat.state_file if chat else STATE_FILE, state)
+
+def load_offset():
     try:
-        requests.post(url, data=data)
-    except Exception as e:
-        print(f"Failed to send Telegram message: {str(e)}")
+        with open(OFFSET_FILE, "r") as f:
+            return json.load(f).get("offset")
+    except (FileNotFoundError, ValueError):
+        return None
 
-def get_daily_summary(data):
+def save_offset(offset):
+    write_text_atomic(OFFSET_FILE, json.dumps({"offset": offset}))
+
+def outbox(token):
+    """The shared outbound queue: rate-limited, retried and kept across restarts"""
+    return open_outbox(OUTBOX_FILE, token)
+
+def send_telegram_message(token, chat_id, text, reply_markup=None):
+    """Queue a message for delivery without waiting on the network"""
+    outbox(token).put(chat_id, text, reply_markup)
+
+def get_daily_summary(data, service=None):
     try:
         today = date.today()
         today_str = today.strftime("%Y-%m-%d")
         month_str = today.strftime("%Y-%m")
 
-        today_expenses = data.get("expenses", {}).get(month_str, {}).get(today_str, [])
-        total_today = sum(expense["amount"] for expense in today_expenses)
+        rollup = month_rollup(data, month_str)
+        total_today = rollup["days"].get(today_str, 0)
 
-        current_month = datetime.now().strftime("%Y-%m")
-        income = data.get("monthly_income", 0)
-        month_expenses = data.get("expenses", {}).get(current_month, {})
-        month_deposits = data.get("deposits", {}).get(current_month, {})
-
-        total_expenses = sum(
-            expense["amount"]
-            for day_expenses in month_expenses.values()
-            for expense in day_expenses
-        )
-        total_deposits = sum(month_deposits.values()) if month_deposits else 0
-        current_balance = income + total_deposits - total_expenses
+        total_deposits = rollup["deposits"]
+        current_balance = open_balance(service or ledger).balance_at(today)
 
         bd = data.get("breakdown", {})
         needs_total = bd.get("needs", 0)
         wants_total = bd.get("wants", 0)
         savings_total = bd.get("savings", 0)
 
-        needs_spent = sum(
-            expense["amount"]
-            for day_expenses in month_expenses.values()
-            for expense in day_expenses
-            if expense["category"].lower() == "needs"
-        )
-        wants_spent = sum(
-            expense["amount"]
-            for day_expenses in month_expenses.values()
-            for expense in day_expenses
-            if expense["category"].lower() == "wants"
-        )
+        needs_spent = rollup["categories"].get("needs", 0)
+        wants_spent = rollup["categories"].get("wants", 0)
         savings_deposited = total_deposits
 
         needs_remaining = max(needs_total - needs_spent, 0)
@@ -111,181 +159,546 @@ def get_today_expenses(data):
     month_str = today.strftime("%Y-%m")
     return data.get("expenses", {}).get(month_str, {}).get(today_str, [])
 
-def get_balance(data):
-    current_month = datetime.now().strftime("%Y-%m")
-    income = data.get("monthly_income", 0)
-    month_expenses = data.get("expenses", {}).get(current_month, {})
-    month_deposits = data.get("deposits", {}).get(current_month, {})
-    total_expenses = sum(
-        expense["amount"]
-        for day_expenses in month_expenses.values()
-        for expense in day_expenses
+def get_balance(service=None):
+    # Month-to-date balance from this month's rollup and deposits (no scan of the expenses)
+    return open_balance(service or ledger).balance_at(date.today())
+
+def get_spend_between(args, service=None):
+    """Reply for 'spent', 'spent week', 'spent month' or 'spent <start> [end]' (YYYY-MM-DD)"""
+    today = date.today()
+    period = args[0].lower() if args else "month"
+    try:
+        if period == "month":
+            start, end = today.replace(day=1), today
+        elif period == "week":
+            start, end = today - timedelta(days=today.weekday()), today
+        else:
+            start = date.fromisoformat(args[0])
+            end = date.fromisoformat(args[1]) if len(args) > 1 else today
+    except ValueError:
+        return "Please use dates like: spent 2025-01-01 2025-01-31"
+    if start > end:
+        start, end = end, start
+    total, count = open_date_index(service or ledger).between(start, end)
+    return (
+        f"🗓 {start.strftime('%d %b %Y')} – {end.strftime('%d %b %Y')}\n"
+        f"💸 Spent: ₹{total:,.2f} ({count} expenses)"
     )
-    total_deposits = sum(month_deposits.values()) if month_deposits else 0
-    return income + total_deposits - total_expenses
-
-def get_categories():
-    cat_file = resource_path("expense_categories.json")
-    if os.path.exists(cat_file):
-        with open(cat_file, "r") as f:
-            categories = json.load(f)
-        return categories
-    return {"needs": [], "wants": []}
-
-def process_user_message(token, chat_id, text, state, data):
-    user_state = state.get(str(chat_id), {})
-    text = text.strip()
-    # If user is in the middle of adding an expense
-    if user_state.get("action") == "add_expense":
-        step = user_state.get("step", 1)
-        if step == 1:
-            # Expecting amount
-            try:
-                amount = float(text)
-                if amount <= 0:
-                    raise ValueError
-                user_state["amount"] = amount
-                user_state["step"] = 2
-                state[str(chat_id)] = user_state
-                save_state(state)
-                reply_markup = {
-                    "keyboard": [["Needs"], ["Wants"]],
-                    "one_time_keyboard": True,
-                    "resize_keyboard": True
-                }
-                return "Is this a 'Needs' or 'Wants' expense?", reply_markup
-            except Exception:
-                return "Please enter a valid positive amount.", None
-        elif step == 2:
-            # Expecting category
-            cat = text.lower()
-            if cat not in ["needs", "wants"]:
-                return "Please reply with 'Needs' or 'Wants'.", None
-            user_state["category"] = cat
-            user_state["step"] = 3
-            state[str(chat_id)] = user_state
-            save_state(state)
-            cats = get_categories()
-            suggestions = cats.get(cat, [])
-            if suggestions:
-                return f"Enter a description for this expense (e.g. {suggestions[0]}):", None
-            else:
-                return "Enter a description for this expense:", None
-        elif step == 3:
-            # Expecting description
-            desc = text.strip()
-            if not desc:
-                return "Description cannot be empty. Please enter a description:", None
-            # Save expense
-            amount = user_state["amount"]
-            category = user_state["category"]
-            description = desc
-            current_date = datetime.now()
-            date_str = current_date.strftime("%Y-%m-%d")
-            month_str = current_date.strftime("%Y-%m")
-            if month_str not in data["expenses"]:
-                data["expenses"][month_str] = {}
-            if date_str not in data["expenses"][month_str]:
-                data["expenses"][month_str][date_str] = []
-            expense = {
-                "amount": amount,
-                "category": category,
-                "description": description,
-                "note": "[Added via Telegram]"
-            }
-            data["expenses"][month_str][date_str].append(expense)
-            save_data(data)
-            # Optionally update categories file with new description
-            cats = get_categories()
-            if description and description not in cats.get(category, []):
-                cats[category].append(description)
-                cat_file = resource_path("expense_categories.json")
-                with open(cat_file, "w") as f:
-                    json.dump(cats, f, indent=4)
-            # Clear state
-            state.pop(str(chat_id), None)
-            save_state(state)
-            return f"Expense added: ₹{amount:.2f} ({category}) - {description}", None
-    # Not in a multi-step action
-    if text.lower() in ["/start", "hi", "hello"]:
-        return (
-            "👋 Hi! I'm your Finance Bot.\n"
-            "You can:\n"
-            "• Type 'add expense' to add a new expense\n"
-            "• Type 'today' to see today's expenses\n"
-            "• Type 'balance' to see your current balance\n"
-            "• Type 'summary' for a daily summary\n"
-            "• Type 'help' for more options"
-        , None)
-    elif text.lower() in ["add expense", "add", "expense"]:
-        user_state = {"action": "add_expense", "step": 1}
-        state[str(chat_id)] = user_state
-        save_state(state)
+
+def search_expenses(query, limit=10, service=None):
+    """Reply for 'search <term>': the newest expenses whose description or note match"""
+    if not query.strip():
+        return "Usage: search <term>  (e.g. search coffee)"
+    results = open_search(service or ledger).search(query, limit=limit + 1)
+    # Replies are sent with parse_mode=HTML
+    shown = html.escape(query)
+    if not results:
+        return f"No expenses matching '{shown}'."
+    lines = [f"🔎 Expenses matching '{shown}':"]
+    for date_str, _, e in results[:limit]:
+        lines.append(f"{date_str} ₹{e['amount']:.2f} - {e['category'].title()} - {html.escape(e['description'])}")
+    if len(results) > limit:
+        lines.append(f"…showing the {limit} most recent.")
+    return "\n".join(lines)
+
+def get_categories(chat=None):
+    cat_file = chat.categories_file if chat else resource_path("expense_categories.json")
+    return get_saver().load_json(cat_file, {"needs": [], "wants": []})
+
+class Message:
+    """One incoming message as the command handlers see it"""
+
+    def __init__(self, token, chat_id, text, state, data, chat=None):
+        self.token = token
+        self.chat_id = str(chat_id)
+        self.text = text.strip()
+        self.state = state
+        self.data = data
+        self.chat = chat
+        self.service = (chat and chat.service) or ledger
+        self.rest = ""  # What follows the command word(s)
+        self.args = []
+
+    def conversation(self):
+        return self.state.get(self.chat_id, {})
+
+    def set_conversation(self, user_state):
+        self.state[self.chat_id] = user_state
+        save_state(self.state, self.chat)
+
+    def end_conversation(self):
+        self.state.pop(self.chat_id, None)
+        save_state(self.state, self.chat)
+
+COMMANDS = {}  # Command word -> handler(message) returning (reply, reply_markup)
+ALIASES = {}  # Other words or phrases -> command word
+ALIAS_WORDS = 1  # Longest alias, in words
+
+def command(name, *aliases):
+    """Register a handler for name; aliases may be single words or phrases like 'add expense'"""
+    global ALIAS_WORDS
+
+    def register(handler):
+        COMMANDS[name] = handler
+        for alias in aliases:
+            ALIASES[alias] = name
+        return handler
+    ALIAS_WORDS = max([ALIAS_WORDS] + [len(alias.split()) for alias in aliases])
+    return register
+
+def route(text):
+    """(handler, text after the command) for a message, or (None, text) if it isn't a command.
+
+    The leading words are looked up in the alias table, longest phrase
+    first, so 'add expense 250' and '/add 250' both reach 'add'.
+    """
+    words = text.split()
+    if not words:
+        return None, text
+    lowered = [w.lower() for w in words[:ALIAS_WORDS]]
+    lowered[0] = lowered[0].lstrip("/").split("@", 1)[0]  # "/add@FinanceBot"
+    for n in range(len(lowered), 0, -1):
+        phrase = " ".join(lowered[:n])
+        name = ALIASES.get(phrase, phrase)
+        if name in COMMANDS:
+            rest = text.split(None, n)
+            return COMMANDS[name], rest[n] if len(rest) > n else ""
+    return None, text
+
+def parse_amount(text):
+    """A positive amount like '250', '1,200.50' or '₹99', or None"""
+    try:
+        amount = float(text.replace(",", "").lstrip("₹"))
+    except ValueError:
+        return None
+    return amount if math.isfinite(amount) and amount > 0 else None
+
+def parse_expenses(text):
+    """'120 needs groceries; 40 wants coffee' -> [(amount, category, description)].
+
+    Entries are separated by ';' or new lines. Raises ValueError naming the
+    first entry that isn't '<amount> needs|wants <description>'.
+    """
+    entries = []
+    for entry in (e.strip() for e in text.replace("\n", ";").split(";")):
+        if not entry:
+            continue
+        words = entry.split(None, 2)
+        amount = parse_amount(words[0])
+        if amount is None or len(words) < 3 or words[1].lower() not in ["needs", "wants"]:
+            raise ValueError(f"Couldn't read '{html.escape(entry)}'. Use: 120 needs groceries; 40 wants coffee")
+        entries.append((amount, words[1].lower(), words[2].strip()))
+    if not entries:
+        raise ValueError("Nothing to add. Use: 120 needs groceries; 40 wants coffee")
+    return entries
+
+def save_expenses(message, entries):
+    """Record [(amount, category, description)] for today as one ledger write; returns the confirmation"""
+    current_date = datetime.now()
+    date_str = current_date.strftime("%Y-%m-%d")
+    month_str = current_date.strftime("%Y-%m")
+    ops = [append_op(["expenses", month_str, date_str], {
+        "amount": amount,
+        "category": category,
+        "description": description,
+        "note": "[Added via Telegram]"
+    }) for amount, category, description in entries]
+    # One journal append and one undo step however many there are
+    record(*ops, service=message.service)
+    # Optionally update categories file with new descriptions
+    cats = get_categories(message.chat)
+    added = False
+    for _, category, description in entries:
+        if description and description not in cats.get(category, []):
+            cats.setdefault(category, []).append(description)
+            added = True
+    if added:
+        get_saver().save_json(message.chat.categories_file if message.chat else resource_path("expense_categories.json"), cats)
+    if len(entries) == 1:
+        amount, category, description = entries[0]
+        return f"Expense added: ₹{amount:.2f} ({category}) - {html.escape(description)}"
+    lines = [f"Added {len(entries)} expenses (₹{sum(e[0] for e in entries):,.2f}):"]
+    lines += [f"₹{amount:.2f} ({category}) - {html.escape(description)}" for amount, category, description in entries]
+    return "\n".join(lines)
+
+def quick_add(message, text):
+    try:
+        entries = parse_expenses(text)
+    except ValueError as e:
+        return str(e), None
+    return save_expenses(message, entries), None
+
+# --- Add-expense wizard: one handler per step, for messages sent while it is active ---
+
+def ask_category(message, user_state):
+    user_state["step"] = 2
+    message.set_conversation(user_state)
+    reply_markup = {
+        "keyboard": [["Needs"], ["Wants"]],
+        "one_time_keyboard": True,
+        "resize_keyboard": True
+    }
+    return "Is this a 'Needs' or 'Wants' expense?", reply_markup
+
+def ask_description(message, user_state):
+    user_state["step"] = 3
+    message.set_conversation(user_state)
+    # Most used descriptions first, offered as one-tap buttons
+    suggestions = open_suggestions(message.service, get_categories(message.chat)).suggest(user_state["category"], limit=4)
+    if suggestions:
+        reply_markup = {
+            "keyboard": [[s] for s in suggestions],
+            "one_time_keyboard": True,
+            "resize_keyboard": True
+        }
+        return f"Enter a description for this expense (e.g. {html.escape(suggestions[0])}):", reply_markup
+    return "Enter a description for this expense:", None
+
+def step_amount(message, user_state):
+    amount = parse_amount(message.text)
+    if amount is None:
+        return "Please enter a valid positive amount.", None
+    user_state["amount"] = amount
+    return ask_category(message, user_state)
+
+def step_category(message, user_state):
+    cat = message.text.lower()
+    if cat not in ["needs", "wants"]:
+        return "Please reply with 'Needs' or 'Wants'.", None
+    user_state["category"] = cat
+    return ask_description(message, user_state)
+
+def step_description(message, user_state):
+    if not message.text:
+        return "Description cannot be empty. Please enter a description:", None
+    reply = save_expenses(message, [(user_state["amount"], user_state["category"], message.text)])
+    message.end_conversation()
+    return reply, None
+
+WIZARDS = {"add_expense": {1: step_amount, 2: step_category, 3: step_description}}
+
+# --- Commands ---
+
+@command("start", "hi", "hello")
+def cmd_start(message):
+    return (
+        "👋 Hi! I'm your Finance Bot.\n"
+        "You can:\n"
+        "• Type 'add expense' to add a new expense (or 'add 250 wants coffee' in one go)\n"
+        "• Type 'today' to see today's expenses\n"
+        "• Type 'balance' to see your current balance\n"
+        "• Type 'summary' for a daily summary\n"
+        "• Type 'help' for more options"
+    , None)
+
+@command("add", "add expense", "expense")
+def cmd_add(message):
+    """'add' starts the wizard; 'add <amount> [needs|wants] [description]' skips the steps given"""
+    args = message.args
+    if ";" in message.rest or "\n" in message.rest:
+        return quick_add(message, message.rest)
+    user_state = {"action": "add_expense", "step": 1}
+    if not args:
+        message.set_conversation(user_state)
         return "Let's add a new expense! How much did you spend? (Enter amount in ₹)", None
-    elif text.lower() in ["today"]:
-        expenses = get_today_expenses(data)
-        if not expenses:
-            return "No expenses for today.", None
-        msg = "Today's Expenses:\n"
-        for e in expenses:
-            msg += f"₹{e['amount']:.2f} - {e['category'].title()} - {e['description']}\n"
-        return msg, None
-    elif text.lower() in ["balance"]:
-        bal = get_balance(data)
-        return f"Current balance: ₹{bal:.2f}", None
-    elif text.lower() in ["summary", "status"]:
-        summary = get_daily_summary(data)
-        return summary if summary else "No data available.", None
-    elif text.lower() in ["help"]:
-        return (
-            "You can use these commands:\n"
-            "• add expense - Add a new expense\n"
-            "• today - Show today's expenses\n"
-            "• balance - Show your current balance\n"
-            "• summary - Show today's summary\n"
-            "Just type what you want to do!"
-        , None)
-    else:
+    amount = parse_amount(args[0])
+    if amount is None:
+        return "Please enter a valid positive amount, e.g. add 250 wants coffee", None
+    user_state["amount"] = amount
+    if len(args) == 1:
+        return ask_category(message, user_state)
+    category = args[1].lower()
+    if category not in ["needs", "wants"]:
+        return "The category must be 'Needs' or 'Wants', e.g. add 250 wants coffee", None
+    user_state["category"] = category
+    if len(args) == 2:
+        return ask_description(message, user_state)
+    return save_expenses(message, [(amount, category, message.rest.split(None, 2)[2])]), None
+
+@command("today")
+def cmd_today(message):
+    expenses = get_today_expenses(message.data)
+    if not expenses:
+        return "No expenses for today.", None
+    msg = "Today's Expenses:\n"
+    for e in expenses:
+        msg += f"₹{e['amount']:.2f} - {e['category'].title()} - {html.escape(e['description'])}\n"
+    return msg, None
+
+@command("balance")
+def cmd_balance(message):
+    bal = get_balance(message.service)
+    return f"Current balance: ₹{bal:.2f}", None
+
+@command("summary", "status")
+def cmd_summary(message):
+    summary = get_daily_summary(message.data, message.service)
+    return summary if summary else "No data available.", None
+
+@command("search")
+def cmd_search(message):
+    return search_expenses(message.rest, service=message.service), None
+
+@command("spent")
+def cmd_spent(message):
+    return get_spend_between(message.args, message.service), None
+
+@command("help")
+def cmd_help(message):
+    return (
+        "You can use these commands:\n"
+        "• add expense - Add a new expense\n"
+        "• add 250 wants coffee - Add an expense in one message\n"
+        "• 120 needs groceries; 40 wants coffee - Add several at once\n"
+        "• today - Show today's expenses\n"
+        "• balance - Show your current balance\n"
+        "• summary - Show today's summary\n"
+        "• spent week / spent month / spent 2025-01-01 2025-01-31 - Spend between dates\n"
+        "• search <term> - Find expenses by description or note\n"
+        "Just type what you want to do!"
+    , None)
+
+def process_user_message(token, chat_id, text, state, data, chat=None):
+    message = Message(token, chat_id, text, state, data, chat)
+    user_state = message.conversation()
+    # If user is in the middle of a multi-step action, the message answers its current step
+    step = WIZARDS.get(user_state.get("action"), {}).get(user_state.get("step", 1))
+    if step:
+        return step(message, user_state)
+    if user_state:
+        # Left over from an older bot or a wizard that no longer exists; treat this as a fresh message
+        message.end_conversation()
+    handler, message.rest = route(message.text)
+    if handler is None and parse_amount(message.text.split(None, 1)[0] if message.text else "") is not None:
+        # Quick add: a message starting with an amount
+        return quick_add(message, message.text)
+    if handler is None:
         return (
             "Sorry, I didn't understand that. Type 'help' for options or 'add expense' to add a new expense."
         , None)
+    message.args = message.rest.split()
+    return handler(message)
+
+# process_user_message reads and rewrites a chat's conversation state
+state_locks = {}
+_state_locks_lock = threading.Lock()
+
+def state_lock(chat_id):
+    with _state_locks_lock:
+        return state_locks.setdefault(str(chat_id), threading.Lock())
+
+def forget_chat(chat_id):
+    """Drop what is kept in memory for a chat whose ledger was closed to make room"""
+    with _state_locks_lock:
+        lock = state_locks.get(str(chat_id))
+        if lock is not None and not lock.locked():
+            del state_locks[str(chat_id)]
+    get_conversations().forget(Chat(chat_id, directory=chat_ledgers().directory(chat_id)).state_file)
+
+def update_chat(chat_id, update):
+    """The chat an update is answered in, or None if the bot doesn't serve it.
+
+    Messages from the configured user (chat_id) always go to their chat;
+    other chats are served if listed in allowed_chats.
+    """
+    msg = update.get("message")
+    if not msg:
+        return None
+    owner = str(chat_id).strip()
+    if str(msg["from"]["id"]) == owner:
+        return owner
+    chat = str(msg["chat"]["id"])
+    if "*" in allowed_chats or chat in allowed_chats:
+        return chat
+    return None
+
+def handle_update(token, chat_id, update):
+    """Run one update through process_user_message in its chat; returns (chat, reply, reply_markup)"""
+    chat_key = update_chat(chat_id, update)
+    if chat_key is None:
+        return None, None, None
+    text = update["message"].get("text", "")
+    with open_chat(chat_id, chat_key) as chat, state_lock(chat_key):
+        data = load_data(chat.service)
+        state = load_state(chat)
+        reply, reply_markup = process_user_message(token, chat_key, text, state, data, chat)
+    return chat_key, reply, reply_markup
+
+class BotRuntime:
+    """Receives updates on asyncio (long polling or a webhook) and handles them concurrently.
+
+    Updates from different senders are handled concurrently, each sender's
+    in order. The (blocking) ledger work runs in worker threads, and replies
+    go through the outbox, so a slow or rate-limited sendMessage never holds
+    up the next update. The getUpdates offset is saved once a batch has been
+    handled, so a restart neither replays nor skips updates; the backlog
+    found at startup is drained in batches with one ledger write each.
+    """
 
-def main():
+    def __init__(self, token, chat_id, client=None):
+        self.token = token
+        self.chat_id = chat_id
+        self.client = client or TelegramClient(token)
+        self.offset = load_offset()
+        self.outbox = outbox(token)
+        self.handling = {}
+        self.pending = set()
+
+    def _after(self, chains, key, work):
+        """Start work() as a task that waits for the previous task chained under key"""
+        previous = chains.get(key)
+
+        async def run():
+            if previous is not None:
+                await asyncio.wait([previous])
+            await work()
+
+        task = asyncio.create_task(run())
+        chains[key] = task
+        self.pending.add(task)
+        task.add_done_callback(lambda t: self._finished(chains, key, t))
+        return task
+
+    def _finished(self, chains, key, task):
+        self.pending.discard(task)
+        if chains.get(key) is task:
+            del chains[key]
+
+    def dispatch(self, update):
+        """Handle an update in the background, after earlier updates from the same chat"""
+        chat = ((update.get("message") or {}).get("chat") or {}).get("id")
+        return self._after(self.handling, chat, lambda: self._handle(update))
+
+    async def _handle(self, update):
+        try:
+            chat, reply, reply_markup = await asyncio.to_thread(handle_update, self.token, self.chat_id, update)
+        except Exception as e:
+            print(f"Failed to handle update {update.get('update_id')}: {e}")
+            return
+        if reply:
+            self.send(chat, reply, reply_markup)
+
+    def send(self, chat_id, text, reply_markup=None):
+        """Queue a reply without waiting for it; replies to one chat keep their order"""
+        self.outbox.put(chat_id, text, reply_markup)
+
+    async def poll_once(self):
+        updates = await self.client.get_updates(self.offset)
+        if not updates:
+            return 0
+        await asyncio.gather(*(self.dispatch(update) for update in updates))
+        await self._commit_offset(updates[-1]["update_id"] + 1)
+        return len(updates)
+
+    async def _commit_offset(self, offset):
+        self.offset = offset
+        await asyncio.to_thread(save_offset, offset)
+
+    def _handle_batch(self, updates):
+        """Handle updates in order with each chat's ledger changes written together; returns the replies"""
+        replies = []
+        with ExitStack() as stack:
+            batched = set()
+            for update in updates:
+                chat_key = update_chat(self.chat_id, update)
+                if chat_key is not None and chat_key not in batched:
+                    chat = stack.enter_context(open_chat(self.chat_id, chat_key))
+                    stack.enter_context((chat.service or ledger).batch(source="telegram"))
+                    batched.add(chat_key)
+                try:
+                    replies.append(handle_update(self.token, self.chat_id, update))
+                except Exception as e:
+                    print(f"Failed to handle update {update.get('update_id')}: {e}")
+        return replies
+
+    async def catch_up(self, batch_size=100):
+        """Drain the updates that queued up while the bot was down; returns how many"""
+        drained = 0
+        while True:
+            updates = await self.client.get_updates(self.offset, limit=batch_size, poll_timeout=0)
+            if not updates:
+                return drained
+            replies = await asyncio.to_thread(self._handle_batch, updates)
+            # Only acknowledge (and reply) once the batch is on disk
+            await self._commit_offset(updates[-1]["update_id"] + 1)
+            for chat, reply, reply_markup in replies:
+                if reply:
+                    self.send(chat, reply, reply_markup)
+            drained += len(updates)
+
+    async def run(self):
+        """Long-poll getUpdates until cancelled"""
+        try:
+            # getUpdates is refused while a webhook is registered
+            await self.client.call("deleteWebhook")
+        except TelegramError as e:
+            print(f"Could not remove webhook: {e}")
+        try:
+            try:
+                drained = await self.catch_up()
+                if drained:
+                    print(f"Caught up on {drained} pending updates")
+            except TelegramError as e:
+                print(f"Catch-up failed, continuing with polling: {e}")
+            print("Finance Telegram Bot started. Polling for messages...")
+            while True:
+                try:
+                    await self.poll_once()
+                except TelegramError as e:
+                    print(f"Polling error: {e}")
+                    await asyncio.sleep(5)
+        finally:
+            await self.close()
+
+    async def run_webhook(self, url, secret, host="127.0.0.1", port=8443):
+        """Register url as the webhook and serve updates POSTed to host:port until cancelled.
+
+        url is the public HTTPS address Telegram posts to (usually a reverse
+        proxy or tunnel in front of host:port); its path is the one served.
+        """
+        server = WebhookServer(self.dispatch, secret, host=host, port=port, path=urlparse(url).path or "/")
+        await server.start()
+        try:
+            await self.client.call("setWebhook", {
+                "url": url, "secret_token": secret, "allowed_updates": ["message"]
+            })
+            print(f"Finance Telegram Bot started. Receiving webhooks on {host}:{server.port}...")
+            await asyncio.Event().wait()
+        finally:
+            await server.close()
+            await self.close()
+
+    async def close(self):
+        if self.pending:
+            await asyncio.wait(list(self.pending), timeout=10)
+        # Whatever is still undelivered stays in the outbox file for the next run
+        await asyncio.to_thread(self.outbox.wait_idle, 10)
+        if chats is not None:
+            await asyncio.to_thread(chats.close)
+        get_conversations().flush()
+        await self.client.close()
+
+def main(service=None):
+    global ledger
+    if service is not None:
+        ledger = service
     load_dotenv()
     token = os.getenv('TELEGRAM_BOT_TOKEN')
     chat_id = os.getenv('TELEGRAM_CHAT_ID')
     if not token or not chat_id:
         print("Telegram bot token or chat ID not set in .env")
         return
-    print("Finance Telegram Bot started. Polling for messages...")
-    last_update_id = None
-    while True:
-        try:
-            url = f"https://api.telegram.org/bot{token}/getUpdates"
-            params = {"timeout": 60}
-            if last_update_id:
-                params["offset"] = last_update_id + 1
-            resp = requests.get(url, params=params, timeout=65)
-            if resp.ok:
-                updates = resp.json().get("result", [])
-                for update in updates:
-                    last_update_id = update["update_id"]
-                    msg = update.get("message")
-                    if not msg:
-                        continue
-                    from_id = str(msg["from"]["id"])
-                    if str(chat_id).strip() != from_id:
-                        continue  # Only respond to configured chat
-                    text = msg.get("text", "")
-                    data = load_data()
-                    state = load_state()
-                    reply, reply_markup = process_user_message(token, chat_id, text, state, data)
-                    if reply:
-                        send_telegram_message(token, chat_id, reply, reply_markup)
-            time.sleep(2)
-        except Exception as e:
-            print(f"Polling error: {e}")
-            time.sleep(5)
+    allowed_chats.update(c.strip() for c in os.getenv('TELEGRAM_ALLOWED_CHATS', "").split(",") if c.strip())
+    ledger.journal.start_compactor()
+    runtime = BotRuntime(token, chat_id)
+    webhook_url = os.getenv('TELEGRAM_WEBHOOK_URL')
+    if webhook_url:
+        host, _, port = os.getenv('TELEGRAM_WEBHOOK_LISTEN', "127.0.0.1:8443").rpartition(":")
+        # Telegram echoes the secret in a header on every POST; without one configured, use a fresh one per run
+        secret = os.getenv('TELEGRAM_WEBHOOK_SECRET') or secrets.token_urlsafe(32)
+        asyncio.run(runtime.run_webhook(webhook_url, secret, host or "127.0.0.1", int(port)))
+    else:
+        asyncio.run(runtime.run())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,19 @@
+import builtins
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def windows_newlines(monkeypatch):
+    """Make text-mode writes in the given modules translate "\\n" to "\\r\\n", as they do on Windows"""
+    def patch(*modules):
+        def windows_open(file, mode="r", *args, **kwargs):
+            if "b" not in mode and any(c in mode for c in "wax+"):
+                kwargs.setdefault("newline", "\r\n")
+            return builtins.open(file, mode, *args, **kwargs)
+        for module in modules:
+            monkeypatch.setattr(module, "open", windows_open, raising=False)
+    return patch
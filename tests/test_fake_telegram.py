@@ -0,0 +1,8 @@
+import pytest
+
+pytest.importorskip("httpx")
+
+from utils.fake_telegram import check
+
+def test_client_against_the_fake_bot_api():
+    assert check() >= 6
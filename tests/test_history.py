@@ -0,0 +1,36 @@
+import utils.history
+from utils.history import OperationHistory
+
+def interleave(path, count):
+    first, second = OperationHistory(path, max_entries=4), OperationHistory(path, max_entries=4)
+    # Loaded, so each push first syncs from its tracked offset
+    first.can_undo()
+    second.can_undo()
+    for i in range(count):
+        (first if i % 2 else second).push([{"n": i}], [{"u": i}])
+    return first, second
+
+def test_two_writers_share_one_history(tmp_path):
+    first, second = interleave(str(tmp_path / "undo_history.jsonl"), 6)
+    fresh = OperationHistory(str(tmp_path / "undo_history.jsonl"), max_entries=4)
+    assert fresh.undo() == [{"u": 5}]
+    assert first.undo() == [{"u": 4}]
+    assert second.redo() == [{"n": 4}]
+
+def test_offsets_survive_newline_translation(tmp_path, windows_newlines):
+    windows_newlines(utils.history)
+    path = str(tmp_path / "undo_history.jsonl")
+    interleave(path, 6)
+    fresh = OperationHistory(path, max_entries=10)
+    fresh.can_undo()
+    assert len(fresh.entries) == 6
+
+def test_reader_notices_compaction_by_another_writer(tmp_path):
+    path = str(tmp_path / "undo_history.jsonl")
+    reader = OperationHistory(path, max_entries=5)
+    writer = OperationHistory(path, max_entries=5)
+    reader.push([{"n": 0}], [{"u": 0}])
+    assert reader.can_undo()
+    for i in range(1, 40):
+        writer.push([{"n": i}], [{"u": i}])
+    assert reader.undo() == [{"u": 39}]
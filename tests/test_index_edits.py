@@ -0,0 +1,53 @@
+from utils.columns import open_columns
+from utils.dateindex import open_date_index
+from utils.history import OperationHistory
+from utils.journal import LedgerJournal
+from utils.ledger import LedgerService
+from utils.operations import append_op, insert_op, pop_op, remove_op, set_op
+from utils.search import open_search
+
+DAY = ["expenses", "2025-03", "2025-03-10"]
+COFFEE = {"amount": 5.0, "category": "Wants", "description": "coffee"}
+TEA = {"amount": 3.0, "category": "Wants", "description": "tea"}
+
+def open_service(tmp_path):
+    service = LedgerService(LedgerJournal(str(tmp_path / "finance_data.json")))
+    service.replace({"expenses": {}, "deposits": {}})
+    service.record(append_op(DAY, dict(COFFEE)))
+    return service
+
+def indexes(service):
+    """Build every index before the edit, so it goes through the incremental path"""
+    built = open_date_index(service), open_columns(service), open_search(service)
+    assert built[0].between("2025-03-10", "2025-03-10") == (5.0, 1)
+    assert built[1].by_category() == {"wants": 5.0}
+    assert len(built[2].search("coffee")) == 1
+    return built
+
+def assert_day(service, dateindex, columns, search, amount, word):
+    assert dateindex.between("2025-03-10", "2025-03-10") == (amount, 1)
+    assert columns.by_category() == {"wants": amount}
+    results = search.search(word)
+    assert [(d, i) for d, i, _ in results] == [("2025-03-10", 0)]
+    assert search.search("coffee" if word != "coffee" else "tea") == []
+    service.close()
+
+def test_edit_in_place_with_remove_and_append(tmp_path):
+    service = open_service(tmp_path)
+    dateindex, columns, search = indexes(service)
+    service.record(remove_op(DAY, dict(COFFEE)), append_op(DAY, dict(TEA)))
+    assert_day(service, dateindex, columns, search, 3.0, "tea")
+
+def test_edit_in_place_with_pop_and_insert(tmp_path):
+    service = open_service(tmp_path)
+    dateindex, columns, search = indexes(service)
+    service.record(pop_op(DAY, 0), insert_op(DAY, 0, dict(TEA)))
+    assert_day(service, dateindex, columns, search, 3.0, "tea")
+
+def test_undo_of_an_edit(tmp_path):
+    service = open_service(tmp_path)
+    service.history = OperationHistory()
+    dateindex, columns, search = indexes(service)
+    service.record(set_op(DAY + [0, "description"], "tea"), set_op(DAY + [0, "amount"], 3.0))
+    service.undo()
+    assert_day(service, dateindex, columns, search, 5.0, "coffee")
@@ -0,0 +1,57 @@
+import utils.journal
+from utils.history import open_history
+from utils.journal import LedgerJournal, open_journal
+from utils.ledger import open_ledger
+from utils.operations import append_op
+
+DAY = ["expenses", "2025-03", "2025-03-10"]
+
+def interleave(path, count):
+    first, second = LedgerJournal(path), LedgerJournal(path)
+    if not first.exists():
+        first.write_snapshot({"expenses": {}, "deposits": {}})
+    first.load()
+    second.load()
+    for i in range(count):
+        writer, reader = (first, second) if i % 2 else (second, first)
+        writer.append(append_op(DAY, {"amount": i, "category": "Wants", "description": f"entry {i}"}))
+        # Catch up from the tracked offset, the way the other process would
+        assert reader.read_tail() is not None
+    return first, second
+
+def descriptions(data):
+    return [e["description"] for e in data["expenses"]["2025-03"]["2025-03-10"]]
+
+def test_two_writers_share_one_journal(tmp_path):
+    path = str(tmp_path / "finance_data.json")
+    interleave(path, 6)
+    assert descriptions(LedgerJournal(path).load()) == [f"entry {i}" for i in range(6)]
+
+def test_offsets_survive_newline_translation(tmp_path, windows_newlines):
+    windows_newlines(utils.journal)
+    path = str(tmp_path / "finance_data.json")
+    first, _ = interleave(path, 6)
+    first.compact()
+    interleave(path, 4)
+    assert descriptions(LedgerJournal(path).load()) == [f"entry {i}" for i in range(6)] + [f"entry {i}" for i in range(4)]
+
+def test_close_stops_the_compactor(tmp_path):
+    journal = LedgerJournal(str(tmp_path / "finance_data.json"))
+    journal.start_compactor()
+    first = journal._compactor
+    journal.close()
+    assert not first.is_alive()
+    journal.start_compactor()
+    assert journal._compactor is not first and journal._compactor.is_alive()
+    journal.close()
+
+def test_closed_ledger_leaves_the_registries(tmp_path):
+    path = str(tmp_path / "finance_data.json")
+    journal = open_journal(path)
+    history = open_history(str(tmp_path / "undo_history.jsonl"))
+    service = open_ledger(journal, history)
+    service.replace({"expenses": {}, "deposits": {}})
+    service.close()
+    assert open_journal(path) is not journal
+    assert open_history(str(tmp_path / "undo_history.jsonl")) is not history
+    open_ledger(open_journal(path)).close()
@@ -0,0 +1,4 @@
+from utils.lockcheck import check
+
+def test_two_writer_processes_lose_nothing():
+    assert check(writers=2, count=150) == 300
@@ -0,0 +1,42 @@
+import pytest
+
+from utils.serialization import FORMATS, MAGIC, dumps, loads, read_document, synthetic_ledger, write_document
+
+def odd_ledger():
+    """Rows and keys the binary columns can't hold, which must come back unchanged"""
+    data = synthetic_ledger(50, months=3)
+    days = data["expenses"]["2020-01"]
+    days.setdefault("2020-01-01", []).append({"amount": 4, "category": "wants", "description": "int amount"})
+    days.setdefault("2020-01-01", []).append({"amount": 1.5, "category": "a\x00b", "description": "nul in category"})
+    days.setdefault("2020-01-02", []).append({"amount": 2.5, "category": "needs", "description": "extra key", "tags": ["x"]})
+    days.setdefault("2020-01-03", []).append({"amount": 3.5, "category": "needs", "description": "Café & <b>", "note": ""})
+    return data
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_round_trip(fmt):
+    data = odd_ledger()
+    assert loads(dumps(data, fmt)) == data
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_round_trip_month_shard(fmt):
+    data = {"expenses": odd_ledger()["expenses"]["2020-01"]}
+    assert loads(dumps(data, fmt)) == data
+
+@pytest.mark.parametrize("key", ["month", "day"])
+def test_nul_in_a_key_falls_back_to_json(key):
+    data = synthetic_ledger(10, months=1)
+    if key == "month":
+        data["expenses"]["2020\x00-01"] = data["expenses"].pop("2020-01")
+    else:
+        days = data["expenses"]["2020-01"]
+        days["2020-01\x00-01"] = days.pop("2020-01-01")
+    payload = dumps(data, "binary")
+    assert payload.startswith(MAGIC)
+    assert loads(payload) == data
+
+def test_write_and_read_document(tmp_path):
+    data = odd_ledger()
+    for fmt in FORMATS:
+        path = str(tmp_path / f"ledger.{fmt}")
+        write_document(path, data, fmt)
+        assert read_document(path) == data
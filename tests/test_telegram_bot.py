@@ -0,0 +1,104 @@
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("httpx")
+
+import telegram_bot as bot
+from utils.journal import LedgerJournal
+from utils.ledger import LedgerService
+
+@pytest.fixture
+def chat(tmp_path):
+    """A chat with its own ledger and state files under tmp_path"""
+    service = LedgerService(LedgerJournal(str(tmp_path / "finance_data.json")))
+    service.replace({"expenses": {}, "deposits": {}})
+    yield bot.Chat("1", service, str(tmp_path))
+    service.close()
+
+def send(chat, text, state):
+    reply, _ = bot.process_user_message("TOKEN", chat.id, text, state, bot.load_data(chat.service), chat)
+    return reply
+
+@pytest.mark.parametrize("text, name, rest", [
+    ("add expense 250 wants coffee", "add", "250 wants coffee"),
+    ("/add@FinanceBot 250", "add", "250"),
+    ("Expense", "add", ""),
+    ("Hello there", "start", "there"),
+    ("STATUS", "summary", ""),
+    ("spent  2025-01-01 2025-01-31", "spent", "2025-01-01 2025-01-31"),
+])
+def test_route(text, name, rest):
+    assert bot.route(text) == (bot.COMMANDS[name], rest)
+
+@pytest.mark.parametrize("text", ["", "   ", "coffee", "250 wants coffee", "added 250"])
+def test_route_not_a_command(text):
+    assert bot.route(text) == (None, text)
+
+def test_aliases_name_commands():
+    assert set(bot.ALIASES.values()) <= set(bot.COMMANDS)
+    assert bot.ALIAS_WORDS == max(len(alias.split()) for alias in bot.ALIASES)
+
+@pytest.mark.parametrize("text, amount", [("250", 250.0), ("1,200.50", 1200.5), ("₹99", 99.0), ("0.5", 0.5)])
+def test_parse_amount(text, amount):
+    assert bot.parse_amount(text) == amount
+
+@pytest.mark.parametrize("text", ["0", "-5", "abc", "", "nan", "inf", "₹", "1.2.3"])
+def test_parse_amount_rejects(text):
+    assert bot.parse_amount(text) is None
+
+@pytest.mark.parametrize("user_state", [{"action": "add_expense", "step": 7}, {"action": "retired_wizard", "step": 1}])
+def test_unknown_step_resets_the_conversation(chat, user_state):
+    state = {chat.id: user_state}
+    assert send(chat, "help", state).startswith("You can use these commands")
+    assert chat.id not in state
+
+def test_wizard(chat):
+    state = {}
+    send(chat, "add expense", state)
+    assert state[chat.id] == {"action": "add_expense", "step": 1}
+    send(chat, "250", state)
+    send(chat, "Wants", state)
+    assert send(chat, "coffee", state) == "Expense added: ₹250.00 (wants) - coffee"
+    assert chat.id not in state
+
+def today_expenses(chat):
+    return bot.get_today_expenses(bot.load_data(chat.service))
+
+def test_parse_expenses():
+    assert bot.parse_expenses("120 needs groceries; 40 Wants coffee beans\n₹1,000 needs rent;") == [
+        (120.0, "needs", "groceries"), (40.0, "wants", "coffee beans"), (1000.0, "needs", "rent")
+    ]
+
+@pytest.mark.parametrize("text", ["", " ; \n", "120 needs", "120 food groceries", "-5 wants tea"])
+def test_parse_expenses_rejects(text):
+    with pytest.raises(ValueError):
+        bot.parse_expenses(text)
+
+def test_quick_add_several(chat):
+    reply = send(chat, "120 needs groceries; 40 wants coffee\n10 wants tea", {})
+    assert reply.splitlines() == [
+        "Added 3 expenses (₹170.00):",
+        "₹120.00 (needs) - groceries", "₹40.00 (wants) - coffee", "₹10.00 (wants) - tea",
+    ]
+    assert [(e["amount"], e["description"]) for e in today_expenses(chat)] == [(120.0, "groceries"), (40.0, "coffee"), (10.0, "tea")]
+    assert bot.get_categories(chat) == {"needs": ["groceries"], "wants": ["coffee", "tea"]}
+
+def test_bad_entry_adds_nothing(chat):
+    reply = send(chat, "120 needs groceries; 4O wants coffee; 10 wants tea", {})
+    assert reply.startswith("Couldn't read '4O wants coffee'")
+    assert today_expenses(chat) == []
+
+def test_descriptions_are_escaped_in_replies(chat):
+    reply = send(chat, "add 50 wants Fish & <Chips>", {})
+    assert reply == "Expense added: ₹50.00 (wants) - Fish &amp; &lt;Chips&gt;"
+    assert send(chat, "10 wants <b>tea</b>; 5 needs salt & pepper", {}).splitlines()[1:] == [
+        "₹10.00 (wants) - &lt;b&gt;tea&lt;/b&gt;", "₹5.00 (needs) - salt &amp; pepper",
+    ]
+    assert send(chat, "10 wants tea; 5 snacks <i>", {}).startswith("Couldn't read '5 snacks &lt;i&gt;'")
+    # Stored as typed; only the reply is HTML
+    assert [e["description"] for e in today_expenses(chat)] == ["Fish & <Chips>", "<b>tea</b>", "salt & pepper"]
+
+def test_balance(chat):
+    chat.service.replace({"monthly_income": 1000, "expenses": {}, "deposits": {}})
+    send(chat, "120 needs groceries; 30 wants coffee", {})
+    assert send(chat, "balance", {}) == "Current balance: ₹850.00"
@@ -0,0 +1,144 @@
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.columns import ExpenseColumns, open_columns
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+PERIODS = ("category", "description", "day", "week", "month")
+
+_analytics = {}
+_analytics_lock = threading.Lock()
+
+def open_analytics(ledger):
+    """Return the analytics engine for a ledger service (one per ledger per process)"""
+    with _analytics_lock:
+        key = id(ledger)
+        if key not in _analytics:
+            _analytics[key] = Analytics(open_columns(ledger))
+            ledger.when_closed(lambda: _analytics.pop(key, None))
+        return _analytics[key]
+
+def analytics_for_expenses(expenses):
+    """A one-off engine over an {month: {date: [...]}} tree (e.g. from the SQLite store)"""
+    columns = ExpenseColumns()
+    columns.rebuild({"expenses": expenses})
+    return Analytics(columns)
+
+def _as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+class Analytics:
+    """Date-range spending queries as pandas reductions.
+
+    The expense DataFrame (date, amount, category and description codes) is
+    built from the columnar store and cached. Expenses recorded since the last
+    query are appended to it; edits, deletions and reloads rebuild it once.
+    Every query returns a pandas Series or DataFrame.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.lock = columns.lock
+        self._frame = None
+        self._generation = None
+        self._rows = 0
+
+    def _build(self, first_row):
+        c = self.columns
+        alive = np.frombuffer(c.alive, dtype=np.int8)[first_row:].astype(bool)
+        # Boolean indexing copies, so no view of the growable arrays outlives this call
+        days = np.frombuffer(c.days, dtype=np.int32)[first_row:][alive]
+        return pd.DataFrame({
+            "date": pd.to_datetime(days.astype(np.int64) - EPOCH_ORDINAL, unit="D"),
+            "amount": np.frombuffer(c.amounts, dtype=np.float64)[first_row:][alive],
+            "category": np.frombuffer(c.categories, dtype=np.int32)[first_row:][alive],
+            "description": np.frombuffer(c.descriptions, dtype=np.int32)[first_row:][alive],
+        })
+
+    def frame(self):
+        """The cached expense DataFrame, brought up to date with the ledger"""
+        with self.lock:
+            c = self.columns
+            c.ensure()
+            if self._frame is None or self._generation != c.generation:
+                self._frame = self._build(0)
+            elif len(c.alive) > self._rows:
+                self._frame = pd.concat([self._frame, self._build(self._rows)], ignore_index=True)
+            self._generation = c.generation
+            self._rows = len(c.alive)
+            return self._frame
+
+    def _select(self, start, end):
+        frame = self.frame()
+        start, end = _as_date(start), _as_date(end)
+        if start is not None:
+            frame = frame[frame["date"] >= pd.Timestamp(start)]
+        if end is not None:
+            frame = frame[frame["date"] <= pd.Timestamp(end)]
+        return frame
+
+    def _names(self, key):
+        names = self.columns.category_names if key == "category" else self.columns.description_names
+        return list(names.names)
+
+    def spending(self, start=None, end=None, by="category"):
+        """Total spent between two dates (inclusive) grouped by one of PERIODS"""
+        if by not in PERIODS:
+            raise ValueError(f"by must be one of {', '.join(PERIODS)}")
+        with self.lock:
+            frame = self._select(start, end)
+            if by in ("category", "description"):
+                names = self._names(by)
+                totals = frame.groupby(by, sort=False)["amount"].sum()
+                totals.index = pd.Index([names[code] for code in totals.index], name=by)
+                return totals.round(6)
+        dates = frame["date"]
+        if by == "week":
+            # Weeks start on Monday
+            dates = dates - pd.to_timedelta(dates.dt.dayofweek, unit="D")
+        elif by == "month":
+            dates = dates.dt.to_period("M")
+        return frame["amount"].groupby(dates.rename(by)).sum().sort_index().round(6)
+
+    def daily(self, start=None, end=None):
+        """Spending per day, including days with nothing spent"""
+        totals = self.spending(start, end, by="day")
+        start, end = _as_date(start), _as_date(end)
+        if totals.empty and (start is None or end is None):
+            return totals
+        days = pd.date_range(start or totals.index.min(), end or totals.index.max(), freq="D", name="day")
+        return totals.reindex(days, fill_value=0.0)
+
+    def rolling_average(self, window=7, start=None, end=None):
+        """Mean daily spending over the trailing `window` days, for each day in the range"""
+        start = _as_date(start)
+        # Reach back so the first days in the range still average a full window
+        lead = start - timedelta(days=window - 1) if start else None
+        average = self.daily(lead, end).rolling(window, min_periods=1).mean().round(6)
+        return average[pd.Timestamp(start):] if start else average
+
+    def month_over_month(self, start=None, end=None):
+        """Per-month spending by category and in total, with the change from the month before.
+
+        Columns are a MultiIndex of ("spent" | "change" | "change_pct", category | "total").
+        """
+        with self.lock:
+            frame = self._select(start, end)
+            names = self._names("category")
+        if frame.empty:
+            return pd.DataFrame()
+        table = frame.pivot_table(
+            index=frame["date"].dt.to_period("M").rename("month"),
+            columns="category", values="amount", aggfunc="sum", fill_value=0.0
+        )
+        table.columns = [names[code] for code in table.columns]
+        table = table.reindex(pd.period_range(table.index.min(), table.index.max(), freq="M", name="month"),
+                              fill_value=0.0)
+        table["total"] = table.sum(axis=1)
+        change_pct = (table.pct_change(fill_method=None) * 100).replace([np.inf, -np.inf], np.nan)
+        return pd.concat({"spent": table, "change": table.diff(), "change_pct": change_pct}, axis=1).round(6)
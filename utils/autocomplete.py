@@ -0,0 +1,124 @@
+import threading
+
+_suggesters = {}
+_suggesters_lock = threading.Lock()
+
+def open_suggestions(ledger, categories=None):
+    """Return the description suggester kept in step with a ledger service.
+
+    categories is the {category: [descriptions]} list from expense_categories.json;
+    its entries are suggested even before they have been used.
+    """
+    with _suggesters_lock:
+        key = id(ledger)
+        if key not in _suggesters:
+            suggester = DescriptionSuggester(ledger, categories)
+            ledger.subscribe(suggester.on_change)
+            ledger.when_closed(lambda: _suggesters.pop(key, None))
+            _suggesters[key] = suggester
+        return _suggesters[key]
+
+class Trie:
+    """Prefix tree of words with use counts; lookups ignore case.
+
+    Nodes are dicts from character to child; the None key of a node holds
+    [count, word] when a word ends there (word keeps its first-seen casing).
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, word, count=1):
+        node = self.root
+        for char in word.lower():
+            node = node.setdefault(char, {})
+        entry = node.get(None)
+        if entry is None:
+            node[None] = [count, word]
+        else:
+            entry[0] += count
+
+    def suggest(self, prefix="", limit=10):
+        """Words starting with prefix, most used first (ties alphabetical)"""
+        node = self.root
+        for char in prefix.lower():
+            node = node.get(char)
+            if node is None:
+                return []
+        entries = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key is None:
+                    entries.append(child)
+                else:
+                    stack.append(child)
+        entries.sort(key=lambda entry: (-entry[0], entry[1].lower()))
+        return [word for _, word in entries[:limit]]
+
+class DescriptionSuggester:
+    """Ranked description suggestions per category, learned from past expenses.
+
+    One trie per category counts how often each description was used.
+    Recorded expenses are added as they happen; any other change to the
+    expenses rebuilds the tries on the next lookup.
+    """
+
+    def __init__(self, ledger=None, categories=None):
+        self.ledger = ledger
+        self.lock = ledger.lock if ledger else threading.RLock()
+        self.categories = categories or {}
+        self.tries = {}
+        self.dirty = True
+
+    def rebuild(self, data):
+        with self.lock:
+            self.tries = {}
+            for category, descriptions in self.categories.items():
+                for description in descriptions:
+                    self._trie(category).add(description, 0)
+            for days in data.get("expenses", {}).values():
+                for items in days.values():
+                    for expense in items:
+                        self._add(expense)
+            self.dirty = False
+
+    def ensure(self):
+        """Build the tries if they are missing or stale; call with the lock held"""
+        if self.dirty:
+            self.rebuild((self.ledger.data if self.ledger else None) or {})
+
+    def _trie(self, category):
+        return self.tries.setdefault(category.lower(), Trie())
+
+    def _add(self, expense):
+        description = expense.get("description")
+        if isinstance(description, str) and description.strip():
+            self._trie(expense.get("category", "")).add(description.strip())
+
+    def on_change(self, ops, source=None):
+        """Ledger listener: count newly recorded descriptions"""
+        with self.lock:
+            if self.dirty:
+                return
+            if ops is None:
+                self.dirty = True
+                return
+            for op in ops:
+                path = op["path"]
+                if path[0] != "expenses":
+                    continue
+                if op["op"] == "append" and len(path) == 3:
+                    self._add(op["value"])
+                else:
+                    # Edits and deletions are rare; recount on the next lookup
+                    self.dirty = True
+                    return
+
+    def suggest(self, category, prefix="", limit=10):
+        """Descriptions for category starting with prefix, most used first"""
+        with self.lock:
+            self.ensure()
+            trie = self.tries.get(category.lower())
+            return trie.suggest(prefix.strip(), limit) if trie else []
@@ -0,0 +1,80 @@
+from datetime import date, timedelta
+
+from utils.dateindex import DateIndex, open_date_index, parse_day
+from utils.rollups import month_rollup
+
+def open_balance(ledger):
+    """Balance series over a ledger service's expense and deposit indexes"""
+    return BalanceSeries(
+        open_date_index(ledger),
+        open_date_index(ledger, "deposits"),
+        lambda: ledger.data or {}
+    )
+
+def balance_for_data(data):
+    """A one-off balance series over a plain ledger dict (e.g. exported from the SQLite store)"""
+    expenses, deposits = DateIndex(), DateIndex(key="deposits")
+    expenses.rebuild(data)
+    deposits.rebuild(data)
+    return BalanceSeries(expenses, deposits, lambda: data)
+
+def _month_start(ordinal):
+    return date.fromordinal(ordinal).replace(day=1).toordinal()
+
+class BalanceSeries:
+    """Balance on any day from running sums of deposits and expenses.
+
+    Income is monthly, so the balance on a day is monthly_income plus the
+    month's deposits minus its expenses up to and including that day, read
+    from that month's rollup and deposits alone. series() also carries every
+    month's surplus forward, crediting the income on the first of each month
+    since the ledger's first entry; it uses the prefix sums, which are only
+    built on its first call.
+    """
+
+    def __init__(self, expenses, deposits, data):
+        self.expenses = expenses
+        self.deposits = deposits
+        self.data = data
+        self.lock = expenses.lock
+
+    def income(self):
+        return self.data().get("monthly_income", 0)
+
+    def _net(self, start, end):
+        return self.deposits.between(start, end)[0] - self.expenses.between(start, end)[0]
+
+    def balance_at(self, day=None):
+        """Month-to-date balance on day (today by default), as the balance display shows it"""
+        day = date.fromordinal(parse_day(day or date.today()))
+        month, day_str = day.strftime("%Y-%m"), day.isoformat()
+        with self.lock:
+            data = self.data()
+            spent = sum(v for d, v in month_rollup(data, month)["days"].items() if d <= day_str)
+            deposits = data.get("deposits", {}).get(month) or {}
+            deposited = sum(v for d, v in deposits.items() if d <= day_str)
+            return round(self.income() + deposited - spent, 6)
+
+    def first_month(self):
+        firsts = [d for d in (self.expenses.first_day(), self.deposits.first_day()) if d]
+        return min(firsts).replace(day=1) if firsts else None
+
+    def series(self, start, end):
+        """[(date, month-to-date balance, cumulative balance)] for every day from start to end"""
+        start, end = parse_day(start), parse_day(end)
+        points = []
+        with self.lock:
+            income = self.income()
+            first = self.first_month()
+            first_index = first.year * 12 + first.month - 1 if first else None
+            for ordinal in range(start, end + 1):
+                day = date.fromordinal(ordinal)
+                carried = self._net(None, ordinal)
+                month_to_date = carried - self._net(None, _month_start(ordinal) - 1)
+                months = day.year * 12 + day.month - first_index if first else 0
+                points.append((day, round(income + month_to_date, 6), round(max(months, 0) * income + carried, 6)))
+        return points
+
+    def last_days(self, days):
+        end = date.today()
+        return self.series(end - timedelta(days=days - 1), end)
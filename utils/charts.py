@@ -3,6 +3,98 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import tkinter as tk
 from tkinter import ttk
 import ttkbootstrap as ttkb
+from datetime import date
+
+def trend_window(months=12):
+    """(start, end) dates covering the current month and the months before it"""
+    today = date.today()
+    index = today.year * 12 + today.month - 1 - (months - 1)
+    return date(index // 12, index % 12 + 1, 1), today
+
+def add_trend_tab(notebook, monthly):
+    """Stacked needs/wants bars per month from {"YYYY-MM": {category: total}}"""
+    trend_frame = ttk.Frame(notebook)
+    notebook.add(trend_frame, text="Monthly Trend")
+
+    fig, ax = plt.subplots(figsize=(7.5, 5.5), dpi=110)
+    if monthly:
+        labels = list(monthly)
+        needs = [monthly[m].get("needs", 0) for m in labels]
+        wants = [monthly[m].get("wants", 0) for m in labels]
+        ax.bar(labels, needs, label="Needs", color="#66c2a5")
+        ax.bar(labels, wants, bottom=needs, label="Wants", color="#fc8d62")
+        ax.set_title("Spending by Month", fontsize=14, fontweight='bold')
+        ax.set_ylabel("₹")
+        ax.tick_params(axis='x', labelrotation=45)
+        ax.legend()
+        fig.tight_layout()
+    else:
+        ax.text(0.5, 0.5, "No spending data available", ha='center', va='center', fontsize=12, color='gray')
+        ax.axis('off')
+
+    canvas = FigureCanvasTkAgg(fig, master=trend_frame)
+    canvas.draw()
+    canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+def add_daily_tab(notebook, analytics, spend_between, days=90, window=7):
+    """Daily spending over the last `days` days with its rolling average and month-over-month change"""
+    daily_frame = ttk.Frame(notebook)
+    notebook.add(daily_frame, text="Daily Spending")
+
+    end = date.today()
+    start = date.fromordinal(end.toordinal() - days + 1)
+    total, count = spend_between(start, end)
+    ttk.Label(daily_frame, text=f"Last {days} days: ₹{total:,.2f} across {count} expenses").pack(pady=(5, 0))
+    daily = analytics.daily(start, end)
+    average = analytics.rolling_average(window, start, end)
+    changes = analytics.month_over_month(date(end.year - (end.month == 1), (end.month - 2) % 12 + 1, 1), end)
+
+    if not changes.empty and len(changes) > 1:
+        change = changes[("change", "total")].iloc[-1]
+        change_pct = changes[("change_pct", "total")].iloc[-1]
+        text = f"This month vs last: {'+' if change >= 0 else '-'}₹{abs(change):,.2f}"
+        if change_pct == change_pct:  # NaN when last month had no spending
+            text += f" ({change_pct:+.1f}%)"
+        ttk.Label(daily_frame, text=text, font=("", 10, "bold")).pack(pady=(5, 0))
+
+    fig, ax = plt.subplots(figsize=(7.5, 5.5), dpi=110)
+    if daily.sum() > 0:
+        ax.bar(daily.index, daily.values, color="#8da0cb", label="Spent")
+        ax.plot(average.index, average.values, color="#e78ac3", linewidth=2, label=f"{window}-day average")
+        ax.set_title(f"Daily Spending (last {days} days)", fontsize=14, fontweight='bold')
+        ax.set_ylabel("₹")
+        ax.legend()
+        fig.autofmt_xdate()
+    else:
+        ax.text(0.5, 0.5, "No spending data available", ha='center', va='center', fontsize=12, color='gray')
+        ax.axis('off')
+
+    canvas = FigureCanvasTkAgg(fig, master=daily_frame)
+    canvas.draw()
+    canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+def add_balance_tab(notebook, points):
+    """Balance over time from [(date, month-to-date balance, cumulative balance)]"""
+    balance_frame = ttk.Frame(notebook)
+    notebook.add(balance_frame, text="Balance")
+
+    fig, ax = plt.subplots(figsize=(7.5, 5.5), dpi=110)
+    if points:
+        days = [p[0] for p in points]
+        ax.plot(days, [p[1] for p in points], color="#66c2a5", linewidth=2, label="Balance this month")
+        ax.plot(days, [p[2] for p in points], color="#8da0cb", linewidth=1.5, linestyle="--", label="Carried over")
+        ax.axhline(0, color="gray", linewidth=0.8)
+        ax.set_title("Balance Over Time", fontsize=14, fontweight='bold')
+        ax.set_ylabel("₹")
+        ax.legend()
+        fig.autofmt_xdate()
+    else:
+        ax.text(0.5, 0.5, "No balance data available", ha='center', va='center', fontsize=12, color='gray')
+        ax.axis('off')
+
+    canvas = FigureCanvasTkAgg(fig, master=balance_frame)
+    canvas.draw()
+    canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
 def create_spending_charts(data_manager, parent):
     # Create a new window for the charts
@@ -132,6 +224,10 @@ def create_spending_charts(data_manager, parent):
     # Pack with expand and center anchor for true centering
     canvas2.get_tk_widget().pack(expand=True, anchor="center")
 
+    add_trend_tab(notebook, data_manager.get_monthly_spending(*trend_window()))
+    add_daily_tab(notebook, data_manager.get_analytics(), data_manager.get_spend_between)
+    add_balance_tab(notebook, data_manager.get_balance_series().last_days(180))
+
     def on_close():
         plt.close('all')
         chart_window.destroy()
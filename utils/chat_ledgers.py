@@ -0,0 +1,93 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from utils.history import open_history
+from utils.journal import open_journal
+from utils.ledger import open_ledger
+
+class ChatLedgers:
+    """Ledger services for many chats, with at most capacity of them open at once.
+
+    Each chat keeps its own snapshot, journal and undo history in a
+    directory under root, so a chat only costs memory while it is among the
+    most recently used. The least recently used ledger is closed (its
+    journal folded) to make room, outside the registry lock so other chats
+    carry on meanwhile, and on_evict(chat id) lets the caller drop whatever
+    else it keeps per chat. use() pins a ledger so it is never closed while
+    a message is being handled, and waits if the chat's ledger is still
+    being closed.
+    """
+
+    def __init__(self, root, capacity=32, on_evict=None):
+        self.root = root
+        self.capacity = capacity
+        self.on_evict = on_evict
+        self.open = OrderedDict()
+        self.pins = {}
+        self.closing = set()
+        self.lock = threading.Condition()
+
+    def directory(self, chat_id):
+        return os.path.join(self.root, str(chat_id))
+
+    def _open(self, chat_id):
+        directory = self.directory(chat_id)
+        os.makedirs(directory, exist_ok=True)
+        journal = open_journal(os.path.join(directory, "finance_data.json"))
+        journal.start_compactor()
+        return open_ledger(journal, open_history(os.path.join(directory, "undo_history.jsonl")))
+
+    def _evict(self):
+        """Take the least recently used unpinned ledgers over capacity out of the table; call locked"""
+        victims = []
+        for chat in list(self.open):
+            if len(self.open) <= self.capacity:
+                break
+            if chat not in self.pins:
+                victims.append((chat, self.open.pop(chat)))
+                self.closing.add(chat)
+        return victims
+
+    def _close(self, victims):
+        for chat, service in victims:
+            try:
+                service.close()
+                if self.on_evict:
+                    self.on_evict(chat)
+            finally:
+                with self.lock:
+                    self.closing.discard(chat)
+                    self.lock.notify_all()
+
+    @contextmanager
+    def use(self, chat_id):
+        """The chat's ledger service, opened if needed and kept open until the block ends"""
+        chat = str(chat_id)
+        with self.lock:
+            while chat in self.closing:
+                self.lock.wait()
+            service = self.open.get(chat)
+            if service is None:
+                service = self.open[chat] = self._open(chat)
+            self.open.move_to_end(chat)
+            self.pins[chat] = self.pins.get(chat, 0) + 1
+            victims = self._evict()
+        self._close(victims)
+        try:
+            yield service
+        finally:
+            with self.lock:
+                self.pins[chat] -= 1
+                if not self.pins[chat]:
+                    del self.pins[chat]
+                victims = self._evict()
+            self._close(victims)
+
+    def close(self):
+        with self.lock:
+            victims = list(self.open.items())
+            self.open.clear()
+            self.closing.update(chat for chat, _ in victims)
+        self._close(victims)
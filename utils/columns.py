@@ -0,0 +1,238 @@
+import threading
+from array import array
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from utils.operations import changed_days
+
+_columns = {}
+_columns_lock = threading.Lock()
+
+def open_columns(ledger):
+    """Return the columnar expense store kept in step with a ledger service"""
+    with _columns_lock:
+        key = id(ledger)
+        if key not in _columns:
+            columns = ExpenseColumns(ledger)
+            ledger.subscribe(columns.on_change)
+            ledger.when_closed(lambda: _columns.pop(key, None))
+            _columns[key] = columns
+        return _columns[key]
+
+def _ordinal(day):
+    if day is None or isinstance(day, int):
+        return day
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return day.toordinal()
+
+class Interner:
+    """Maps strings to small integer codes and back"""
+
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+    def code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+class ExpenseColumns:
+    """Expenses as parallel typed arrays for fast range aggregation.
+
+    One row per expense: amount (float64), day ordinal and month number
+    (int32), and interned category/description codes. Rows are appended as
+    the ledger records expenses; any other change to a day marks its rows
+    dead and re-adds the day, and the arrays are rebuilt once half of them
+    are dead. Built on first query, so it costs nothing until used. Reads
+    and updates hold the ledger's lock.
+    """
+
+    def __init__(self, ledger=None):
+        self.ledger = ledger
+        self.lock = ledger.lock if ledger else threading.RLock()
+        self.dirty = True
+        self.generation = 0
+        self._reset()
+
+    def _reset(self):
+        # Bumped whenever rows are retired or renumbered; appends keep it
+        self.generation += 1
+        self.amounts = array("d")
+        self.days = array("i")
+        self.months = array("i")
+        self.categories = array("i")
+        self.descriptions = array("i")
+        self.alive = array("b")
+        self.category_names = Interner()
+        self.description_names = Interner()
+        self.rows_by_day = {}
+        self.dead = 0
+
+    def __len__(self):
+        with self.lock:
+            self.ensure()
+            return len(self.alive) - self.dead
+
+    # --- Building and syncing ---
+
+    def rebuild(self, data):
+        with self.lock:
+            self._reset()
+            for month, days in data.get("expenses", {}).items():
+                for date_str, items in days.items():
+                    self._add_day(date_str, items)
+            self.dirty = False
+
+    def ensure(self):
+        """Build the arrays if they are missing or stale; call with the lock held"""
+        if self.dirty:
+            self.rebuild((self.ledger.data if self.ledger else None) or {})
+
+    def _add_row(self, date_str, expense):
+        day = date.fromisoformat(date_str)
+        self.rows_by_day.setdefault(date_str, []).append(len(self.alive))
+        self.amounts.append(expense["amount"])
+        self.days.append(day.toordinal())
+        self.months.append(day.year * 12 + day.month - 1)
+        self.categories.append(self.category_names.code(expense["category"].lower()))
+        self.descriptions.append(self.description_names.code(expense["description"]))
+        self.alive.append(1)
+
+    def _add_day(self, date_str, items):
+        for expense in items:
+            self._add_row(date_str, expense)
+
+    def _drop_day(self, date_str):
+        rows = self.rows_by_day.pop(date_str, [])
+        for row in rows:
+            self.alive[row] = 0
+            self.dead += 1
+        if rows:
+            self.generation += 1
+
+    def _resync_day(self, data, month, date_str):
+        self._drop_day(date_str)
+        self._add_day(date_str, data.get("expenses", {}).get(month, {}).get(date_str, []))
+
+    def on_change(self, ops, source=None):
+        """Ledger listener: fold applied operations into the columns"""
+        with self.lock:
+            if self.dirty:
+                return
+            if ops is None:
+                # Whole ledger replaced or reloaded
+                self.dirty = True
+                return
+            changes = changed_days(ops)
+            if changes is None:
+                self.dirty = True
+                return
+            months, days, appends = changes
+            data = self.ledger.data if self.ledger else {}
+            for month in months:
+                for date_str in [d for d in self.rows_by_day if d.startswith(month)]:
+                    self._drop_day(date_str)
+                for date_str, items in data.get("expenses", {}).get(month, {}).items():
+                    self._add_day(date_str, items)
+            for month, date_str in days:
+                self._resync_day(data, month, date_str)
+            for date_str, expense in appends:
+                self._add_row(date_str, expense)
+            if self.dead > len(self.alive) // 2:
+                self.dirty = True
+
+    # --- Queries ---
+
+    def _mask(self, start, end):
+        """Numpy views plus a boolean mask of live rows with start <= day <= end"""
+        amounts = np.frombuffer(self.amounts, dtype=np.float64)
+        days = np.frombuffer(self.days, dtype=np.int32)
+        mask = np.frombuffer(self.alive, dtype=np.int8).astype(bool)
+        if start is not None:
+            mask &= days >= start
+        if end is not None:
+            mask &= days <= end
+        return amounts, mask
+
+    def _bounds(self, start, end):
+        return (start if start is not None else -1), (end if end is not None else date.max.toordinal())
+
+    def _totals(self, column, start, end):
+        start, end = _ordinal(start), _ordinal(end)
+        with self.lock:
+            self.ensure()
+            codes = getattr(self, column)
+            names = self.category_names if column == "categories" else self.description_names
+            if not len(self.alive):
+                return {}
+            if np is not None:
+                amounts, mask = self._mask(start, end)
+                sums = np.bincount(
+                    np.frombuffer(codes, dtype=np.int32)[mask], weights=amounts[mask], minlength=len(names.names)
+                ).tolist()
+                del amounts, mask
+            else:
+                sums = [0.0] * len(names.names)
+                lo, hi = self._bounds(start, end)
+                for alive, day, amount, code in zip(self.alive, self.days, self.amounts, codes):
+                    if alive and lo <= day <= hi:
+                        sums[code] += amount
+            return {names.names[i]: round(total, 6) for i, total in enumerate(sums) if round(total, 6)}
+
+    def total(self, start=None, end=None):
+        """Total spent between two dates (inclusive; None leaves that side open)"""
+        return round(sum(self.by_category(start, end).values()), 6)
+
+    def by_category(self, start=None, end=None):
+        """{category (lower case): total} for expenses in the range"""
+        return self._totals("categories", start, end)
+
+    def by_description(self, start=None, end=None):
+        """{description: total} for expenses in the range, in order of first use"""
+        return self._totals("descriptions", start, end)
+
+    def by_month(self, start=None, end=None):
+        """{"YYYY-MM": {category: total}} for expenses in the range"""
+        start, end = _ordinal(start), _ordinal(end)
+        result = {}
+        with self.lock:
+            self.ensure()
+            if not len(self.alive):
+                return result
+            width = len(self.category_names.names)
+            if np is not None:
+                amounts, mask = self._mask(start, end)
+                keys = (np.frombuffer(self.months, dtype=np.int32)[mask].astype(np.int64) * width
+                        + np.frombuffer(self.categories, dtype=np.int32)[mask])
+                if not len(keys):
+                    return result
+                first = int(keys.min())
+                sums = np.bincount(keys - first, weights=amounts[mask]).tolist()
+                del amounts, mask
+                cells = ((first + i, total) for i, total in enumerate(sums))
+            else:
+                totals = {}
+                lo, hi = self._bounds(start, end)
+                for alive, day, amount, month, category in zip(
+                    self.alive, self.days, self.amounts, self.months, self.categories
+                ):
+                    if alive and lo <= day <= hi:
+                        key = month * width + category
+                        totals[key] = totals.get(key, 0.0) + amount
+                cells = totals.items()
+            for key, total in cells:
+                total = round(total, 6)
+                if not total:
+                    continue
+                month, category = divmod(key, width)
+                label = f"{month // 12:04d}-{month % 12 + 1:02d}"
+                result.setdefault(label, {})[self.category_names.names[category]] = total
+        return dict(sorted(result.items()))
@@ -0,0 +1,108 @@
+import atexit
+import copy
+import os
+import threading
+import time
+
+from utils.saver import get_saver
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_conversations():
+    """Return the process-wide conversation store, flushed automatically at interpreter exit"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            # Created first so its exit hook runs after ours and writes what we flush
+            get_saver()
+            _store = ConversationStore()
+            atexit.register(_store.close)
+        return _store
+
+class ConversationStore:
+    """Bot conversation state ({chat id: state}) per file, kept in memory and written behind.
+
+    A file is read once; after that load() and save() only touch memory.
+    Every interval seconds the files saved since the last pass are handed to
+    the background saver in one go, so a wizard step costs no disk I/O.
+    Conversations untouched for longer than ttl seconds are dropped, so an
+    abandoned wizard doesn't swallow the next message.
+    """
+
+    def __init__(self, interval=5.0, ttl=1800.0):
+        self.interval = interval
+        self.ttl = ttl
+        self.files = {}
+        self.dirty = set()
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = None
+
+    def load(self, path):
+        """A copy of the state saved for path; pass it back to save() after changing it"""
+        path = os.path.abspath(path)
+        with self.lock:
+            state = self.files.get(path)
+            if state is None:
+                state = self.files[path] = get_saver().load_json(path, {}) or {}
+            self._expire(path, state, time.time())
+            # Handlers get their own copy, so a flush never serialises a dict mid-change
+            return copy.deepcopy(state)
+
+    def save(self, path, state):
+        """Stamp the conversations in state as active and schedule the file for writing"""
+        path = os.path.abspath(path)
+        now = time.time()
+        state = copy.deepcopy(state)
+        with self.lock:
+            self.files[path] = state
+            for conversation in state.values():
+                if isinstance(conversation, dict):
+                    conversation["updated"] = now
+            self.dirty.add(path)
+            self._ensure_worker()
+
+    def _expire(self, path, state, now):
+        for chat, conversation in list(state.items()):
+            if not isinstance(conversation, dict):
+                continue
+            # Conversations saved before stamps existed start their clock now
+            updated = conversation.setdefault("updated", now)
+            if now - updated > self.ttl:
+                del state[chat]
+                self.dirty.add(path)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        """Hand every changed file to the saver now (expiring idle conversations first)"""
+        saver = get_saver()
+        now = time.time()
+        with self.lock:
+            for path, state in self.files.items():
+                self._expire(path, state, now)
+            dirty, self.dirty = self.dirty, set()
+            for path in dirty:
+                saver.save_json(path, self.files[path])
+
+    def forget(self, path):
+        """Hand path's state to the saver if it changed, then drop it from memory"""
+        path = os.path.abspath(path)
+        with self.lock:
+            state = self.files.pop(path, None)
+            if path in self.dirty:
+                self.dirty.discard(path)
+                get_saver().save_json(path, state)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
@@ -4,31 +4,40 @@ import base64
 import bcrypt
 from datetime import datetime, timedelta
 
+from utils.analytics import analytics_for_expenses, open_analytics
+from utils.balance import balance_for_data, open_balance
+from utils.columns import open_columns
+from utils.dateindex import open_date_index
+from utils.journal import open_journal
+from utils.ledger import open_ledger
+from utils.operations import set_op, append_op
+from utils.rollups import month_rollup
+from utils.saver import get_saver
+from utils.serialization import json_dump_args
+from utils.sqlite_backend import SQLiteBackend, migrate_json_to_sqlite
+
 class DataManager:
-    def __init__(self, base_path):
+    def __init__(self, base_path, backend="json"):
+        """backend is "json" (journaled JSON files) or "sqlite" (indexed finance_data.db)"""
         self.base_path = base_path
+        self.backend = backend
         self.data_file = os.path.join(base_path, "finance_data.json")
         self.categories_file = os.path.join(base_path, "expense_categories.json")
         self.recurring_file = os.path.join(base_path, "recurring_expenses.json")
         self.goals_file = os.path.join(base_path, "goals.json")
+        self.db_file = os.path.join(base_path, "finance_data.db")
+        self.journal = open_journal(self.data_file)
+        self.ledger = open_ledger(self.journal)
+        self.columns = open_columns(self.ledger)
+        self.date_index = open_date_index(self.ledger)
+        self.store = None
         self.load_all_data()
 
     def load_all_data(self):
-        # Load main finance data
-        if os.path.exists(self.data_file):
-            with open(self.data_file, "r") as f:
-                self.data = json.load(f)
+        if self.backend == "sqlite":
+            self.load_sqlite()
         else:
-            self.data = {
-                "monthly_income": 0,
-                "breakdown": {},
-                "expenses": {},
-                "deposits": {},
-                "settings": {
-                    "theme": "darkly",
-                    "pin": None
-                }
-            }
+            self.load_json()
 
         # Load expense categories
         if os.path.exists(self.categories_file):
@@ -38,6 +47,22 @@ class DataManager:
             self.categories = ["Groceries", "Transport", "Entertainment", "Food", "Shopping"]
             self.save_categories()
 
+        # Process any pending recurring expenses
+        self.process_recurring_expenses()
+
+    def load_json(self):
+        # Load main finance data (snapshot plus journal), shared with any other writer in this process
+        self.data = self.ledger.load(default={
+            "monthly_income": 0,
+            "breakdown": {},
+            "expenses": {},
+            "deposits": {},
+            "settings": {
+                "theme": "darkly",
+                "pin": None
+            }
+        })
+
         # Load recurring expenses
         if os.path.exists(self.recurring_file):
             with open(self.recurring_file, "r") as f:
@@ -54,34 +79,72 @@ class DataManager:
             self.goals = []
             self.save_goals()
 
-        # Process any pending recurring expenses
-        self.process_recurring_expenses()
+    def load_sqlite(self):
+        first_run = not os.path.exists(self.db_file)
+        if first_run and (self.journal.exists() or os.path.exists(self.recurring_file)
+                          or os.path.exists(self.goals_file)):
+            self.migrate_to_sqlite()
+        elif self.store is None:
+            self.store = SQLiteBackend(self.db_file)
+
+        # Only the header lives in memory; expenses and deposits stay in the database
+        self.data = self.store.load_header()
+        self.data.setdefault("monthly_income", 0)
+        self.data.setdefault("breakdown", {})
+        self.data.setdefault("settings", {"theme": "darkly", "pin": None})
+        self.recurring = self.store.load_list("recurring")
+        self.goals = self.store.load_list("goals")
+
+    def migrate_to_sqlite(self):
+        """Copy the JSON ledger, recurring rules and goals into finance_data.db"""
+        get_saver().flush()
+        data = self.journal.load(default={})
+        recurring = []
+        goals = []
+        if os.path.exists(self.recurring_file):
+            with open(self.recurring_file, "r") as f:
+                recurring = json.load(f)
+        if os.path.exists(self.goals_file):
+            with open(self.goals_file, "r") as f:
+                goals = json.load(f)
+        self.store = migrate_json_to_sqlite(data, recurring, goals, self.db_file)
+
+    def record(self, *ops):
+        if self.store:
+            self.store.apply_ops(ops, self.data)
+            return
+        self.ledger.record(*ops, undoable=False)
 
     def save_data(self):
-        with open(self.data_file, "w") as f:
-            json.dump(self.data, f, indent=4)
+        if self.store:
+            self.store.save_header(self.data)
+            return
+        self.ledger.replace(self.data)
 
     def save_categories(self):
-        with open(self.categories_file, "w") as f:
-            json.dump(self.categories, f, indent=4)
+        get_saver().save_json(self.categories_file, self.categories)
 
     def save_recurring(self):
-        with open(self.recurring_file, "w") as f:
-            json.dump(self.recurring, f, indent=4)
+        if self.store:
+            self.store.save_list("recurring", self.recurring)
+            return
+        get_saver().save_json(self.recurring_file, self.recurring)
 
     def save_goals(self):
-        with open(self.goals_file, "w") as f:
-            json.dump(self.goals, f, indent=4)
+        if self.store:
+            self.store.save_list("goals", self.goals)
+            return
+        get_saver().save_json(self.goals_file, self.goals)
 
     def export_backup(self, backup_path):
         backup_data = {
-            "finance_data": self.data,
+            "finance_data": self.store.export_data(self.data) if self.store else self.data,
             "categories": self.categories,
             "recurring": self.recurring,
             "goals": self.goals
         }
         with open(backup_path, "w") as f:
-            json.dump(backup_data, f, indent=4)
+            json.dump(backup_data, f, default=dict, **json_dump_args())
 
     def import_backup(self, backup_path):
         with open(backup_path, "r") as f:
@@ -91,6 +154,12 @@ class DataManager:
         self.categories = backup_data.get("categories", self.categories)
         self.recurring = backup_data.get("recurring", self.recurring)
         self.goals = backup_data.get("goals", self.goals)
+
+        if self.store:
+            self.store.replace_all(self.data, self.recurring, self.goals)
+            self.data = self.store.load_header()
+            self.save_categories()
+            return
         
         self.save_data()
         self.save_categories()
@@ -100,8 +169,7 @@ class DataManager:
     def set_pin(self, pin):
         salt = bcrypt.gensalt()
         hashed = bcrypt.hashpw(str(pin).encode('utf-8'), salt)
-        self.data["settings"]["pin"] = hashed.decode('utf-8')
-        self.save_data()
+        self.record(set_op(["settings", "pin"], hashed.decode('utf-8')))
 
     def verify_pin(self, pin):
         stored_hash = self.data["settings"].get("pin")
@@ -110,8 +178,7 @@ class DataManager:
         return bcrypt.checkpw(str(pin).encode('utf-8'), stored_hash.encode('utf-8'))
 
     def set_theme(self, theme):
-        self.data["settings"]["theme"] = theme
-        self.save_data()
+        self.record(set_op(["settings", "theme"], theme))
 
     def get_theme(self):
         return self.data["settings"].get("theme", "darkly")
@@ -154,11 +221,6 @@ class DataManager:
     def add_expense(self, amount, category, description, note=None, image_path=None):
         current_month = datetime.now().strftime("%Y-%m")
         today = datetime.now().strftime("%Y-%m-%d")
-        
-        if current_month not in self.data["expenses"]:
-            self.data["expenses"][current_month] = {}
-        if today not in self.data["expenses"][current_month]:
-            self.data["expenses"][current_month][today] = []
             
         expense_entry = {
             "amount": amount,
@@ -175,34 +237,57 @@ class DataManager:
                 image_path = os.path.join(self.base_path, image_path)
             expense_entry["image_path"] = image_path
             
-        self.data["expenses"][current_month][today].append(expense_entry)
-        self.save_data()
+        self.record(append_op(["expenses", current_month, today], expense_entry))
 
-    def get_category_spending(self, month=None):
+    def get_category_spending(self, month=None, start=None, end=None):
+        """(needs/wants totals, per-description totals) for a month, or for start..end when given"""
+        if start or end:
+            return self.get_spending_between(start, end)
         if not month:
             month = datetime.now().strftime("%Y-%m")
+
+        if self.store:
+            return self.store.category_spending(month)
             
-        spending = {"needs": 0, "wants": 0}
-        custom_categories = {}
-        
-        month_data = self.data["expenses"].get(month, {})
-        for day_expenses in month_data.values():
-            for expense in day_expenses:
-                amount = expense["amount"]
-                category = expense["category"].lower()
-                description = expense["description"]
-                
-                # Add to main category (needs/wants)
-                if category in spending:
-                    spending[category] += amount
-                    
-                # Add to custom category
-                if description not in custom_categories:
-                    custom_categories[description] = 0
-                custom_categories[description] += amount
-                
+        rollup = month_rollup(self.data, month)
+        spending = {
+            "needs": rollup["categories"].get("needs", 0),
+            "wants": rollup["categories"].get("wants", 0)
+        }
+        custom_categories = dict(rollup["descriptions"])
         return spending, custom_categories
 
+    def get_spend_between(self, start=None, end=None):
+        """(total spent, number of expenses) between two dates, inclusive"""
+        if self.store:
+            return self.store.spend_between(start, end)
+        return self.date_index.between(start, end)
+
+    def get_spending_between(self, start=None, end=None):
+        if self.store:
+            return self.store.spending_between(start, end)
+        categories = self.columns.by_category(start, end)
+        spending = {"needs": categories.get("needs", 0), "wants": categories.get("wants", 0)}
+        return spending, self.columns.by_description(start, end)
+
+    def get_monthly_spending(self, start=None, end=None):
+        """{"YYYY-MM": {category: total}} for expenses dated start..end"""
+        if self.store:
+            return self.store.monthly_spending(start, end)
+        return self.columns.by_month(start, end)
+
+    def get_balance_series(self):
+        """Running balance over time (see utils/balance.py)"""
+        if self.store:
+            return balance_for_data(self.store.export_data(self.data))
+        return open_balance(self.ledger)
+
+    def get_analytics(self):
+        """Range analytics (pandas) over the current expenses"""
+        if self.store:
+            return analytics_for_expenses(self.store.get_expenses())
+        return open_analytics(self.ledger)
+
     def check_budget_warnings(self):
         current_month = datetime.now().strftime("%Y-%m")
         spending, _ = self.get_category_spending(current_month)
@@ -221,9 +306,10 @@ class DataManager:
         # Check savings
         savings_budget = breakdown.get("savings", 0)
         if savings_budget > 0:
-            savings_deposited = sum(
-                amount for date, amount in self.data["deposits"].get(current_month, {}).items()
-            )
+            if self.store:
+                savings_deposited = self.store.deposit_total(current_month)
+            else:
+                savings_deposited = month_rollup(self.data, current_month)["deposits"]
             if savings_deposited < savings_budget * 0.1:  # Less than 10% saved
                 warnings.append("Warning: You're behind on your savings goal for this month!")
                 
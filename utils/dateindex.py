@@ -0,0 +1,182 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from utils.operations import changed_days
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def open_date_index(ledger, key="expenses"):
+    """Return the date index over ledger[key] ("expenses" or "deposits") kept in step with a ledger service"""
+    with _indexes_lock:
+        slot = (id(ledger), key)
+        if slot not in _indexes:
+            index = DateIndex(ledger, key)
+            ledger.subscribe(index.on_change)
+            ledger.when_closed(lambda: _indexes.pop(slot, None))
+            _indexes[slot] = index
+        return _indexes[slot]
+
+def parse_day(value):
+    """date, "YYYY-MM-DD" or day ordinal -> day ordinal"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = date.fromisoformat(value.strip())
+    return value.toordinal()
+
+class DateIndex:
+    """Per-day totals sorted by date, with running sums for O(log n) window queries.
+
+    days[i] is the ordinal of a day with entries (ascending), amounts[i] and
+    counts[i] that day's totals, and sums[i]/tallies[i] the running totals up
+    to and including it. Expenses recorded on the latest day (the usual case)
+    extend the arrays in O(1); a change to an earlier day updates that day and
+    the running totals after it are recomputed on the next query. Indexes
+    data["expenses"] by default, or data["deposits"] (one amount per day).
+    """
+
+    def __init__(self, ledger=None, key="expenses"):
+        self.ledger = ledger
+        self.key = key
+        self.lock = ledger.lock if ledger else threading.RLock()
+        self.dirty = True
+        self._reset()
+
+    def _reset(self):
+        self.days = array("i")
+        self.amounts = array("d")
+        self.counts = array("i")
+        self.sums = array("d")
+        self.tallies = array("i")
+        self.stale_from = None
+
+    def rebuild(self, data):
+        with self.lock:
+            self._reset()
+            totals = {}
+            for days in data.get(self.key, {}).values():
+                for date_str, value in days.items():
+                    if value:
+                        totals[parse_day(date_str)] = self._day_totals(value)
+            for ordinal in sorted(totals):
+                amount, count = totals[ordinal]
+                self.days.append(ordinal)
+                self.amounts.append(amount)
+                self.counts.append(count)
+            self.stale_from = 0
+            self.dirty = False
+
+    def ensure(self):
+        """Build the index and bring the running totals up to date; call with the lock held"""
+        if self.dirty:
+            self.rebuild((self.ledger.data if self.ledger else None) or {})
+        if self.stale_from is not None:
+            start = self.stale_from
+            del self.sums[start:]
+            del self.tallies[start:]
+            amount = self.sums[-1] if start else 0.0
+            count = self.tallies[-1] if start else 0
+            for i in range(start, len(self.days)):
+                amount += self.amounts[i]
+                count += self.counts[i]
+                self.sums.append(amount)
+                self.tallies.append(count)
+            self.stale_from = None
+
+    def _stale(self, i):
+        if self.stale_from is None or i < self.stale_from:
+            self.stale_from = i
+
+    def _add(self, ordinal, amount, count):
+        """Add amount/count to a day's totals"""
+        i = bisect_left(self.days, ordinal)
+        if i < len(self.days) and self.days[i] == ordinal:
+            self.amounts[i] += amount
+            self.counts[i] += count
+            if i == len(self.days) - 1 and self.stale_from is None:
+                self.sums[i] += amount
+                self.tallies[i] += count
+            else:
+                self._stale(i)
+            return
+        self.days.insert(i, ordinal)
+        self.amounts.insert(i, amount)
+        self.counts.insert(i, count)
+        if i == len(self.days) - 1 and self.stale_from is None:
+            self.sums.append((self.sums[-1] if i else 0.0) + amount)
+            self.tallies.append((self.tallies[-1] if i else 0) + count)
+        else:
+            self._stale(i)
+
+    def _drop_range(self, first, last):
+        """Forget every day with first <= ordinal <= last"""
+        lo, hi = bisect_left(self.days, first), bisect_right(self.days, last)
+        if lo == hi:
+            return
+        for column in (self.days, self.amounts, self.counts):
+            del column[lo:hi]
+        self._stale(lo)
+
+    def _day_totals(self, value):
+        if self.key == "expenses":
+            return sum(e["amount"] for e in value), len(value)
+        return value, 1
+
+    def _load_days(self, days):
+        for date_str, value in days.items():
+            if value:
+                self._add(parse_day(date_str), *self._day_totals(value))
+
+    def on_change(self, ops, source=None):
+        """Ledger listener: fold applied operations into the index"""
+        with self.lock:
+            if self.dirty:
+                return
+            if ops is None:
+                self.dirty = True
+                return
+            changes = changed_days(ops, self.key)
+            if changes is None:
+                self.dirty = True
+                return
+            months, days, appends = changes
+            data = (self.ledger.data if self.ledger else {}).get(self.key, {})
+            for month in months:
+                year, number = map(int, month.split("-"))
+                first = date(year, number, 1).toordinal()
+                last = date(year + number // 12, number % 12 + 1, 1).toordinal() - 1
+                self._drop_range(first, last)
+                self._load_days(data.get(month, {}))
+            for month, date_str in days:
+                ordinal = parse_day(date_str)
+                self._drop_range(ordinal, ordinal)
+                month_days = data.get(month, {})
+                if date_str in month_days:
+                    self._load_days({date_str: month_days[date_str]})
+            for date_str, value in appends:
+                self._add(parse_day(date_str), value["amount"], 1)
+
+    def _window(self, start, end):
+        lo = 0 if start is None else bisect_left(self.days, parse_day(start))
+        hi = len(self.days) if end is None else bisect_right(self.days, parse_day(end))
+        return lo, hi
+
+    def first_day(self):
+        """The earliest indexed date, or None when empty"""
+        with self.lock:
+            self.ensure()
+            return date.fromordinal(self.days[0]) if self.days else None
+
+    def between(self, start=None, end=None):
+        """(total, number of entries) for start <= day <= end; None leaves a side open"""
+        with self.lock:
+            self.ensure()
+            lo, hi = self._window(start, end)
+            if lo >= hi:
+                return 0.0, 0
+            total = self.sums[hi - 1] - (self.sums[lo - 1] if lo else 0.0)
+            count = self.tallies[hi - 1] - (self.tallies[lo - 1] if lo else 0)
+            return round(total, 6), count
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import queue
+import shutil
+import asyncio
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from utils.webhook import text_update
+
+class FakeTelegram:
+    """Local stand-in for the Bot API, for running the bot without Telegram.
+
+    Serves getUpdates (offset, limit and a capped long poll), sendMessage,
+    setWebhook and deleteWebhook on 127.0.0.1 over keep-alive HTTP/1.1.
+    push() queues a user message; sent and calls record what the bot did.
+    fail() makes the next sendMessage answer with an error instead.
+    Point the bot at it with TELEGRAM_API_BASE=<base>.
+    """
+
+    def __init__(self, port=0, max_poll=2.0):
+        self.updates = queue.Queue()
+        self.sent = []
+        self.calls = []
+        self.failures = []
+        self.connections = set()
+        self.next_id = 1
+        self.max_poll = max_poll
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def push(self, text, user_id=1, chat_id=None):
+        """Queue a text message from user_id; returns its update_id"""
+        with self.lock:
+            update_id = self.next_id
+            self.next_id += 1
+        self.updates.put(text_update(update_id, text, user_id, chat_id))
+        return update_id
+
+    def fail(self, status, description="Too Many Requests", retry_after=None):
+        """Answer the next sendMessage with an error (e.g. 429 with retry_after)"""
+        body = {"ok": False, "error_code": status, "description": description}
+        if retry_after is not None:
+            body["parameters"] = {"retry_after": retry_after}
+        self.failures.append((status, body))
+
+    def _get_updates(self, params):
+        offset = params.get("offset")
+        found = []
+        try:
+            found.append(self.updates.get(timeout=min(params.get("timeout", 0), self.max_poll)))
+            while True:
+                found.append(self.updates.get_nowait())
+        except queue.Empty:
+            pass
+        found = [u for u in found if offset is None or u["update_id"] >= offset]
+        limit = params.get("limit")
+        if limit and len(found) > limit:
+            # Hand the rest back for the next poll, in order
+            with self.updates.mutex:
+                self.updates.queue.extendleft(reversed(found[limit:]))
+            found = found[:limit]
+        return 200, {"ok": True, "result": found}
+
+    def _answer(self, method, params):
+        if method == "getUpdates":
+            return self._get_updates(params)
+        if method == "sendMessage":
+            if self.failures:
+                return self.failures.pop(0)
+            with self.lock:
+                self.sent.append(params)
+                return 200, {"ok": True, "result": {"message_id": len(self.sent)}}
+        if method in ("setWebhook", "deleteWebhook"):
+            self.calls.append((method, params))
+            return 200, {"ok": True, "result": True}
+        return 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                fake.connections.add(self.client_address)
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    params = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    params = {}
+                status, body = fake._answer(self.path.rsplit("/", 1)[-1], params)
+                raw = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        return Handler
+
+def check():
+    """Drive TelegramClient and the outbox against the stand-in; raises AssertionError if anything is off"""
+    from utils.outbox import Outbox
+    from utils.telegram_client import TelegramClient, TelegramError
+    fake = FakeTelegram().start()
+
+    async def run():
+        client = TelegramClient("TOKEN", base=fake.base, poll_timeout=1)
+        try:
+            ids = [fake.push(text, user_id=42) for text in ("balance", "today", "help")]
+            first = await client.get_updates(limit=2)
+            assert [u["update_id"] for u in first] == ids[:2], first
+            rest = await client.get_updates(offset=ids[1] + 1)
+            assert [u["message"]["text"] for u in rest] == ["help"], rest
+            assert await client.get_updates(offset=ids[2] + 1, poll_timeout=0) == []
+            await asyncio.gather(*(client.call("sendMessage", {"chat_id": 42, "text": f"reply {i}"}) for i in range(5)))
+            assert sorted(m["text"] for m in fake.sent) == [f"reply {i}" for i in range(5)]
+            fake.fail(429, retry_after=3)
+            try:
+                await client.call("sendMessage", {"chat_id": 42, "text": "throttled"})
+                raise AssertionError("the 429 was not reported")
+            except TelegramError as e:
+                assert e.status == 429 and e.retry_after == 3, e
+            assert await client.call("setWebhook", {"url": "https://example.com/hook"}) is True
+            assert fake.calls == [("setWebhook", {"url": "https://example.com/hook"})]
+        finally:
+            await client.close()
+
+    directory = tempfile.mkdtemp(prefix="outbox-check-")
+    try:
+        asyncio.run(run())
+        # Pooled keep-alive client: a handful of connections for a dozen calls
+        assert len(fake.connections) <= 5, fake.connections
+        outbox = Outbox(os.path.join(directory, "telegram_outbox.jsonl"), "TOKEN", base=fake.base, base_delay=0.1)
+        fake.fail(502, "Bad Gateway")
+        for i in range(3):
+            outbox.put(7, f"queued {i}")
+        assert outbox.wait_idle(10), "outbox never drained"
+        outbox.close()
+        delivered = [m["text"] for m in fake.sent if m["chat_id"] == 7]
+        assert "\n\n".join(delivered).split("\n\n") == [f"queued {i}" for i in range(3)], delivered
+        return len(fake.sent)
+    finally:
+        fake.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    # python -m utils.fake_telegram               check the client against the stand-in
+    # python -m utils.fake_telegram serve [PORT] [USER_ID]
+    #   run it for a bot started with TELEGRAM_API_BASE; each stdin line is sent as a message
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        fake = FakeTelegram(int(sys.argv[2]) if len(sys.argv) > 2 else 8081).start()
+        user_id = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+        print(f"Fake Bot API on {fake.base}; type messages from user {user_id}", flush=True)
+        shown = 0
+
+        def show_replies():
+            global shown
+            while True:
+                threading.Event().wait(0.2)
+                with fake.lock:
+                    replies, shown = fake.sent[shown:], len(fake.sent)
+                for reply in replies:
+                    print(f"-> {reply['chat_id']}: {reply['text']}", flush=True)
+
+        threading.Thread(target=show_replies, daemon=True).start()
+        for line in sys.stdin:
+            if line.strip():
+                fake.push(line.strip(), user_id)
+        fake.close()
+    else:
+        print(f"OK: {check()} messages sent through the fake Bot API")
@@ -0,0 +1,80 @@
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+def _lock(handle, blocking=True):
+    """Lock handle; without blocking, return False at once if another process holds it"""
+    if fcntl:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+    handle.seek(0)
+    if not blocking:
+        try:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+    while True:
+        try:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            return True
+        except OSError:
+            # LK_LOCK gives up after ~10 seconds; keep waiting like flock does
+            time.sleep(0.05)
+
+def _unlock(handle):
+    if fcntl:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        return
+    handle.seek(0)
+    msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+class FileLock:
+    """Advisory exclusive lock shared by every process that uses the same lock file.
+
+    Re-entrant, but not thread-safe: callers hold their own thread lock around it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.depth = 0
+        self.handle = None
+
+    def acquire(self, blocking=True):
+        """Take the lock; with blocking=False, return False instead of waiting for another process"""
+        if self.depth == 0:
+            handle = open(self.path, "a+b")
+            try:
+                locked = _lock(handle, blocking)
+            except Exception:
+                handle.close()
+                raise
+            if not locked:
+                handle.close()
+                return False
+            self.handle = handle
+        self.depth += 1
+        return True
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            try:
+                _unlock(self.handle)
+            finally:
+                self.handle.close()
+                self.handle = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+from utils.filelock import FileLock
+
+_histories = {}
+_histories_lock = threading.Lock()
+
+def open_history(path, max_entries=50):
+    """Return the shared undo history for a file (one per path per process)"""
+    path = os.path.abspath(path)
+    with _histories_lock:
+        if path not in _histories:
+            _histories[path] = OperationHistory(path, max_entries)
+        return _histories[path]
+
+def forget_history(history):
+    """Drop a history whose ledger was closed from the registry"""
+    with _histories_lock:
+        if history.path and _histories.get(os.path.abspath(history.path)) is history:
+            del _histories[os.path.abspath(history.path)]
+
+class OperationHistory:
+    """Undo/redo stack of ledger operations paired with their inverses.
+
+    Each entry only holds the operations of one user action, so memory and
+    the work done by undo/redo grow with the size of the change rather than
+    with the size of the ledger. With a path the stack is kept in an
+    append-only file of push/undo/redo records that survives restarts and is
+    shared with the Telegram bot; it is only read once undo/redo is used.
+
+    Processes sharing the file serialise on an advisory lock file, like the
+    journal does. A compaction starts the file with a new generation record,
+    so a reader whose offset belongs to an older file re-reads it from the top.
+    """
+
+    def __init__(self, path=None, max_entries=50):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = []
+        self.index = 0  # Entries before this index are currently applied
+        self.lock = threading.RLock()
+        self.file_lock = FileLock(os.path.splitext(path)[0] + ".lock") if path else None
+        self.loaded = path is None
+        self.file = None  # (inode, generation) of the file offset points into
+        self.offset = 0
+        self.lines = 0
+        self.unsynced = 0
+
+    def _replay(self, record):
+        kind = record["type"]
+        if kind == "push":
+            del self.entries[self.index:]
+            self.entries.append({"do": record["do"], "undo": record["undo"]})
+            if len(self.entries) > self.max_entries:
+                self.entries.pop(0)
+            self.index = len(self.entries)
+        elif kind == "undo" and self.index > 0:
+            self.index -= 1
+        elif kind == "redo" and self.index < len(self.entries):
+            self.index += 1
+
+    @contextmanager
+    def locked(self):
+        """Hold the history against other threads and other processes"""
+        with self.lock:
+            if self.file_lock is None:
+                yield
+                return
+            with self.file_lock:
+                yield
+
+    def _identity(self, f):
+        """(inode, generation) of an open history file; generation is None before its first compaction"""
+        first = f.readline()
+        generation = None
+        if first.endswith(b"\n"):
+            try:
+                generation = json.loads(first).get("generation")
+            except (ValueError, AttributeError):
+                pass
+        return os.fstat(f.fileno()).st_ino, generation
+
+    def _sync(self):
+        """Load the file on first use, then pick up records other writers appended; call locked"""
+        if self.path is None or not os.path.exists(self.path):
+            self.loaded = True
+            return
+        with open(self.path, "rb") as f:
+            identity = self._identity(f)
+            if identity != self.file or os.fstat(f.fileno()).st_size < self.offset:
+                # Rewritten by another process's compaction: our offset means nothing in it
+                self.entries = []
+                self.index = 0
+                self.offset = 0
+                self.lines = 0
+                self.file = identity
+            f.seek(self.offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    break
+                self.offset += len(raw)
+                self.lines += 1
+                self._replay(record)
+            torn = f.tell() != self.offset
+        if torn:
+            # Drop a record cut short by a crash so later appends stay readable
+            with open(self.path, "r+b") as f:
+                f.truncate(self.offset)
+        self.loaded = True
+
+    def _write(self, line):
+        # Bytes, so no platform newline translation puts the offset out of step with the file
+        raw = line.encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        if self.loaded:
+            self.offset += len(raw)
+            self.lines += 1
+
+    def _compact(self):
+        """Rewrite the file with only the entries that are still reachable; call locked"""
+        generation = uuid.uuid4().hex
+        records = [{"type": "start", "generation": generation}]
+        records += [{"type": "push", "do": e["do"], "undo": e["undo"]} for e in self.entries]
+        records += [{"type": "undo"}] * (len(self.entries) - self.index)
+        content = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode("utf-8")
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.file = (os.stat(self.path).st_ino, generation)
+        self.offset = len(content)
+        self.lines = len(records)
+
+    def _record(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        if self.loaded:
+            # Replay a decoded copy so entries never alias live ledger objects
+            self._replay(json.loads(line))
+        if self.path is None:
+            return
+        self._write(line)
+        if not self.loaded:
+            # Keep the file bounded even if undo is never used this session
+            self.unsynced += 1
+            if self.unsynced > self.max_entries * 4:
+                self._sync()
+        if self.loaded and self.lines > self.max_entries * 4:
+            self._compact()
+
+    def push(self, do_ops, undo_ops):
+        with self.locked():
+            if self.loaded:
+                self._sync()
+            self._record({"type": "push", "do": list(do_ops), "undo": list(undo_ops)})
+
+    def can_undo(self):
+        with self.locked():
+            self._sync()
+            return self.index > 0
+
+    def can_redo(self):
+        with self.locked():
+            self._sync()
+            return self.index < len(self.entries)
+
+    def undo(self):
+        """Step back one entry and return the operations that revert it"""
+        with self.locked():
+            self._sync()
+            if self.index == 0:
+                return None
+            ops = self.entries[self.index - 1]["undo"]
+            self._record({"type": "undo"})
+            return ops
+
+    def redo(self):
+        """Step forward one entry and return the operations that reapply it"""
+        with self.locked():
+            self._sync()
+            if self.index == len(self.entries):
+                return None
+            ops = self.entries[self.index]["do"]
+            self._record({"type": "redo"})
+            return ops
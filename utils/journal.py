@@ -0,0 +1,321 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from utils.filelock import FileLock
+from utils.operations import apply_op
+from utils.serialization import read_document, write_document
+
+SEQ_KEY = "_journal_seq"
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+def open_journal(snapshot_path):
+    """Return the shared journal for a snapshot file (one per path per process)"""
+    path = os.path.abspath(snapshot_path)
+    with _journals_lock:
+        if path not in _journals:
+            journal = LedgerJournal(path)
+            # Imported here because shards builds on this module
+            from utils.shards import ShardedSnapshot, shard_dir
+            if os.path.exists(os.path.join(shard_dir(path), "header.json")):
+                journal.snapshot = ShardedSnapshot(shard_dir(path), journal)
+            _journals[path] = journal
+        return _journals[path]
+
+def forget_journal(journal):
+    """Drop a closed journal from the registry, so the next open_journal() reads the files afresh"""
+    path = os.path.abspath(journal.snapshot_path)
+    with _journals_lock:
+        if _journals.get(path) is journal:
+            del _journals[path]
+
+def file_token(path):
+    """Cheap change token for a file: (inode, size, mtime) or None if missing"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+class FileSnapshot:
+    """The whole ledger kept in a single JSON file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def token(self):
+        return file_token(self.path)
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return None, 0
+        data = read_document(self.path)
+        return data, data.pop(SEQ_KEY, 0)
+
+    def load(self, entries, default=None):
+        """Return (data, snapshot seq) with journal entries newer than the snapshot applied"""
+        data, snapshot_seq = self.read()
+        if data is None:
+            data = default
+        pending = [op for seq, op in entries if seq > snapshot_seq]
+        if pending and data is None:
+            data = {}
+        for op in pending:
+            apply_op(data, op)
+        return data, snapshot_seq
+
+    def needs_fold(self, ops):
+        return False
+
+    def write(self, data, seq):
+        payload = dict(data)
+        payload[SEQ_KEY] = seq
+        write_document(self.path, payload)
+
+    def fold(self, entries, seq):
+        data, _ = self.load(entries, default={})
+        self.write(data, seq)
+
+class LedgerJournal:
+    """Ledger snapshot plus an append-only log of ledger operations.
+
+    Every mutation appends one compact line to the journal, so the cost of an
+    add does not depend on how much history the snapshot holds. A background
+    compactor folds the journal back into the snapshot every so often. The
+    snapshot is a single JSON file unless the ledger has been split by month.
+
+    Processes sharing the files (GUI and bot service) serialise on an advisory
+    lock file, and token() tells a reader whether anything changed on disk.
+    When another process only appended to the journal, read_tail() returns
+    just the new operations, so catching up costs the size of the change.
+    """
+
+    def __init__(self, snapshot_path, journal_path=None, compact_every=200, compact_interval=300):
+        self.snapshot_path = snapshot_path
+        self.snapshot = FileSnapshot(snapshot_path)
+        self.journal_path = journal_path or os.path.splitext(snapshot_path)[0] + ".journal"
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self.lock = threading.RLock()
+        self.file_lock = FileLock(os.path.splitext(snapshot_path)[0] + ".lock")
+        self._token = None
+        self.offset = None  # Bytes of the journal reflected in the loaded data; None forces a full load
+        self.seq = 0
+        self.pending = 0
+        self._wake = threading.Event()
+        self._stop = False
+        self._compactor = None
+
+    def exists(self):
+        return self.snapshot.exists() or os.path.exists(self.journal_path)
+
+    @contextmanager
+    def locked(self):
+        """Hold the journal against other threads and other processes"""
+        with self.lock, self.file_lock:
+            yield
+
+    def token(self):
+        return (self.snapshot.token(), file_token(self.journal_path))
+
+    def changed(self):
+        """True if another process wrote the ledger since this journal last loaded or wrote it"""
+        return self.token() != self._token
+
+    def _mark_seen(self, external):
+        # Leave the token stale after someone else's write so readers still notice it
+        if not external:
+            self._token = self.token()
+
+    def _scan(self, start=0):
+        """Return (entries, highest seq, end offset) from start in the journal, dropping a torn tail"""
+        if not os.path.exists(self.journal_path):
+            return [], 0, 0
+        entries = []
+        top = 0
+        good_offset = start
+        with self.locked():
+            with open(self.journal_path, "rb") as f:
+                f.seek(start)
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(raw)
+                    except ValueError:
+                        break
+                    good_offset += len(raw)
+                    top = max(top, record["seq"])
+                    if "op" in record:
+                        entries.append((record["seq"], record["op"]))
+                torn = f.tell() != good_offset
+            if torn:
+                # A crash mid-append left a partial line; cut it so new appends stay parseable
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(good_offset)
+        return entries, top, good_offset
+
+    def read_entries(self):
+        """Return every (seq, op) in the journal"""
+        return self._scan()[0]
+
+    def read_tail(self):
+        """Operations other processes appended since the last load, or None if a full load is needed.
+
+        Works while the journal only grew, and across a compaction that
+        folded nothing newer than what is already loaded; a snapshot written
+        by replace() or an unseen fold needs load(). Call with the journal locked.
+        """
+        if self.offset is None or self._token is None:
+            return None
+        snapshot_token, journal_token = self.token()
+        if journal_token is None:
+            return None
+        seen_snapshot, seen_journal = self._token
+        start = self.offset
+        if (snapshot_token != seen_snapshot or seen_journal is None
+                or journal_token[0] != seen_journal[0] or journal_token[1] < self.offset):
+            # Rewritten since we last read it: usable only if the snapshot holds exactly what we have
+            base = self._base()
+            if base is None or base[0] > self.seq:
+                return None
+            start = base[1]
+            self.pending = 0
+        entries, top, end = self._scan(start)
+        entries = [(seq, op) for seq, op in entries if seq > self.seq]
+        ops = [op for _, op in entries]
+        if self.snapshot.needs_fold(ops):
+            return None
+        self.offset = end
+        self.seq = max(self.seq, top)
+        self.pending += len(entries)
+        self._token = self.token()
+        return ops
+
+    def _base(self):
+        """(seq, length) of the line a compacted journal starts with, or None"""
+        with open(self.journal_path, "rb") as f:
+            first = f.readline()
+        try:
+            record = json.loads(first)
+        except ValueError:
+            return None
+        if "op" in record:
+            return None
+        return record["seq"], len(first)
+
+    def _begin_write(self):
+        """Catch up with seqs another process used; True if the files moved since we last saw them"""
+        if not self.changed():
+            return False
+        self.seq = max(self.seq, self._scan()[1])
+        # Our data no longer follows the journal byte for byte; the next catch-up reloads
+        self.offset = None
+        return self._token is not None
+
+    def load(self, default=None):
+        """Load the snapshot and replay any journaled operations on top of it"""
+        with self.locked():
+            entries, top, end = self._scan()
+            if self.snapshot.needs_fold([op for _, op in entries]):
+                self.compact()
+                entries, top, end = self._scan()
+            data, snapshot_seq = self.snapshot.load(entries, default)
+            self.seq = max(self.seq, snapshot_seq, top)
+            self.pending = len(entries)
+            self.offset = end
+            self._token = self.token()
+            return data
+
+    def append(self, *ops):
+        """Append operations to the journal as one write"""
+        if not ops:
+            return
+        with self.locked():
+            external = self._begin_write()
+            lines = []
+            for op in ops:
+                self.seq += 1
+                lines.append(json.dumps({"seq": self.seq, "op": op}, separators=(",", ":")))
+            raw = ("\n".join(lines) + "\n").encode("utf-8")
+            # Binary, so the bytes written are the bytes counted into offset
+            with open(self.journal_path, "ab") as f:
+                f.write(raw)
+                f.flush()
+                os.fsync(f.fileno())
+            if self.offset is not None:
+                self.offset += len(raw)
+            self.pending += len(ops)
+            self._mark_seen(external)
+            if self.snapshot.needs_fold(ops):
+                self.compact()
+            elif self.pending >= self.compact_every:
+                self._wake.set()
+
+    def _truncate(self):
+        # The snapshot now covers every journaled seq, so only the seq itself is kept
+        # for other processes to continue from
+        line = (json.dumps({"seq": self.seq}) + "\n").encode("utf-8")
+        with open(self.journal_path, "wb") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending = 0
+        if self.offset is not None:
+            self.offset = len(line)
+
+    def write_snapshot(self, data):
+        """Replace the whole ledger with data (used for imports, clears and restores)"""
+        with self.locked():
+            external = self._begin_write()
+            self.seq += 1
+            self.snapshot.write(data, self.seq)
+            self._truncate()
+            self._mark_seen(external)
+
+    def compact(self):
+        """Fold the journal into the snapshot"""
+        with self.locked():
+            external = self._token is not None and self.changed()
+            entries, top, _ = self._scan()
+            if not entries:
+                return
+            self.seq = max(self.seq, top)
+            if external:
+                # Folds in entries the loaded data hasn't seen; the next catch-up must reload
+                self.offset = None
+            self.snapshot.fold(entries, self.seq)
+            self._truncate()
+            self._mark_seen(external)
+
+    def _run_compactor(self):
+        while not self._stop:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Journal compaction failed: {e}")
+
+    def start_compactor(self):
+        if self._compactor and self._compactor.is_alive():
+            return
+        self._stop = False
+        self._compactor = threading.Thread(target=self._run_compactor, daemon=True)
+        self._compactor.start()
+
+    def close(self):
+        """Stop the compactor and fold whatever is left in the journal"""
+        self._stop = True
+        self._wake.set()
+        if self._compactor is not None and self._compactor is not threading.current_thread():
+            # Wait for it, so a start_compactor() after reopening isn't skipped for a dying thread
+            self._compactor.join()
+            self._compactor = None
+        self.compact()
@@ -0,0 +1,324 @@
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from utils.history import forget_history
+from utils.journal import forget_journal
+from utils.operations import apply_op, apply_with_undo, set_op
+from utils.rollups import ensure_rollups
+
+_services = {}
+_services_lock = threading.Lock()
+
+def open_ledger(journal, history=None):
+    """Return the shared ledger service for a journal (one per ledger per process)"""
+    with _services_lock:
+        service = _services.get(journal.snapshot_path)
+        if service is None:
+            service = LedgerService(journal, history)
+            _services[journal.snapshot_path] = service
+        elif history is not None and service.history is None:
+            service.history = history
+        return service
+
+class LedgerService:
+    """Single owner of the in-memory ledger for the GUI, the Telegram bot and DataManager.
+
+    Writes are queued and applied one at a time on a worker thread, so writers
+    in the same process can no longer overwrite each other, and readers share
+    one loaded copy instead of re-reading finance_data.json. Hold `lock` while
+    walking `data` from another thread. Listeners registered with subscribe()
+    are called on the worker thread after every change.
+
+    Another process (the bot running as a service) is handled through the
+    journal's file lock: every write first picks up whatever that process
+    wrote, and refresh() only touches the files when their token changed.
+    Appended operations are replayed onto the loaded ledger and passed to
+    listeners as usual; only a rewritten snapshot forces a full reload.
+    """
+
+    def __init__(self, journal, history=None):
+        self.journal = journal
+        self.history = history
+        self.data = None
+        self.loaded = False
+        self.lock = threading.RLock()
+        self.listeners = []
+        self.closers = []
+        self._batch = None
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def load(self, default=None):
+        """Load the ledger on first use; later calls return the same data"""
+        with self.lock:
+            if not self.loaded:
+                self._load(default)
+            return self.data
+
+    def _load(self, default=None):
+        self.data = self.journal.load(default)
+        # One-time scan for ledgers saved before monthly rollups existed
+        if self.data is not None and ensure_rollups(self.data):
+            self.journal.append(set_op(["rollups"], self.data["rollups"]))
+        self.loaded = True
+
+    def _catch_up(self):
+        """Pick up what another process wrote; call with the journal locked.
+
+        Returns None if nothing changed, the replayed ops if the journal only
+        grew, or "reload" if the whole ledger had to be read again.
+        """
+        if not self.loaded:
+            self._load()
+            return None
+        if not self.journal.changed():
+            return None
+        ops = self.journal.read_tail()
+        if ops is None or self.data is None:
+            self._load()
+            if self._batch is not None and self.data is not None:
+                # Still to be appended, so they go on top of what the file holds
+                for op in self._batch["ops"]:
+                    apply_op(self.data, op)
+            return "reload"
+        for op in ops:
+            apply_op(self.data, op)
+        if ops and self._batch is not None and self._batch["ops"]:
+            self._batch["mixed"] = True
+        return ops or None
+
+    def _notify_external(self, external):
+        if external:
+            self._notify(None if external == "reload" else external, "external")
+
+    def refresh(self):
+        """Return the ledger, touching the files only if another process changed them"""
+        if self.loaded and not self.journal.changed():
+            # Two stat calls; no trip through the writer thread
+            return self.data
+
+        def command():
+            with self.lock, self.journal.locked():
+                external = self._catch_up()
+            self._notify_external(external)
+            return self.data
+        return self.call(command)
+
+    def subscribe(self, listener):
+        """Call listener(ops, source) after each change; ops is None when the ledger was replaced"""
+        self.listeners.append(listener)
+
+    def when_closed(self, callback):
+        """Call callback() when the service is closed, e.g. to drop indexes built on it"""
+        self.closers.append(callback)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _notify(self, ops, source):
+        for listener in list(self.listeners):
+            try:
+                listener(ops, source)
+            except Exception as e:
+                print(f"Ledger listener failed: {e}")
+
+    # --- Command queue ---
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            command, future = self._queue.get()
+            if command is None:
+                future.set_result(None)
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(command())
+            except Exception as e:
+                future.set_exception(e)
+
+    def submit(self, command):
+        """Queue command() to run on the writer thread and return its Future"""
+        future = Future()
+        self._queue.put((command, future))
+        self._ensure_worker()
+        return future
+
+    def call(self, command):
+        """Run command() on the writer thread and wait for its result"""
+        if threading.current_thread() is self._worker:
+            # Already on the writer (e.g. a listener recording a follow-up change)
+            return command()
+        return self.submit(command).result()
+
+    # --- Writes ---
+
+    @contextmanager
+    def batch(self, source=None):
+        """Write the changes recorded with source inside the block as one journal append.
+
+        Changes are still applied (and listeners told) one by one, so reads
+        inside the block see them, and each recorded group stays its own undo
+        step. The journal is only locked while each change is applied and for
+        the final append, so readers loading months are never held up. A
+        record from another source writes out what is buffered first and then
+        goes straight to the journal. Don't use from the writer thread.
+        """
+        self.call(lambda: self._begin_batch(source))
+        try:
+            yield self
+        finally:
+            self.call(self._end_batch)
+
+    def _begin_batch(self, source):
+        if self._batch is not None:
+            self._batch["depth"] += 1
+            return
+        self._batch = {"depth": 1, "source": source, "ops": [], "history": [], "mixed": False}
+
+    def _flush_batch(self):
+        """Append what the batch holds back; call on the writer thread"""
+        batch = self._batch
+        if batch is None or not batch["ops"]:
+            return
+        with self.lock, self.journal.locked():
+            self.journal.append(*batch["ops"])
+            for do_ops, undo_ops in batch["history"]:
+                self.history.push(do_ops, undo_ops)
+            # Another process wrote between our buffered changes, so the file
+            # holds them in a different order than memory: read it back
+            reload = batch["mixed"]
+            if reload:
+                self._load()
+            batch["ops"], batch["history"], batch["mixed"] = [], [], False
+        if reload:
+            self._notify(None, "external")
+
+    def _end_batch(self):
+        batch = self._batch
+        batch["depth"] -= 1
+        if batch["depth"]:
+            return
+        try:
+            self._flush_batch()
+        finally:
+            self._batch = None
+
+    def record(self, *ops, undoable=True, source=None):
+        """Apply and journal one group of operations; undoable groups go to the history"""
+        if ops:
+            self.call(lambda: self._record(lambda data: ops, undoable, source))
+
+    def record_with(self, build, undoable=True, source=None):
+        """Record the ops build(data) returns, computed from the latest ledger under the lock.
+
+        For read-modify-write changes, so an update made meanwhile by another
+        writer is built upon instead of overwritten. Returns the recorded ops.
+        """
+        return self.call(lambda: self._record(build, undoable, source))
+
+    def _record(self, build, undoable, source):
+        batch = self._batch
+        if batch is not None and batch["source"] != source:
+            # Not part of the batch: keep the journal in the order memory saw
+            self._flush_batch()
+            batch = None
+        with self.lock, self.journal.locked():
+            # Apply on top of the latest state so index-based ops hit the right items
+            external = self._catch_up()
+            if self.data is None:
+                self.data = {}
+            ops = list(build(self.data) or [])
+            undo_ops = None
+            if undoable and ops and self.history is not None:
+                undo_ops = apply_with_undo(self.data, ops)
+            else:
+                for op in ops:
+                    apply_op(self.data, op)
+            if batch is not None:
+                batch["ops"].extend(ops)
+                if undo_ops is not None:
+                    batch["history"].append((ops, undo_ops))
+            else:
+                self.journal.append(*ops)
+                if undo_ops is not None:
+                    self.history.push(ops, undo_ops)
+        self._notify_external(external)
+        if ops:
+            self._notify(ops, source)
+        return ops
+
+    def undo(self, source=None):
+        """Revert the last undoable group; returns the applied ops or None"""
+        return self.call(lambda: self._step(self.history.undo, source))
+
+    def redo(self, source=None):
+        return self.call(lambda: self._step(self.history.redo, source))
+
+    def _step(self, step, source):
+        with self.lock, self.journal.locked():
+            external = self._catch_up()
+            # Whatever a batch holds back has to be on disk before the history moves
+            self._flush_batch()
+            ops = step()
+            if ops:
+                for op in ops:
+                    apply_op(self.data, op)
+                # Only the patch is persisted, not the whole ledger
+                self.journal.append(*ops)
+        self._notify_external(external)
+        if ops:
+            self._notify(ops, source)
+        return ops or None
+
+    def replace(self, data, source=None):
+        """Swap in a whole new ledger and write it as the snapshot"""
+        def command():
+            with self.lock:
+                self._flush_batch()
+                ensure_rollups(data)
+                self.journal.write_snapshot(data)
+                self.data = data
+                self.loaded = True
+            self._notify(None, source)
+        self.call(command)
+
+    def reload(self, source=None):
+        """Re-read the ledger from disk (after its storage layout changed)"""
+        def command():
+            with self.lock:
+                self._flush_batch()
+                self._load()
+            self._notify(None, source)
+        self.call(command)
+
+    def close(self):
+        """Finish queued writes, stop the worker and fold the journal.
+
+        The service, its journal and its history are dropped from their
+        registries, so opening the same ledger afterwards starts fresh ones.
+        """
+        if self._worker is not None and self._worker.is_alive():
+            future = Future()
+            self._queue.put((None, future))
+            future.result()
+        self.journal.close()
+        with _services_lock:
+            if _services.get(self.journal.snapshot_path) is self:
+                del _services[self.journal.snapshot_path]
+        forget_journal(self.journal)
+        if self.history is not None:
+            forget_history(self.history)
+        closers, self.closers = self.closers, []
+        for callback in closers:
+            callback()
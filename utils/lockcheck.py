@@ -0,0 +1,65 @@
+import os
+import sys
+import random
+import shutil
+import tempfile
+import subprocess
+
+from utils.history import open_history
+from utils.journal import LedgerJournal, open_journal
+from utils.ledger import open_ledger
+from utils.operations import append_op, set_op
+
+DAY = ("expenses", "2025-01", "2025-01-01")
+
+def writer(directory, name, count):
+    """Hammer the ledger in directory the way the GUI and the bot service do"""
+    journal = open_journal(os.path.join(directory, "finance_data.json"))
+    journal.compact_every = 50
+    journal.start_compactor()
+    ledger = open_ledger(journal, open_history(os.path.join(directory, "undo_history.jsonl"), max_entries=10))
+    for i in range(count):
+        ledger.record(append_op(list(DAY), {"amount": 1, "category": "Needs", "description": f"{name} {i}"}))
+        if i % 10 == 0:
+            # Read-modify-write: lost if the other process's increment isn't seen first
+            ledger.record_with(lambda data: [set_op(["counter"], data.get("counter", 0) + 1)], undoable=False)
+        if random.random() < 0.05:
+            journal.compact()
+        if random.random() < 0.1:
+            ledger.refresh()
+    ledger.close()
+
+def check(writers=2, count=300):
+    """Run writers processes against one fresh ledger; raises AssertionError if anything was lost"""
+    directory = tempfile.mkdtemp(prefix="ledger-lockcheck-")
+    try:
+        open_ledger(open_journal(os.path.join(directory, "finance_data.json"))).replace({"expenses": {}, "deposits": {}})
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        processes = [
+            subprocess.Popen([sys.executable, "-m", "utils.lockcheck", "writer", directory, f"w{n}", str(count)], cwd=root)
+            for n in range(writers)
+        ]
+        for process in processes:
+            assert process.wait() == 0, "a writer process failed"
+        data = LedgerJournal(os.path.join(directory, "finance_data.json")).load()
+        descriptions = [e["description"] for e in data["expenses"]["2025-01"]["2025-01-01"]]
+        expected = {f"w{n} {i}" for n in range(writers) for i in range(count)}
+        assert len(descriptions) == len(expected), f"{len(descriptions)} expenses, expected {len(expected)}"
+        assert set(descriptions) == expected, "expenses were lost or duplicated"
+        increments = writers * len(range(0, count, 10))
+        assert data["counter"] == increments, f"counter {data['counter']}, expected {increments}"
+        assert data["rollups"]["months"]["2025-01"]["total"] == len(expected), "rollups out of step"
+        undoable = open_history(os.path.join(directory, "undo_history.jsonl"), max_entries=10).can_undo()
+        assert undoable, "undo history unreadable"
+        return len(descriptions)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    # python -m utils.lockcheck [WRITERS] [COUNT]   (run from the project directory)
+    if len(sys.argv) > 1 and sys.argv[1] == "writer":
+        writer(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    else:
+        writers = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+        print(f"OK: {check(writers, count)} expenses from {writers} processes, none lost")
@@ -0,0 +1,169 @@
+import copy
+from collections.abc import Mapping
+
+from utils.rollups import apply_with_rollups
+
+def set_op(path, value):
+    return {"op": "set", "path": list(path), "value": value}
+
+def delete_op(path):
+    return {"op": "delete", "path": list(path)}
+
+def append_op(path, value):
+    return {"op": "append", "path": list(path), "value": value}
+
+def insert_op(path, index, value):
+    return {"op": "insert", "path": list(path), "index": index, "value": value}
+
+def pop_op(path, index):
+    return {"op": "pop", "path": list(path), "index": index}
+
+def remove_op(path, value):
+    return {"op": "remove", "path": list(path), "value": value}
+
+def _walk(data, path):
+    """Return the container holding the last key of path, creating dicts on the way"""
+    parent = data
+    for key in path[:-1]:
+        if isinstance(parent, list):
+            parent = parent[key]
+        else:
+            if key not in parent:
+                parent[key] = {}
+            parent = parent[key]
+    return parent
+
+def _missing_prefix(data, path):
+    """Return the shortest prefix of path that does not exist yet, or None"""
+    node = data
+    for i, key in enumerate(path):
+        if isinstance(node, list):
+            if not -len(node) <= key < len(node):
+                return path[:i + 1]
+        elif not isinstance(node, Mapping) or key not in node:
+            return path[:i + 1]
+        node = node[key]
+    return None
+
+def apply_op(data, op):
+    """Apply a single ledger operation to data in place, keeping monthly rollups current"""
+    apply_with_rollups(data, op, apply_raw_op)
+
+def apply_raw_op(data, op):
+    """Apply an operation without touching rollups"""
+    kind = op["op"]
+    path = op["path"]
+    if kind in ("delete", "pop", "remove") and _missing_prefix(data, path):
+        return
+    parent = _walk(data, path)
+    key = path[-1]
+
+    if kind == "set":
+        parent[key] = op["value"]
+    elif kind == "delete":
+        if isinstance(parent, list):
+            parent.pop(key)
+        else:
+            parent.pop(key, None)
+    elif kind == "append":
+        if not isinstance(parent, list) and key not in parent:
+            parent[key] = []
+        parent[key].append(op["value"])
+    elif kind == "insert":
+        if not isinstance(parent, list) and key not in parent:
+            parent[key] = []
+        parent[key].insert(op["index"], op["value"])
+    elif kind == "pop":
+        if parent[key]:
+            parent[key].pop(op["index"])
+    elif kind == "remove":
+        # Remove the most recent matching entry
+        items = parent[key]
+        for i in range(len(items) - 1, -1, -1):
+            if items[i] == op["value"]:
+                items.pop(i)
+                break
+    else:
+        raise ValueError(f"Unknown ledger operation: {kind}")
+
+def apply_ops(data, ops):
+    for op in ops:
+        apply_op(data, op)
+    return data
+
+def invert_op(data, op):
+    """Return the operations that undo op; call before op is applied to data"""
+    kind = op["op"]
+    path = op["path"]
+    missing = _missing_prefix(data, path)
+
+    if kind in ("append", "insert"):
+        if missing:
+            # The container did not exist before; undo removes it entirely
+            return [delete_op(missing)]
+        if kind == "append":
+            return [remove_op(path, copy.deepcopy(op["value"]))]
+        return [pop_op(path, op["index"])]
+
+    if missing:
+        if kind == "set":
+            return [delete_op(missing)]
+        return []
+
+    parent = _walk(data, path)
+    key = path[-1]
+    if kind == "set":
+        return [set_op(path, copy.deepcopy(parent[key]))]
+    if kind == "delete":
+        if isinstance(parent, list):
+            return [insert_op(path[:-1], key, copy.deepcopy(parent[key]))]
+        return [set_op(path, copy.deepcopy(parent[key]))]
+    if kind == "pop":
+        items = parent[key]
+        if not -len(items) <= op["index"] < len(items):
+            return []
+        index = op["index"] if op["index"] >= 0 else len(items) + op["index"]
+        return [insert_op(path, index, copy.deepcopy(items[index]))]
+    if kind == "remove":
+        items = parent[key]
+        for i in range(len(items) - 1, -1, -1):
+            if items[i] == op["value"]:
+                return [insert_op(path, i, copy.deepcopy(items[i]))]
+        return []
+    raise ValueError(f"Unknown ledger operation: {kind}")
+
+def apply_with_undo(data, ops):
+    """Apply ops to data and return the operations that revert all of them"""
+    undo_groups = []
+    for op in ops:
+        undo_groups.append(invert_op(data, op))
+        apply_op(data, op)
+    return [inverse for group in reversed(undo_groups) for inverse in group]
+
+def changed_days(ops, key="expenses"):
+    """Sort one group of applied ops on data[key] for an index that listens to the ledger.
+
+    Returns None if data[key] itself was replaced, else (months, days, appends):
+    the months and (month, day) pairs to re-derive once from the ledger as it
+    is after the whole group, and the (day, value) appends that can be added
+    as they are. Appends to a day being re-derived are left out, since the
+    ledger already holds them.
+    """
+    months, days, appends = set(), set(), []
+    for op in ops:
+        path = op["path"]
+        if path[0] != key:
+            continue
+        if len(path) == 1:
+            return None
+        if len(path) == 2:
+            months.add(path[1])
+        elif not (op["op"] == "append" and len(path) == 3):
+            days.add((path[1], path[2]))
+    days = {(month, day) for month, day in days if month not in months}
+    for op in ops:
+        path = op["path"]
+        if (path[0] == key and op["op"] == "append" and len(path) == 3
+                and path[1] not in months and (path[1], path[2]) not in days):
+            appends.append((path[2], op["value"]))
+    return months, days, appends
@@ -0,0 +1,344 @@
+import os
+import glob
+import json
+import time
+import random
+import threading
+from collections import deque
+
+import httpx
+
+from utils.filelock import FileLock
+from utils.telegram_client import api_base
+
+MAX_TEXT = 4096  # Telegram's limit for one message
+
+_outboxes = {}
+_outboxes_lock = threading.Lock()
+
+def open_outbox(path, token):
+    """Return the outbound Telegram queue persisted at path (one per path per process)"""
+    path = os.path.abspath(path)
+    with _outboxes_lock:
+        if path not in _outboxes:
+            _outboxes[path] = Outbox(path, token)
+        outbox = _outboxes[path]
+        outbox.token = token
+        return outbox
+
+def _read(path):
+    """Undelivered messages in an outbox file, in order, and its record count; cuts a torn tail"""
+    messages = {}
+    lines = 0
+    offset = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                break
+            offset += len(raw)
+            lines += 1
+            if record["type"] == "put":
+                messages[record["message"]["id"]] = record["message"]
+            elif record["type"] == "done":
+                for message_id in record["ids"]:
+                    messages.pop(message_id, None)
+        torn = f.tell() != offset
+    if torn:
+        with open(path, "r+b") as f:
+            f.truncate(offset)
+    return list(messages.values()), lines
+
+class RateLimit:
+    """Token bucket: bursts of up to burst sends, then rate sends per second"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def ready_at(self, now):
+        self._refill(now)
+        return now if self.tokens >= 1 else now + (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+class Outbox:
+    """Persistent queue of outgoing Telegram messages, delivered by worker threads.
+
+    put() appends the message to a JSONL file and returns at once; workers
+    send it later, so callers never wait on the network. Each chat's
+    messages go out in order, within a per-chat and a bot-wide rate limit;
+    plain messages queued up behind the limit are joined into one send.
+    429s and server or network errors are retried with exponential backoff
+    and jitter (honouring retry_after); other rejections are dropped. Sent
+    messages are marked done in the file, so a restart resends only what
+    was still undelivered.
+
+    Each process gets a file of its own: the first of path, path.1, path.2 ...
+    whose lock file no other process holds (the GUI and the bot service can
+    both queue messages). The lock is kept while the process lives, and the
+    undelivered messages of any other file left unlocked by a process that
+    has exited are taken over.
+    """
+
+    def __init__(self, path, token, workers=2, chat_rate=1.0, chat_burst=3, global_rate=30.0,
+                 base_delay=1.0, max_delay=300.0, max_age=86400.0, base=None):
+        self.base_path = path
+        self.path, self.file_lock = self._claim(path)
+        self.token = token
+        self.base = base  # Bot API root; api_base() when None
+        self.workers = workers
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_limit = RateLimit(global_rate, global_rate)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_age = max_age
+        # Same HTTP stack as the bot's TelegramClient; workers share its keep-alive pool
+        self.http = httpx.Client(timeout=httpx.Timeout(15.0), limits=httpx.Limits(max_connections=workers))
+        self.cond = threading.Condition()
+        self.messages = {}
+        self.queues = {}
+        self.limits = {}
+        self.retry_at = {}
+        self.busy = set()
+        self.next_id = 1
+        self.lines = 0
+        self._threads = []
+        self._stop = False
+        self._load()
+        if self.messages:
+            self._start()
+
+    @staticmethod
+    def _lock_path(path):
+        return os.path.splitext(path)[0] + ".lock"
+
+    @staticmethod
+    def _siblings(path):
+        root, ext = os.path.splitext(path)
+        return [path] + sorted(glob.glob(glob.escape(root) + ".*" + ext))
+
+    def _claim(self, path):
+        """The first outbox file no other process holds, and its held lock"""
+        root, ext = os.path.splitext(path)
+        n = 0
+        while True:
+            candidate = path if n == 0 else f"{root}.{n}{ext}"
+            lock = FileLock(self._lock_path(candidate))
+            if lock.acquire(blocking=False):
+                return candidate, lock
+            n += 1
+
+    def _load(self):
+        if os.path.exists(self.path):
+            messages, self.lines = _read(self.path)
+            for message in messages:
+                self._enqueue(message)
+                self.next_id = max(self.next_id, message["id"] + 1)
+        self._adopt()
+
+    def _adopt(self):
+        """Take over what processes that have exited left in their outbox files"""
+        for other in self._siblings(self.base_path):
+            if other == self.path or not os.path.exists(other):
+                continue
+            lock = FileLock(self._lock_path(other))
+            if not lock.acquire(blocking=False):
+                continue  # Still in use by a running process
+            try:
+                messages, _ = _read(other)
+                for message in messages:
+                    message = dict(message, id=self.next_id)
+                    self.next_id += 1
+                    self._write({"type": "put", "message": message})
+                    self._enqueue(message)
+                os.remove(other)
+            finally:
+                lock.release()
+
+    def _write(self, *records):
+        text = "".join(json.dumps(r, separators=(",", ":"), ensure_ascii=False) + "\n" for r in records)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        self.lines += len(records)
+
+    def _compact(self):
+        """Rewrite the file with only the messages still waiting"""
+        records = [{"type": "put", "message": m} for m in self.messages.values()]
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r, separators=(",", ":"), ensure_ascii=False) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.lines = len(records)
+
+    def _enqueue(self, message):
+        self.messages[message["id"]] = message
+        self.queues.setdefault(str(message["chat_id"]), deque()).append(message["id"])
+
+    def _forget(self, message_id):
+        message = self.messages.pop(message_id, None)
+        if message is None:
+            return
+        chat = str(message["chat_id"])
+        queue = self.queues[chat]
+        queue.remove(message_id)
+        if not queue:
+            del self.queues[chat]
+            self.retry_at.pop(chat, None)
+
+    def put(self, chat_id, text, reply_markup=None):
+        """Queue a message (HTML parse mode) for delivery; returns its id"""
+        with self.cond:
+            message = {
+                "id": self.next_id, "chat_id": chat_id, "text": text,
+                "reply_markup": reply_markup, "queued": time.time(), "attempts": 0
+            }
+            self.next_id += 1
+            self._write({"type": "put", "message": message})
+            self._enqueue(message)
+            self._start()
+            self.cond.notify()
+            return message["id"]
+
+    def pending(self):
+        with self.cond:
+            return len(self.messages)
+
+    def wait_idle(self, timeout=None):
+        """Block until every queued message has been sent or dropped; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.messages:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+            return True
+
+    def close(self):
+        """Stop the workers; undelivered messages stay in the file for the next run"""
+        with self.cond:
+            self._stop = True
+            self.cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=20)
+        self._threads = []
+
+    def _start(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        self._stop = False
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _take(self):
+        """Claim the next chat that may send now; returns (chat, batch) or (None, seconds to wait)"""
+        now = time.monotonic()
+        soonest = None
+        for chat, queue in self.queues.items():
+            if chat in self.busy:
+                continue
+            limit = self.limits.setdefault(chat, RateLimit(self.chat_rate, self.chat_burst))
+            ready = max(self.retry_at.get(chat, now), limit.ready_at(now), self.global_limit.ready_at(now))
+            if ready > now:
+                soonest = ready if soonest is None else min(soonest, ready)
+                continue
+            limit.take(now)
+            self.global_limit.take(now)
+            self.busy.add(chat)
+            return chat, self._batch(queue)
+        return None, None if soonest is None else soonest - now
+
+    def _batch(self, queue):
+        """The head message, joined with the plain messages queued behind it while they fit"""
+        batch = [self.messages[queue[0]]]
+        for message_id in list(queue)[1:]:
+            message = self.messages[message_id]
+            if batch[-1]["reply_markup"]:
+                break
+            if sum(len(m["text"]) + 2 for m in batch) + len(message["text"]) > MAX_TEXT:
+                break
+            batch.append(message)
+        return batch
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while True:
+                    if self._stop:
+                        return
+                    chat, batch = self._take()
+                    if chat is not None:
+                        break
+                    self.cond.wait(batch)
+            try:
+                outcome, delay = self._send(batch)
+            except Exception as e:
+                # Never leave the chat marked busy, or nothing more would be sent to it
+                print(f"Failed to send Telegram message (will retry): {e}")
+                outcome, delay = "retry", None
+            with self.cond:
+                self.busy.discard(chat)
+                if outcome == "retry" and time.time() - batch[0]["queued"] < self.max_age:
+                    for message in batch:
+                        message["attempts"] += 1
+                    attempts = batch[0]["attempts"]
+                    if delay is None:
+                        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+                        delay *= random.uniform(0.5, 1.0)
+                    self.retry_at[chat] = time.monotonic() + delay
+                else:
+                    if outcome == "retry":
+                        print(f"Dropping Telegram message to {chat}: undelivered for too long")
+                    ids = [m["id"] for m in batch]
+                    for message_id in ids:
+                        self._forget(message_id)
+                    self.retry_at.pop(chat, None)
+                    self._write({"type": "done", "ids": ids})
+                    if not self.messages and self.lines > 1000:
+                        self._compact()
+                self.cond.notify_all()
+
+    def _send(self, batch):
+        """POST one sendMessage; returns ("sent" | "dropped" | "retry", retry_after)"""
+        payload = {
+            "chat_id": batch[0]["chat_id"],
+            "text": "\n\n".join(m["text"] for m in batch),
+            "parse_mode": "HTML"
+        }
+        if batch[-1]["reply_markup"]:
+            payload["reply_markup"] = batch[-1]["reply_markup"]
+        try:
+            response = self.http.post(f"{self.base or api_base()}/bot{self.token}/sendMessage", json=payload)
+        except httpx.HTTPError as e:
+            print(f"Failed to send Telegram message (will retry): {e}")
+            return "retry", None
+        if response.is_success:
+            return "sent", None
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = (body.get("parameters") or {}).get("retry_after")
+            print(f"Telegram sendMessage failed ({response.status_code}), will retry")
+            return "retry", retry_after
+        print(f"Failed to send Telegram message ({response.status_code}): {body.get('description', response.text[:200])}")
+        return "dropped", None
@@ -0,0 +1,116 @@
+from collections.abc import Mapping
+
+ROLLUP_VERSION = 1
+LEDGER_KEYS = ("expenses", "deposits")
+
+def empty_month():
+    return {"total": 0, "count": 0, "categories": {}, "descriptions": {}, "days": {}, "deposits": 0}
+
+def _bump(table, key, delta):
+    value = round(table.get(key, 0) + delta, 6)
+    if value:
+        table[key] = value
+    else:
+        table.pop(key, None)
+
+def _add_expense(months, month, date_str, expense, sign=1):
+    rollup = months.setdefault(month, empty_month())
+    amount = expense["amount"] * sign
+    rollup["total"] = round(rollup["total"] + amount, 6)
+    rollup["count"] += sign
+    _bump(rollup["categories"], expense["category"].lower(), amount)
+    _bump(rollup["descriptions"], expense["description"], amount)
+    _bump(rollup["days"], date_str, amount)
+
+def _add_deposit(months, month, amount):
+    rollup = months.setdefault(month, empty_month())
+    rollup["deposits"] = round(rollup["deposits"] + amount, 6)
+
+def build_month(data, month):
+    """Compute one month's rollup by scanning its expenses and deposits"""
+    months = {month: empty_month()}
+    for date_str, day_expenses in data.get("expenses", {}).get(month, {}).items():
+        for expense in day_expenses:
+            _add_expense(months, month, date_str, expense)
+    for amount in data.get("deposits", {}).get(month, {}).values():
+        _add_deposit(months, month, amount)
+    return months[month]
+
+def build_rollups(data):
+    months = set(data.get("expenses", {})) | set(data.get("deposits", {}))
+    return {
+        "version": ROLLUP_VERSION,
+        "months": {month: build_month(data, month) for month in sorted(months)}
+    }
+
+def ensure_rollups(data):
+    """Build data["rollups"] if it is missing or outdated; returns True when rebuilt"""
+    rollups = data.get("rollups")
+    if isinstance(rollups, dict) and rollups.get("version") == ROLLUP_VERSION:
+        return False
+    data["rollups"] = build_rollups(data)
+    return True
+
+def month_rollup(data, month):
+    """Return the rollup for a month (total, categories, descriptions, days, deposits)"""
+    rollups = data.get("rollups")
+    if isinstance(rollups, dict) and rollups.get("version") == ROLLUP_VERSION:
+        return rollups["months"].get(month) or empty_month()
+    # Data written before rollups existed: fall back to scanning just this month
+    return build_month(data, month)
+
+def _lookup(data, path):
+    node = data
+    for key in path:
+        if isinstance(node, Mapping):
+            if key not in node:
+                return None
+        elif not isinstance(node, list) or not -len(node) <= key < len(node):
+            return None
+        node = node[key]
+    return node
+
+def apply_with_rollups(data, op, apply):
+    """Run apply(data, op) and keep data["rollups"] in step with the change"""
+    path = op["path"]
+    rollups = data.get("rollups")
+    if (not isinstance(rollups, dict) or rollups.get("version") != ROLLUP_VERSION
+            or path[0] not in LEDGER_KEYS):
+        apply(data, op)
+        return
+
+    months = rollups["months"]
+    kind = op["op"]
+
+    if path[0] == "expenses" and len(path) == 3:
+        month, date_str = path[1], path[2]
+        if kind in ("append", "insert"):
+            apply(data, op)
+            _add_expense(months, month, date_str, op["value"])
+            return
+        day_expenses = _lookup(data, path) or []
+        if kind == "remove":
+            removed = op["value"] if op["value"] in day_expenses else None
+            apply(data, op)
+            if removed:
+                _add_expense(months, month, date_str, removed, -1)
+            return
+        if kind == "pop" and day_expenses:
+            removed = day_expenses[op["index"]]
+            apply(data, op)
+            _add_expense(months, month, date_str, removed, -1)
+            return
+
+    if path[0] == "deposits" and len(path) == 3 and kind in ("set", "delete"):
+        old = _lookup(data, path) or 0
+        apply(data, op)
+        new = op["value"] if kind == "set" else 0
+        _add_deposit(months, path[1], new - old)
+        return
+
+    # Structural change (whole month/day replaced, field edited): rebuild what it touched
+    apply(data, op)
+    if len(path) == 1:
+        data["rollups"] = build_rollups(data)
+    else:
+        months[path[1]] = build_month(data, path[1])
@@ -0,0 +1,119 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+from utils.serialization import json_dump_args
+
+_saver = None
+_saver_lock = threading.Lock()
+
+def get_saver():
+    """Return the process-wide saver, flushed automatically at interpreter exit"""
+    global _saver
+    with _saver_lock:
+        if _saver is None:
+            _saver = BackgroundSaver()
+            atexit.register(_saver.close)
+        return _saver
+
+def write_text_atomic(path, text):
+    """Write text to path via a temp file and rename, so a crash never leaves it truncated"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class BackgroundSaver:
+    """Writes whole-file JSON documents (categories, bot state, ...) off the calling thread.
+
+    save_json() serialises immediately, so later changes to the object can't
+    race the write, and marks the file dirty. The worker waits for a burst of
+    saves to go quiet and then writes only the latest version of each file.
+    A file stays readable through load_json() while its write is in flight,
+    and a failed write is retried unless a newer save replaced it.
+    """
+
+    def __init__(self, delay=0.5, max_delay=2.0):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.pending = {}
+        self.writing = {}  # Taken out of pending, not on disk yet
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self._worker = None
+
+    def save_json(self, path, payload, **dump_args):
+        # Pretty or compact according to FINANCE_FILE_FORMAT unless the caller says otherwise
+        self.save_text(path, json.dumps(payload, **(dump_args or json_dump_args())))
+
+    def save_text(self, path, text):
+        path = os.path.abspath(path)
+        with self.lock:
+            self.pending[path] = text
+            if self._worker is None or not self._worker.is_alive():
+                self._stop = False
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        self._wake.set()
+
+    def load_json(self, path, default=None):
+        """Read path as JSON, seeing saves that have not reached the disk yet"""
+        path = os.path.abspath(path)
+        with self.lock:
+            text = self.pending.get(path, self.writing.get(path))
+        if text is not None:
+            return json.loads(text)
+        if not os.path.exists(path):
+            return default
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait()
+            # Let a burst of saves settle into one write per file
+            deadline = time.monotonic() + self.max_delay
+            while not self._stop:
+                self._wake.clear()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._wake.wait(min(self.delay, remaining)):
+                    break
+            self.flush()
+
+    def flush(self):
+        """Write everything that is dirty now, on the calling thread (after any write in flight)"""
+        failed = False
+        with self.write_lock:
+            with self.lock:
+                paths = list(self.pending)
+            for path in paths:
+                with self.lock:
+                    text = self.pending.pop(path, None)
+                    if text is None:
+                        continue
+                    self.writing[path] = text
+                try:
+                    write_text_atomic(path, text)
+                except Exception as e:
+                    print(f"Failed to save {path}: {e}")
+                    failed = True
+                    with self.lock:
+                        # Retried later, unless a newer save replaced it meanwhile
+                        self.pending.setdefault(path, text)
+                finally:
+                    with self.lock:
+                        del self.writing[path]
+        if failed:
+            self._wake.set()
+
+    def close(self):
+        """Flush and stop the worker (hook for application exit)"""
+        self._stop = True
+        self._wake.set()
+        self.flush()
@@ -0,0 +1,155 @@
+import re
+import threading
+from bisect import bisect_left, insort
+
+from utils.operations import changed_days
+
+TOKEN = re.compile(r"\w+")
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def open_search(ledger):
+    """Return the search index kept in step with a ledger service"""
+    with _indexes_lock:
+        key = id(ledger)
+        if key not in _indexes:
+            index = SearchIndex(ledger)
+            ledger.subscribe(index.on_change)
+            ledger.when_closed(lambda: _indexes.pop(key, None))
+            _indexes[key] = index
+        return _indexes[key]
+
+def tokenize(text):
+    return TOKEN.findall(text.lower()) if isinstance(text, str) else []
+
+def expense_tokens(expense):
+    """The searchable words of an expense: its description and note"""
+    return set(tokenize(expense.get("description"))) | set(tokenize(expense.get("note")))
+
+class SearchIndex:
+    """Inverted index from each word to the expenses that use it.
+
+    postings[word] maps a date to the positions of that day's expenses using
+    the word. Any change other than an append re-indexes the whole day, so
+    positions never go stale. A query intersects the posting lists of its
+    words, the last word matching as a prefix for search-as-you-type. Built
+    on first search; updates hold the ledger's lock.
+    """
+
+    def __init__(self, ledger=None):
+        self.ledger = ledger
+        self.lock = ledger.lock if ledger else threading.RLock()
+        self.dirty = True
+        self._reset()
+
+    def _reset(self):
+        self.postings = {}
+        self.day_tokens = {}
+        self.day_sizes = {}
+        self.vocabulary = []
+
+    def rebuild(self, data):
+        with self.lock:
+            self._reset()
+            for days in data.get("expenses", {}).values():
+                for date_str, items in days.items():
+                    self._add_day(date_str, items)
+            self.dirty = False
+
+    def ensure(self):
+        """Build the index if it is missing or stale; call with the lock held"""
+        if self.dirty:
+            self.rebuild((self.ledger.data if self.ledger else None) or {})
+
+    def _add_expense(self, date_str, expense):
+        position = self.day_sizes.get(date_str, 0)
+        self.day_sizes[date_str] = position + 1
+        tokens = expense_tokens(expense)
+        self.day_tokens.setdefault(date_str, set()).update(tokens)
+        for token in tokens:
+            days = self.postings.get(token)
+            if days is None:
+                days = self.postings[token] = {}
+                insort(self.vocabulary, token)
+            days.setdefault(date_str, set()).add(position)
+
+    def _add_day(self, date_str, items):
+        for expense in items:
+            self._add_expense(date_str, expense)
+
+    def _drop_day(self, date_str):
+        self.day_sizes.pop(date_str, None)
+        for token in self.day_tokens.pop(date_str, ()):
+            days = self.postings[token]
+            del days[date_str]
+            if not days:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+
+    def on_change(self, ops, source=None):
+        """Ledger listener: fold applied operations into the index"""
+        with self.lock:
+            if self.dirty:
+                return
+            if ops is None:
+                self.dirty = True
+                return
+            changes = changed_days(ops)
+            if changes is None:
+                self.dirty = True
+                return
+            months, days, appends = changes
+            expenses = (self.ledger.data if self.ledger else {}).get("expenses", {})
+            for month in months:
+                for date_str in [d for d in self.day_sizes if d.startswith(month)]:
+                    self._drop_day(date_str)
+                for date_str, items in expenses.get(month, {}).items():
+                    self._add_day(date_str, items)
+            for month, date_str in days:
+                self._drop_day(date_str)
+                self._add_day(date_str, expenses.get(month, {}).get(date_str, []))
+            for date_str, expense in appends:
+                self._add_expense(date_str, expense)
+
+    def _matches(self, word, prefix=False):
+        """{date_str: positions} of expenses using word (or a word starting with it)"""
+        if not prefix:
+            return self.postings.get(word, {})
+        i = bisect_left(self.vocabulary, word)
+        found = []
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(word):
+            found.append(self.postings[self.vocabulary[i]])
+            i += 1
+        if len(found) == 1:
+            return found[0]
+        merged = {}
+        for days in found:
+            for date_str, positions in days.items():
+                merged.setdefault(date_str, set()).update(positions)
+        return merged
+
+    def search(self, query, limit=50):
+        """[(date_str, position, expense)] matching every word of query, newest first.
+
+        (date_str, position) identifies the expense in data["expenses"][date_str[:7]][date_str].
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        with self.lock:
+            self.ensure()
+            postings = [self._matches(word, prefix=i == len(words) - 1) for i, word in enumerate(words)]
+            postings.sort(key=len)
+            days = [d for d in postings[0] if all(d in other for other in postings[1:])]
+            expenses = self.ledger.data.get("expenses", {}) if self.ledger else {}
+            results = []
+            for date_str in sorted(days, reverse=True):
+                positions = set.intersection(*(p[date_str] for p in postings))
+                if not positions:
+                    continue
+                items = expenses.get(date_str[:7], {}).get(date_str, [])
+                results.extend((date_str, i, items[i]) for i in sorted(positions))
+                if len(results) >= limit:
+                    break
+            return results[:limit]
@@ -0,0 +1,262 @@
+"""On-disk encodings for the ledger.
+
+FINANCE_FILE_FORMAT (environment or .env) selects how files are written:
+
+- "json": pretty-printed JSON (indent=4), the original format
+- "compact": JSON without indentation or spaces (default)
+- "binary": a header of compact JSON plus the expenses packed column by column
+
+Readers detect the format from the file itself, so any existing file keeps
+loading whatever the setting is.
+"""
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+
+FORMATS = ("json", "compact", "binary")
+DEFAULT_FORMAT = "compact"
+MAGIC = b"FMB1"
+
+_U32 = struct.Struct("<I")
+_PLAIN_KEYS = {"amount", "category", "description", "note"}
+
+def configured_format():
+    fmt = os.getenv("FINANCE_FILE_FORMAT", DEFAULT_FORMAT).strip().lower()
+    return fmt if fmt in FORMATS else DEFAULT_FORMAT
+
+def json_dump_args(fmt=None):
+    """json.dump keyword arguments for small documents (categories, goals, state, backups)"""
+    if (fmt or configured_format()) == "json":
+        return {"indent": 4}
+    return {"separators": (",", ":")}
+
+# --- Binary ---
+
+def _pack_array(out, typecode, values):
+    column = array(typecode, values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    raw = column.tobytes()
+    out.append(_U32.pack(len(raw)))
+    out.append(raw)
+
+def _unpack_array(buf, offset, typecode):
+    (size,) = _U32.unpack_from(buf, offset)
+    offset += _U32.size
+    column = array(typecode)
+    column.frombytes(buf[offset:offset + size])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, offset + size
+
+def _pack_blob(out, raw):
+    out.append(_U32.pack(len(raw)))
+    out.append(raw)
+
+def _unpack_blob(buf, offset):
+    (size,) = _U32.unpack_from(buf, offset)
+    offset += _U32.size
+    return buf[offset:offset + size], offset + size
+
+def _is_plain(expense):
+    """Expense rows that fit the fixed columns; anything else is stored as JSON"""
+    return (
+        type(expense) is dict and expense.keys() <= _PLAIN_KEYS
+        and type(expense.get("amount")) is float
+        and type(expense.get("category")) is str and type(expense.get("description")) is str
+        and "\x00" not in expense["category"] and "\x00" not in expense["description"]
+        and (type(expense.get("note", "")) is str and "\x00" not in expense.get("note", ""))
+    )
+
+def _ledger_depth(expenses):
+    """2 for {month: {date: [...]}}, 1 for {date: [...]} (a month shard), None otherwise"""
+    if not isinstance(expenses, dict):
+        return None
+    if all(isinstance(v, list) for v in expenses.values()):
+        return 1
+    if all(isinstance(v, dict) and all(isinstance(d, list) for d in v.values()) for v in expenses.values()):
+        return 2
+    return None
+
+def _plain_keys(expenses, depth):
+    """True if every month and day key can go in the NUL-separated string table"""
+    keys = list(expenses)
+    if depth == 2:
+        keys += [date_str for days in expenses.values() for date_str in days]
+    return all(type(key) is str and "\x00" not in key for key in keys)
+
+def encode_binary(data):
+    expenses = data.get("expenses") if isinstance(data, dict) else None
+    depth = _ledger_depth(expenses)
+    if depth is None or not _plain_keys(expenses, depth):
+        header, expenses, depth = data, {}, 0
+    else:
+        header = {k: v for k, v in data.items() if k != "expenses"}
+
+    strings = {}
+
+    def code(s):
+        return strings.setdefault(s, len(strings))
+
+    groups = [(None, expenses)] if depth == 1 else list(expenses.items())
+    group_keys, group_sizes, day_keys, day_sizes = [], [], [], []
+    amounts, categories, descriptions = array("d"), array("i"), array("i")
+    note_rows, note_values, extra_rows, extras = array("i"), array("i"), array("i"), []
+    row = 0
+    for group, days in groups:
+        if depth == 2:
+            group_keys.append(code(group))
+            group_sizes.append(len(days))
+        for date_str, items in days.items():
+            day_keys.append(code(date_str))
+            day_sizes.append(len(items))
+            for expense in items:
+                if _is_plain(expense):
+                    amounts.append(expense["amount"])
+                    categories.append(code(expense["category"]))
+                    descriptions.append(code(expense["description"]))
+                    if "note" in expense:
+                        note_rows.append(row)
+                        note_values.append(code(expense["note"]))
+                else:
+                    amounts.append(0.0)
+                    categories.append(-1)
+                    descriptions.append(-1)
+                    extra_rows.append(row)
+                    extras.append(expense)
+                row += 1
+
+    out = [MAGIC, bytes([depth])]
+    _pack_blob(out, json.dumps(header, separators=(",", ":"), default=dict).encode("utf-8"))
+    _pack_blob(out, "\x00".join(strings).encode("utf-8"))
+    for typecode, column in (
+        ("i", group_keys), ("I", group_sizes), ("i", day_keys), ("I", day_sizes),
+        ("d", amounts), ("i", categories), ("i", descriptions),
+        ("i", note_rows), ("i", note_values), ("i", extra_rows)
+    ):
+        _pack_array(out, typecode, column)
+    _pack_blob(out, json.dumps(extras, separators=(",", ":")).encode("utf-8"))
+    return b"".join(out)
+
+def decode_binary(buf):
+    depth = buf[len(MAGIC)]
+    offset = len(MAGIC) + 1
+    raw, offset = _unpack_blob(buf, offset)
+    data = json.loads(raw)
+    if depth == 0:
+        return data
+    raw, offset = _unpack_blob(buf, offset)
+    strings = raw.decode("utf-8").split("\x00")
+    columns = []
+    for typecode in ("i", "I", "i", "I", "d", "i", "i", "i", "i", "i"):
+        column, offset = _unpack_array(buf, offset, typecode)
+        columns.append(column)
+    (group_keys, group_sizes, day_keys, day_sizes, amounts, categories,
+     descriptions, note_rows, note_values, extra_rows) = columns
+    raw, offset = _unpack_blob(buf, offset)
+    extras = json.loads(raw)
+
+    # Build every row in one pass, then patch in the sparse columns
+    rows = [
+        {"amount": amount, "category": strings[c], "description": strings[d]}
+        for amount, c, d in zip(amounts, categories, descriptions)
+    ]
+    for i, s in zip(note_rows, note_values):
+        rows[i]["note"] = strings[s]
+    for i, expense in zip(extra_rows, extras):
+        rows[i] = expense
+
+    start = 0
+    day_items = []
+    for key, size in zip(day_keys, day_sizes):
+        day_items.append((strings[key], rows[start:start + size]))
+        start += size
+    if depth == 1:
+        expenses = dict(day_items)
+    else:
+        expenses = {}
+        start = 0
+        for key, size in zip(group_keys, group_sizes):
+            expenses[strings[key]] = dict(day_items[start:start + size])
+            start += size
+    data["expenses"] = expenses
+    return data
+
+# --- Files ---
+
+def dumps(data, fmt=None):
+    fmt = fmt or configured_format()
+    if fmt == "binary":
+        return encode_binary(data)
+    return json.dumps(data, default=dict, **json_dump_args(fmt)).encode("utf-8")
+
+def loads(buf):
+    """Decode any supported format (including legacy pretty-printed JSON)"""
+    if buf[:len(MAGIC)] == MAGIC:
+        return decode_binary(buf)
+    return json.loads(buf)
+
+def read_document(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+def write_document(path, data, fmt=None):
+    """Encode data and replace path atomically (temp file, fsync, rename)"""
+    payload = dumps(data, fmt)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# --- Benchmark ---
+
+def synthetic_ledger(expense_count, months=24):
+    """A ledger shaped like the app's, with expense_count expenses spread over months"""
+    descriptions = ["Groceries", "Rent", "Coffee", "Fuel", "Movies", "Electricity", "Lunch", "Books"]
+    data = {
+        "monthly_income": 50000,
+        "breakdown": {"needs": 25000, "wants": 15000, "savings": 10000},
+        "settings": {"theme": "darkly", "pin": None},
+        "expenses": {},
+        "deposits": {},
+    }
+    for i in range(expense_count):
+        month = f"{2020 + (i % months) // 12}-{(i % months) % 12 + 1:02d}"
+        date_str = f"{month}-{i % 28 + 1:02d}"
+        expense = {
+            "amount": float(i % 997) + 0.5,
+            "category": "needs" if i % 3 else "wants",
+            "description": descriptions[i % len(descriptions)],
+        }
+        if i % 5 == 0:
+            expense["note"] = "[Added via Telegram]"
+        data["expenses"].setdefault(month, {}).setdefault(date_str, []).append(expense)
+        data["deposits"].setdefault(month, {})[date_str] = 100
+    return data
+
+def benchmark(expense_count=100000, repeat=3):
+    """Time encoding and decoding the synthetic ledger in every format"""
+    data = synthetic_ledger(expense_count)
+    results = {}
+    for fmt in FORMATS:
+        best_write = best_read = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            payload = dumps(data, fmt)
+            best_write = min(best_write, time.perf_counter() - start)
+            start = time.perf_counter()
+            decoded = loads(payload)
+            best_read = min(best_read, time.perf_counter() - start)
+        assert decoded == data
+        results[fmt] = {"bytes": len(payload), "write_ms": best_write * 1000, "read_ms": best_read * 1000}
+    return results
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for fmt, r in benchmark(count).items():
+        print(f"{fmt:8} {r['bytes'] / 1e6:7.2f} MB  write {r['write_ms']:7.1f} ms  read {r['read_ms']:7.1f} ms")
@@ -0,0 +1,272 @@
+import copy
+import os
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import datetime
+
+from utils.journal import SEQ_KEY, file_token
+from utils.operations import apply_op, apply_raw_op
+from utils.rollups import build_month, build_rollups
+from utils.serialization import read_document, write_document
+
+LEDGER_KEYS = ("expenses", "deposits")
+MONTH_FILE = re.compile(r"^(\d{4}-\d{2})\.json$")
+
+def shard_dir(snapshot_path):
+    return os.path.join(os.path.dirname(snapshot_path), "ledger")
+
+def _month_of(op):
+    """Month shard an operation belongs to, or None for header operations"""
+    path = op["path"]
+    if path[0] in LEDGER_KEYS and len(path) > 1:
+        return path[1]
+    return None
+
+def _is_whole_ledger(op):
+    return op["path"][0] in LEDGER_KEYS and len(op["path"]) == 1
+
+class MonthCache:
+    """LRU of loaded month shards; evicted months are re-read from disk on demand"""
+
+    def __init__(self, snapshot, months, capacity=12):
+        self.snapshot = snapshot
+        self.known = set(months)
+        self.capacity = capacity
+        self.loaded = OrderedDict()
+        self.lock = threading.RLock()
+
+    def get(self, month):
+        with self.lock:
+            if month in self.loaded:
+                self.loaded.move_to_end(month)
+                return self.loaded[month]
+            shard = self.snapshot.load_month(month)
+            self.loaded[month] = shard
+            current = datetime.now().strftime("%Y-%m")
+            for cold in list(self.loaded):
+                if len(self.loaded) <= self.capacity:
+                    break
+                if cold != current:
+                    del self.loaded[cold]
+            return shard
+
+class MonthMap(MutableMapping):
+    """Dict-like view of data["expenses"] or data["deposits"] backed by month shards"""
+
+    def __init__(self, cache, kind):
+        self.cache = cache
+        self.kind = kind
+
+    def __contains__(self, month):
+        return month in self.cache.known
+
+    def __getitem__(self, month):
+        if month not in self.cache.known:
+            raise KeyError(month)
+        return self.cache.get(month)[self.kind]
+
+    def __setitem__(self, month, value):
+        self.cache.known.add(month)
+        self.cache.get(month)[self.kind] = value
+
+    def __delitem__(self, month):
+        if month not in self.cache.known:
+            raise KeyError(month)
+        shard = self.cache.get(month)
+        shard[self.kind] = {}
+        if not any(shard.values()):
+            self.cache.known.discard(month)
+
+    def __iter__(self):
+        return iter(sorted(self.cache.known))
+
+    def __len__(self):
+        return len(self.cache.known)
+
+    def __deepcopy__(self, memo):
+        # Undo entries and backups want plain data, not another lazy view
+        return {month: copy.deepcopy(self[month], memo) for month in self}
+
+class ShardedSnapshot:
+    """Ledger snapshot split into ledger/header.json and one ledger/YYYY-MM.json per month.
+
+    Each file carries the journal seq it includes, so folding can rewrite only
+    the months the journal touched and a crash part way through never replays
+    an operation twice.
+    """
+
+    def __init__(self, directory, journal, cache_months=12):
+        self.directory = directory
+        self.journal = journal
+        self.cache_months = cache_months
+        self.header_path = os.path.join(directory, "header.json")
+
+    def exists(self):
+        return os.path.exists(self.header_path)
+
+    def token(self):
+        # Every fold rewrites the header last, so it changes whenever any shard does
+        return file_token(self.header_path)
+
+    def month_path(self, month):
+        return os.path.join(self.directory, f"{month}.json")
+
+    def list_months(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [m.group(1) for m in map(MONTH_FILE.match, os.listdir(self.directory)) if m]
+
+    def read_header(self):
+        if not os.path.exists(self.header_path):
+            return None, 0
+        header = read_document(self.header_path)
+        return header, header.pop(SEQ_KEY, 0)
+
+    def read_month(self, month):
+        path = self.month_path(month)
+        if not os.path.exists(path):
+            return {"expenses": {}, "deposits": {}}, 0
+        shard = read_document(path)
+        seq = shard.pop(SEQ_KEY, 0)
+        shard.setdefault("expenses", {})
+        shard.setdefault("deposits", {})
+        return shard, seq
+
+    def load_month(self, month):
+        """Read one month shard and replay the journal entries that belong to it"""
+        shard, month_seq = self.read_month(month)
+        view = {"expenses": {month: shard["expenses"]}, "deposits": {month: shard["deposits"]}}
+        for seq, op in self.journal.read_entries():
+            if seq > month_seq and _month_of(op) == month:
+                apply_raw_op(view, op)
+        return {"expenses": view["expenses"].get(month, {}), "deposits": view["deposits"].get(month, {})}
+
+    def load(self, entries, default=None):
+        """Return (data, header seq); months stay on disk until they are first used"""
+        header, header_seq = self.read_header()
+        if header is None:
+            if default is None and not entries:
+                return None, 0
+            header = {k: v for k, v in (default or {}).items() if k not in LEDGER_KEYS}
+
+        cache = MonthCache(self, self.list_months(), self.cache_months)
+        data = header
+        data["expenses"] = MonthMap(cache, "expenses")
+        data["deposits"] = MonthMap(cache, "deposits")
+
+        touched = set()
+        for seq, op in entries:
+            if seq <= header_seq:
+                continue
+            month = _month_of(op)
+            if month is None:
+                apply_op(data, op)
+            else:
+                touched.add(month)
+                cache.known.add(month)
+
+        # Rollups in the header predate these entries; recompute the months they touched
+        rollups = data.get("rollups")
+        for month in touched:
+            if rollups:
+                rollups["months"][month] = build_month(data, month)
+            if not any(cache.get(month).values()):
+                cache.known.discard(month)
+
+        current = datetime.now().strftime("%Y-%m")
+        if current in cache.known:
+            cache.get(current)
+        return data, header_seq
+
+    def needs_fold(self, ops):
+        # Replacing the whole ledger touches every shard; fold it right away
+        return any(_is_whole_ledger(op) for op in ops)
+
+    def write_month(self, month, expenses, deposits, seq):
+        write_document(self.month_path(month), {"expenses": expenses, "deposits": deposits, SEQ_KEY: seq})
+
+    def write_header(self, data, seq):
+        payload = {k: v for k, v in data.items() if k not in LEDGER_KEYS}
+        payload[SEQ_KEY] = seq
+        write_document(self.header_path, payload)
+
+    def write(self, data, seq):
+        os.makedirs(self.directory, exist_ok=True)
+        expenses = data.get("expenses", {})
+        deposits = data.get("deposits", {})
+        months = {m for m in set(expenses) | set(deposits) if expenses.get(m) or deposits.get(m)}
+        for month in months:
+            self.write_month(month, expenses.get(month, {}), deposits.get(month, {}), seq)
+        # Header last: it is what marks the snapshot as complete
+        self.write_header(data, seq)
+        for month in set(self.list_months()) - months:
+            os.remove(self.month_path(month))
+
+    def fold(self, entries, seq):
+        header, header_seq = self.read_header()
+        view = header or {}
+        whole = any(entry_seq > header_seq and _is_whole_ledger(op) for entry_seq, op in entries)
+        if whole:
+            months = set(self.list_months())
+        else:
+            months = {_month_of(op) for _, op in entries} - {None}
+
+        # The header is written last, so everything up to its seq is in every file
+        shards = {}
+        view["expenses"] = {}
+        view["deposits"] = {}
+        for month in months:
+            shard, month_seq = self.read_month(month)
+            shards[month] = (shard, max(month_seq, header_seq))
+            for kind in LEDGER_KEYS:
+                if shard[kind]:
+                    view[kind][month] = shard[kind]
+
+        for entry_seq, op in entries:
+            month = _month_of(op)
+            done = shards[month][1] if month in shards else header_seq
+            if entry_seq <= done:
+                continue
+            apply_raw_op(view, op)
+            if _is_whole_ledger(op):
+                # An interrupted fold may already have rewritten some months past this op
+                kind = op["path"][0]
+                for month, (shard, month_seq) in shards.items():
+                    if month_seq >= entry_seq:
+                        if shard[kind]:
+                            view[kind][month] = shard[kind]
+                        else:
+                            view[kind].pop(month, None)
+
+        if whole:
+            if "rollups" in view:
+                view["rollups"] = build_rollups(view)
+            self.write(view, seq)
+            return
+
+        if "rollups" in view:
+            for month in months:
+                view["rollups"]["months"][month] = build_month(view, month)
+        for month in months:
+            self.write_month(month, view["expenses"].get(month, {}), view["deposits"].get(month, {}), seq)
+        self.write_header(view, seq)
+        # Emptied months only go once the header says the fold is complete
+        for month in months:
+            if not view["expenses"].get(month) and not view["deposits"].get(month):
+                os.remove(self.month_path(month))
+
+def shard_ledger(journal):
+    """Convert a single-file ledger into the per-month layout (one-shot)"""
+    with journal.locked():
+        if isinstance(journal.snapshot, ShardedSnapshot):
+            return
+        journal.compact()
+        data, seq = journal.snapshot.read()
+        sharded = ShardedSnapshot(shard_dir(journal.snapshot_path), journal)
+        sharded.write(data or {}, max(seq, journal.seq))
+        journal.snapshot = sharded
+        # Keep the old file as a backup, out of the way of anything that reads it
+        if os.path.exists(journal.snapshot_path):
+            os.replace(journal.snapshot_path, journal.snapshot_path + ".bak")
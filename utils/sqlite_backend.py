@@ -0,0 +1,331 @@
+import json
+import sqlite3
+import threading
+
+from utils.operations import apply_op
+
+EXPENSE_FIELDS = ("amount", "category", "description", "note", "image_path", "timestamp")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    month TEXT NOT NULL,
+    date TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT NOT NULL,
+    note TEXT,
+    image_path TEXT,
+    timestamp TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date);
+CREATE INDEX IF NOT EXISTS idx_expenses_month_category ON expenses(month, category);
+CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category);
+CREATE INDEX IF NOT EXISTS idx_expenses_description ON expenses(description);
+
+CREATE TABLE IF NOT EXISTS deposits (
+    date TEXT PRIMARY KEY,
+    month TEXT NOT NULL,
+    amount REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deposits_month ON deposits(month);
+
+CREATE TABLE IF NOT EXISTS recurring (
+    position INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS goals (
+    position INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL
+);
+
+-- Everything else in finance_data.json (income, breakdown, settings, ...)
+CREATE TABLE IF NOT EXISTS header (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+LEDGER_KEYS = ("expenses", "deposits")
+# Derived from the ledger in JSON mode; SQL aggregates replace them here
+DERIVED_KEYS = ("rollups",)
+
+class SQLiteBackend:
+    """Indexed SQLite storage for expenses, deposits, recurring rules and goals"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def is_empty(self):
+        with self.lock:
+            for table in ("header", "expenses", "deposits", "recurring", "goals"):
+                if self.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                    return False
+            return True
+
+    # --- Rows <-> JSON entries ---
+
+    def _expense_row(self, month, date_str, expense):
+        extra = {k: v for k, v in expense.items() if k not in EXPENSE_FIELDS}
+        return (
+            month, date_str, expense["amount"], expense["category"], expense["description"],
+            expense.get("note"), expense.get("image_path"), expense.get("timestamp"),
+            json.dumps(extra) if extra else None
+        )
+
+    def _expense_entry(self, row):
+        amount, category, description, note, image_path, timestamp, extra = row
+        entry = {"amount": amount, "category": category, "description": description}
+        if note is not None:
+            entry["note"] = note
+        if image_path is not None:
+            entry["image_path"] = image_path
+        if timestamp is not None:
+            entry["timestamp"] = timestamp
+        if extra:
+            entry.update(json.loads(extra))
+        return entry
+
+    def _insert_expenses(self, rows):
+        self.conn.executemany(
+            "INSERT INTO expenses (month, date, amount, category, description, note, image_path, timestamp, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    def _write_expense_tree(self, expenses, month=None):
+        """Replace all expenses (or one month) with a nested {month: {date: [...]}} tree"""
+        if month is None:
+            self.conn.execute("DELETE FROM expenses")
+            months = expenses.items()
+        else:
+            self.conn.execute("DELETE FROM expenses WHERE month = ?", (month,))
+            months = [(month, expenses.get(month, {}))]
+        self._insert_expenses([
+            self._expense_row(m, date_str, expense)
+            for m, days in months
+            for date_str, day_expenses in sorted(days.items())
+            for expense in day_expenses
+        ])
+
+    def _write_header(self, header):
+        self.conn.execute("DELETE FROM header")
+        self.conn.executemany(
+            "INSERT INTO header (key, value) VALUES (?, ?)",
+            [(key, json.dumps(value)) for key, value in header.items()
+             if key not in LEDGER_KEYS and key not in DERIVED_KEYS]
+        )
+
+    def _write_list(self, table, items):
+        self.conn.execute(f"DELETE FROM {table}")
+        self.conn.executemany(
+            f"INSERT INTO {table} (position, payload) VALUES (?, ?)",
+            [(i, json.dumps(item)) for i, item in enumerate(items)]
+        )
+
+    def _write_deposit_tree(self, deposits, month=None):
+        if month is None:
+            self.conn.execute("DELETE FROM deposits")
+            months = deposits.items()
+        else:
+            self.conn.execute("DELETE FROM deposits WHERE month = ?", (month,))
+            months = [(month, deposits.get(month, {}))]
+        self.conn.executemany(
+            "INSERT INTO deposits (date, month, amount) VALUES (?, ?, ?)",
+            [(date_str, m, amount) for m, days in months for date_str, amount in days.items()]
+        )
+
+    # --- Reads ---
+
+    def load_header(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT key, value FROM header").fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def load_list(self, table):
+        with self.lock:
+            rows = self.conn.execute(f"SELECT payload FROM {table} ORDER BY position").fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def get_expenses(self, month=None):
+        """Return expenses as the nested {month: {date: [...]}} tree used by the JSON files"""
+        query = ("SELECT month, date, amount, category, description, note, image_path, timestamp, extra "
+                 "FROM expenses")
+        params = ()
+        if month:
+            query += " WHERE month = ?"
+            params = (month,)
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY date, id", params).fetchall()
+        tree = {}
+        for row in rows:
+            tree.setdefault(row[0], {}).setdefault(row[1], []).append(self._expense_entry(row[2:]))
+        return tree
+
+    def get_deposits(self, month=None):
+        query = "SELECT month, date, amount FROM deposits"
+        params = ()
+        if month:
+            query += " WHERE month = ?"
+            params = (month,)
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY date", params).fetchall()
+        tree = {}
+        for m, date_str, amount in rows:
+            tree.setdefault(m, {})[date_str] = amount
+        return tree
+
+    def category_spending(self, month):
+        """Return ({"needs": x, "wants": y}, {description: total}) for a month"""
+        spending = {"needs": 0, "wants": 0}
+        custom_categories = {}
+        with self.lock:
+            by_category = self.conn.execute(
+                "SELECT category, SUM(amount) FROM expenses WHERE month = ? GROUP BY category",
+                (month,)
+            ).fetchall()
+            by_description = self.conn.execute(
+                "SELECT description, SUM(amount) FROM expenses WHERE month = ? "
+                "GROUP BY description ORDER BY MIN(id)",
+                (month,)
+            ).fetchall()
+        for category, total in by_category:
+            category = category.lower()
+            if category in spending:
+                spending[category] += total
+        for description, total in by_description:
+            custom_categories[description] = total
+        return spending, custom_categories
+
+    def _date_range(self, start, end):
+        clauses, params = [], []
+        if start:
+            clauses.append("date >= ?")
+            params.append(str(start))
+        if end:
+            clauses.append("date <= ?")
+            params.append(str(end))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def spending_between(self, start=None, end=None):
+        """Like category_spending, for expenses dated start..end (inclusive)"""
+        where, params = self._date_range(start, end)
+        spending = {"needs": 0, "wants": 0}
+        with self.lock:
+            by_category = self.conn.execute(
+                f"SELECT category, SUM(amount) FROM expenses{where} GROUP BY category", params
+            ).fetchall()
+            by_description = self.conn.execute(
+                f"SELECT description, SUM(amount) FROM expenses{where} GROUP BY description ORDER BY MIN(id)",
+                params
+            ).fetchall()
+        for category, total in by_category:
+            category = category.lower()
+            if category in spending:
+                spending[category] += total
+        return spending, dict(by_description)
+
+    def spend_between(self, start=None, end=None):
+        """(total, number of expenses) dated start..end"""
+        where, params = self._date_range(start, end)
+        with self.lock:
+            total, count = self.conn.execute(
+                f"SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM expenses{where}", params
+            ).fetchone()
+        return total, count
+
+    def monthly_spending(self, start=None, end=None):
+        """{month: {category: total}} for expenses dated start..end"""
+        where, params = self._date_range(start, end)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT month, LOWER(category), SUM(amount) FROM expenses{where} "
+                "GROUP BY month, LOWER(category) ORDER BY month",
+                params
+            ).fetchall()
+        monthly = {}
+        for month, category, total in rows:
+            monthly.setdefault(month, {})[category] = total
+        return monthly
+
+    def deposit_total(self, month):
+        with self.lock:
+            (total,) = self.conn.execute(
+                "SELECT COALESCE(SUM(amount), 0) FROM deposits WHERE month = ?", (month,)
+            ).fetchone()
+        return total
+
+    def export_data(self, header):
+        data = dict(header)
+        data["expenses"] = self.get_expenses()
+        data["deposits"] = self.get_deposits()
+        return data
+
+    # --- Writes ---
+
+    def save_header(self, header):
+        with self.lock, self.conn:
+            self._write_header(header)
+
+    def save_list(self, table, items):
+        with self.lock, self.conn:
+            self._write_list(table, items)
+
+    def apply_ops(self, ops, header):
+        """Apply ledger operations; expense/deposit ops go to their tables, the rest to header"""
+        with self.lock, self.conn:
+            header_dirty = False
+            for op in ops:
+                path = op["path"]
+                table = path[0]
+                if table == "expenses" and op["op"] == "append" and len(path) == 3:
+                    self._insert_expenses([self._expense_row(path[1], path[2], op["value"])])
+                elif table == "deposits" and op["op"] == "set" and len(path) == 3:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO deposits (date, month, amount) VALUES (?, ?, ?)",
+                        (path[2], path[1], op["value"])
+                    )
+                elif table in LEDGER_KEYS:
+                    # Any other shape: rebuild the touched month (or everything) from a tree
+                    month = path[1] if len(path) > 1 else None
+                    if table == "expenses":
+                        tree = {"expenses": self.get_expenses(month)}
+                        apply_op(tree, op)
+                        self._write_expense_tree(tree["expenses"], month)
+                    else:
+                        tree = {"deposits": self.get_deposits(month)}
+                        apply_op(tree, op)
+                        self._write_deposit_tree(tree["deposits"], month)
+                else:
+                    apply_op(header, op)
+                    header_dirty = True
+            if header_dirty:
+                self._write_header(header)
+
+    def replace_all(self, data, recurring, goals):
+        """Overwrite the database with the given JSON structures"""
+        with self.lock, self.conn:
+            self._write_header(data)
+            self._write_expense_tree(data.get("expenses", {}))
+            self._write_deposit_tree(data.get("deposits", {}))
+            self._write_list("recurring", recurring)
+            self._write_list("goals", goals)
+
+def migrate_json_to_sqlite(data, recurring, goals, db_path):
+    """One-shot copy of the JSON ledger into a new SQLite database"""
+    backend = SQLiteBackend(db_path)
+    if not backend.is_empty():
+        raise ValueError(f"{db_path} already contains data; refusing to migrate over it")
+    backend.replace_all(data, recurring, goals)
+    return backend
@@ -0,0 +1,67 @@
+import os
+
+import httpx
+
+DEFAULT_API_BASE = "https://api.telegram.org"
+
+def api_base():
+    """Bot API root; TELEGRAM_API_BASE points the bot at a local fake server for testing"""
+    return os.getenv("TELEGRAM_API_BASE", DEFAULT_API_BASE).rstrip("/")
+
+class TelegramError(Exception):
+    """A Bot API call that failed; status is the HTTP status (None if the request never completed)"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class TelegramClient:
+    """Async Bot API client sharing one pool of keep-alive connections.
+
+    Every call reuses pooled connections instead of opening a new TCP+TLS
+    connection per request. Long polls get a read timeout a little longer
+    than the poll itself.
+    """
+
+    def __init__(self, token, base=None, poll_timeout=60, max_connections=10):
+        self.url = f"{base or api_base()}/bot{token}"
+        self.poll_timeout = poll_timeout
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(15.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def call(self, method, params=None, timeout=None):
+        """POST a Bot API method with params and return its "result"; raises TelegramError"""
+        try:
+            response = await self.http.post(
+                f"{self.url}/{method}", json=params or {}, timeout=timeout or httpx.USE_CLIENT_DEFAULT
+            )
+        except httpx.HTTPError as e:
+            raise TelegramError(f"{method} failed: {e}") from e
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        if response.is_success and payload.get("ok"):
+            return payload.get("result")
+        parameters = payload.get("parameters") or {}
+        raise TelegramError(
+            f"{method} failed ({response.status_code}): {payload.get('description', response.text[:200])}",
+            status=response.status_code,
+            retry_after=parameters.get("retry_after")
+        )
+
+    async def get_updates(self, offset=None, limit=None, poll_timeout=None):
+        """Pending updates from offset on; poll_timeout=0 returns at once instead of long-polling"""
+        poll_timeout = self.poll_timeout if poll_timeout is None else poll_timeout
+        params = {"timeout": poll_timeout}
+        if offset is not None:
+            params["offset"] = offset
+        if limit is not None:
+            params["limit"] = limit
+        return await self.call("getUpdates", params, timeout=poll_timeout + 10) or []
+
+    async def close(self):
+        await self.http.aclose()
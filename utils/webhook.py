@@ -0,0 +1,139 @@
+import sys
+import json
+import hmac
+import asyncio
+import urllib.request
+import urllib.error
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+MAX_BODY = 1 << 20
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+    405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large"
+}
+
+class WebhookServer:
+    """Minimal HTTP/1.1 receiver for Telegram webhook POSTs, on asyncio.
+
+    Each POST to path must carry the secret registered with setWebhook in
+    the X-Telegram-Bot-Api-Secret-Token header. The update is passed to
+    dispatch (which must not block) and answered with 200 straight away, so
+    Telegram never waits on ledger work. Connections are kept alive.
+    """
+
+    def __init__(self, dispatch, secret, host="127.0.0.1", port=8443, path="/"):
+        self.dispatch = dispatch
+        self.secret = secret.encode()
+        self.host = host
+        self.port = port
+        self.path = path
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, self.host, self.port)
+        # Port 0 picks a free port; report the real one
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                status, keep_alive = await self._respond(request_line, headers, reader)
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Length: 0\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, request_line, headers, reader):
+        """Read the body and dispatch the update; returns (status, keep connection open)"""
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            return 400, False
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        length = headers.get("content-length")
+        if length is None:
+            return (411 if method == "POST" else 405), False
+        length = int(length)
+        if length > MAX_BODY:
+            return 413, False
+        body = await reader.readexactly(length)
+        if method != "POST":
+            return 405, keep_alive
+        if target.split("?", 1)[0] != self.path:
+            return 404, keep_alive
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, "").encode(), self.secret):
+            return 401, keep_alive
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return 400, keep_alive
+        if not isinstance(update, dict):
+            return 400, keep_alive
+        self.dispatch(update)
+        return 200, keep_alive
+
+def text_update(update_id, text, user_id=1, chat_id=None):
+    """A minimal message update, as Telegram would POST for a text message"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "from": {"id": user_id},
+            "chat": {"id": chat_id or user_id},
+            "text": text
+        }
+    }
+
+def replay(url, secret, updates):
+    """Local stand-in for Telegram: POST each update to the webhook in order; returns the statuses"""
+    statuses = []
+    for update in updates:
+        request = urllib.request.Request(
+            url, data=json.dumps(update).encode(), method="POST",
+            headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": secret}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                statuses.append(response.status)
+        except urllib.error.HTTPError as e:
+            statuses.append(e.code)
+    return statuses
+
+if __name__ == "__main__":
+    # python utils/webhook.py URL SECRET USER_ID < updates
+    # Each input line is a JSON update or plain message text.
+    if len(sys.argv) < 3:
+        sys.exit("usage: webhook.py URL SECRET [USER_ID] < updates")
+    user_id = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    updates = []
+    for line in sys.stdin:
+        line = line.strip()
+        if line:
+            updates.append(json.loads(line) if line.startswith("{") else text_update(len(updates) + 1, line, user_id))
+    for update, status in zip(updates, replay(sys.argv[1], sys.argv[2], updates)):
+        print(status, update.get("update_id"))